@@ -0,0 +1,130 @@
+# dataset_cache.py
+"""
+In-memory cache of the datasets training jobs load (jobs._load_frame).
+
+It is used for training only: column lists, info and previews read the Parquet
+footer and single row groups (storage.dataset_columns / read_rows), which is
+cheaper than loading a frame into memory. Training runs in the worker
+processes of jobs' pool, so each worker holds its own instance and
+DATASET_CACHE_BYTES applies per worker. A re-uploaded file has a new key, and
+workers drop the old entry the next time they load the dataset.
+
+Entries are keyed by (user, filename, mtime, size) of the Parquet file, so a
+replaced upload is never served stale. Columns are cached individually per
+entry: a request for a subset of already-loaded columns is a hit, and missing
+columns are read from disk and merged in. Least recently used entries are
+evicted once the total size exceeds DATASET_CACHE_BYTES.
+
+Cached frames are shared between requests and must not be modified in place.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+import storage
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DatasetCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _frame_bytes(df: pd.DataFrame) -> int:
+        return int(df.memory_usage(index=True, deep=True).sum())
+
+    def _drop_stale(self, user, filename, key) -> None:
+        for k in [k for k in self._entries if k[:2] == (user, filename) and k != key]:
+            del self._entries[k]
+
+    def _evict(self) -> None:
+        total = sum(e["bytes"] for e in self._entries.values())
+        while total > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry["bytes"]
+            self.evictions += 1
+
+    def load(self, username, filename, columns: Optional[list] = None) -> Optional[pd.DataFrame]:
+        """
+        Return the dataset (or just `columns` of it), or None if the user has no
+        such dataset.
+        """
+        path = storage.resolve_dataset(username, filename)
+        if path is None:
+            return None
+        st = os.stat(path)
+        user = str(username)
+        key = (user, str(filename), st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached = entry["df"]
+                if columns is None and entry["complete"]:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return cached
+                if columns is not None and all(c in cached.columns for c in columns):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return cached[list(columns)]
+            self.misses += 1
+            loaded_cols = list(entry["df"].columns) if entry is not None else []
+
+        # read outside the lock so other datasets stay available meanwhile
+        if columns is None:
+            df = storage.read_dataset(path)
+            complete = True
+        else:
+            missing = [c for c in columns if c not in loaded_cols]
+            df = storage.read_dataset(path, columns=missing)
+            if entry is not None:
+                df = pd.concat([entry["df"], df], axis=1)
+            complete = entry is not None and entry["complete"]
+
+        nbytes = self._frame_bytes(df)
+        with self._lock:
+            self._drop_stale(user, str(filename), key)
+            if nbytes <= self.max_bytes:
+                self._entries[key] = {"df": df, "bytes": nbytes, "complete": complete}
+                self._entries.move_to_end(key)
+                self._evict()
+        return df if columns is None else df[list(columns)]
+
+    def invalidate(self, username, filename) -> None:
+        with self._lock:
+            for k in [k for k in self._entries if k[:2] == (str(username), str(filename))]:
+                del self._entries[k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e["bytes"] for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+try:
+    _max_bytes = int(os.environ.get("DATASET_CACHE_BYTES", str(DEFAULT_MAX_BYTES)))
+except Exception:
+    _max_bytes = DEFAULT_MAX_BYTES
+
+# shared by every training job run in this process
+dataset_cache = DatasetCache(_max_bytes)
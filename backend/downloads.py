@@ -0,0 +1,139 @@
+# downloads.py
+"""
+Streaming file responses with HTTP Range and on-the-fly compression.
+
+Files are sent in DOWNLOAD_CHUNK_BYTES pieces so memory use does not depend on
+file size. A `Range: bytes=...` request gets a 206 with the identity bytes of
+that range so clients can resume. Otherwise the body is gzip or zstd encoded
+when the client accepts it (zstd needs the optional `zstandard` package).
+"""
+import os
+import zlib
+from typing import Iterator, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+try:
+    import zstandard  # optional
+except Exception:
+    zstandard = None
+
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single `bytes=start-end` range into an inclusive (start, end) pair.
+    Returns None when there is no usable range header; raises 416 for ranges
+    outside the file. Multi-range requests are answered with the whole file.
+    """
+    if not header or not header.strip().lower().startswith("bytes="):
+        return None
+    spec = header.split("=", 1)[1].strip()
+    if "," in spec:
+        return None
+    start_s, _, end_s = spec.partition("-")
+    try:
+        if start_s == "":
+            # suffix range: the last N bytes
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def iter_file(path: str, start: int = 0, end: Optional[int] = None, chunk_size: int = DOWNLOAD_CHUNK_BYTES) -> Iterator[bytes]:
+    """Yield bytes [start, end] (inclusive) of a file."""
+    if end is None:
+        end = os.path.getsize(path) - 1
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def iter_gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def iter_zstd(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zstandard.ZstdCompressor().compressobj()
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick zstd or gzip from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    if "zstd" in accepted and zstandard is not None:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def file_response(request: Request, path: str, media_type: str, download_name: str, compress: bool = True) -> StreamingResponse:
+    """Stream `path`, honouring Range/If-Range and Accept-Encoding."""
+    st = os.stat(path)
+    size = st.st_size
+    etag = f'"{st.st_mtime_ns:x}-{size:x}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="{download_name}"',
+    }
+
+    byte_range = parse_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range != etag:
+        # the client's partial copy is of an older file; send the whole thing
+        byte_range = None
+
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(iter_file(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if compress else None
+    headers["Vary"] = "Accept-Encoding"
+    if encoding is not None:
+        # an encoded body is a different representation of the file
+        headers["ETag"] = etag[:-1] + f'-{encoding}"'
+    if encoding == "zstd":
+        headers["Content-Encoding"] = "zstd"
+        return StreamingResponse(iter_zstd(iter_file(path)), media_type=media_type, headers=headers)
+    if encoding == "gzip":
+        headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(iter_gzip(iter_file(path)), media_type=media_type, headers=headers)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(iter_file(path), media_type=media_type, headers=headers)
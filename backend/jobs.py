@@ -0,0 +1,940 @@
+# jobs.py
+"""
+Model training off the event loop.
+
+Training requests run in a bounded process pool (TRAINING_WORKERS processes), so
+a slow SVM or MLP fit no longer blocks logins or previews served by the same
+API worker. `/dashboard/modelevaluation` still answers with the result once it
+is ready; `/dashboard/modelevaluation/jobs` returns a job id at once and the
+job's state (queued, running, done, failed) is kept in the `training_jobs` table
+for polling or the `/dashboard/jobs/{id}/events` stream.
+
+Pool processes load the dataset themselves, so only the request travels to
+them and only the result comes back. Results are saved to DefaultModel/Plot
+rows by the API process exactly as synchronous training did. SHAP explanations
+(`explain_cached`) run in the same pool and are cached in the API process.
+Hyperparameter searches (`submit(..., is_search=True)`) are jobs as well; their
+leaderboard is streamed while they run and the best configurations are saved
+as DefaultModel rows. Every trained model is saved as an artifact (ml.artifacts)
+by the pool process and referenced from its DefaultModel row; batch scoring
+jobs (`submit_scoring`) run a saved model over a file in the same pool.
+Requests identical to an earlier training run are answered from its saved
+result (memo) instead of being trained again. Model comparisons (`compare`)
+prepare their data once, assign one set of CV folds and fit every model in the
+pool at the same time.
+
+The dataset, preprocessing and linear statistics caches live in the pool
+processes, one of each per worker, so their memory budgets apply per worker
+(TRAINING_WORKERS times over in total). Prepared matrices are shared between
+workers through the preprocessing cache's files. Each worker reports its cache
+counters after every task; `cache_stats` gathers them.
+"""
+import asyncio
+import datetime
+import inspect
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import memo
+import ml
+import profiling
+import scoring
+import storage
+from ml import artifacts, explain, folds, linear_stats, parallel, search
+from ml.prep_cache import prep_cache
+from database import SessionLocal
+from dataset_cache import dataset_cache
+from models import Dataset, DefaultModel, Plot, TrainingJob, User
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+try:
+    TRAINING_WORKERS = max(1, int(os.environ.get("TRAINING_WORKERS", str(min(4, os.cpu_count() or 1)))))
+except Exception:
+    TRAINING_WORKERS = 1
+
+# how often the event stream checks a job for changes, in seconds
+EVENT_POLL_SECONDS = 0.5
+# leaderboard entries stored on a running search job
+LEADERBOARD_SIZE = 50
+try:
+    # prediction threads of one batch scoring job
+    SCORING_WORKERS = max(1, int(os.environ.get("SCORING_WORKERS", "4")))
+except Exception:
+    SCORING_WORKERS = 4
+# most models in one comparison
+MAX_COMPARE_MODELS = 12
+# holdout scores copied into a comparison, by classifier flag
+HOLDOUT_METRICS = {
+    True: ("accuracy", "precision", "recall", "f1", "roc_auc", "pr_auc"),
+    False: ("r2", "mse", "mae"),
+}
+
+# where pool processes report their cache counters, one directory per API process
+WORKER_STATS_DIR = os.environ.get("WORKER_STATS_DIR", os.path.join("cache", "workers"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_stats_dir: Optional[str] = None
+_pool_lock = threading.Lock()
+# in a pool process: the directory it reports its cache counters to
+_worker_stats_dir: Optional[str] = None
+# keeps running job tasks referenced until they finish
+_tasks: set = set()
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _init_worker(stats_dir: str, total: int, free, cond) -> None:
+    global _worker_stats_dir
+    _worker_stats_dir = stats_dir
+    parallel.use_shared_budget(total, free, cond)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_stats_dir
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads, which must not be forked
+            ctx = multiprocessing.get_context("spawn")
+            # one core budget for all pool processes, so concurrent jobs share the machine
+            free = ctx.RawValue("i", parallel.CORE_BUDGET)
+            cond = ctx.Condition()
+            # reports of an earlier pool's workers are gone with them
+            _pool_stats_dir = os.path.join(WORKER_STATS_DIR, str(os.getpid()))
+            shutil.rmtree(_pool_stats_dir, ignore_errors=True)
+            os.makedirs(_pool_stats_dir, exist_ok=True)
+            _pool = ProcessPoolExecutor(
+                max_workers=TRAINING_WORKERS,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(_pool_stats_dir, parallel.CORE_BUDGET, free, cond),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def shutdown() -> None:
+    _reset_pool()
+
+
+def _update_job(job_id: int, **fields) -> None:
+    db = SessionLocal()
+    try:
+        job = db.get(TrainingJob, job_id)
+        if job is not None:
+            for k, v in fields.items():
+                setattr(job, k, v)
+            db.commit()
+    finally:
+        db.close()
+
+
+def load_column_types(username, filename) -> dict:
+    # column type decisions stored with the profile (rebuilt with it when
+    # missing or stale), replayed by sanitize
+    profile = profiling.load_profile(username, filename)
+    return profile.get("column_types", {}) if profile is not None else {}
+
+
+def train_model(spec: dict) -> dict:
+    """
+    Run one training request. Called in a pool process; `spec` is built by
+    routes._training_spec. Returns {"result", "is_classifier"}.
+    """
+    if spec.get("job_id") is not None:
+        _update_job(spec["job_id"], status=RUNNING, started_at=_now())
+
+    manager = _make_manager(spec)
+    result = manager.train(spec["target"], spec["features"])
+    cv_results = getattr(manager, "cv_results", None)
+    if spec.get("fold_ids") is not None and cv_results:
+        # per-fold scores on the shared folds, for paired comparisons
+        result["cv_scores"] = {
+            name: [v if math.isfinite(v) else None for v in (m[name] for m in cv_results["metrics"])]
+            for name in cv_results["metrics"][0]
+        }
+    return {
+        "result": result,
+        "is_classifier": getattr(manager, "is_classifier", None),
+        "artifact": _save_artifact(spec, manager),
+    }
+
+
+def _save_artifact(spec: dict, manager: ml.ModelManager) -> Optional[str]:
+    # a model that cannot be saved is still a finished training run
+    try:
+        path = storage.artifact_path(spec["username"], uuid.uuid4().hex)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return artifacts.save(manager.artifact(), path)
+    except Exception as e:
+        print("Warning: failed to save model artifact:", e)
+        return None
+
+
+def _load_frame(spec: dict):
+    df = dataset_cache.load(spec["username"], spec["filename"], columns=spec["columns"])
+    if df is None:
+        raise ValueError("Dataset not found")
+    return df
+
+
+def _setup_manager(spec: dict, column_types: dict):
+    """Callable attaching the dataset state of `spec` to a manager."""
+    def setup(manager):
+        manager.column_types = column_types
+        # lets prepare_xy reuse matrices prepared for earlier models on this selection
+        manager.dataset_key = spec.get("dataset_key")
+        if spec.get("fold_ids") is not None:
+            # a comparison: every model uses the same CV folds
+            manager.fold_ids = np.asarray(spec["fold_ids"])
+        if spec.get("truth_spec"):
+            # attach to manager for use during prepare_xy/evaluation
+            try:
+                manager.truth_spec = spec["truth_spec"]
+            except Exception:
+                pass
+    return setup
+
+
+def _make_manager(spec: dict) -> ml.ModelManager:
+    # Instantiate manager and attach truth_spec if provided
+    manager = ml.models[spec["model"]](_load_frame(spec), spec["test_split"], **spec["params"])
+    _setup_manager(spec, load_column_types(spec["username"], spec["filename"]))(manager)
+    return manager
+
+
+def prepare_comparison(spec: dict) -> dict:
+    """
+    Prepare the data of a model comparison and assign its CV folds, in a pool
+    process. prepare_xy writes the prepared matrices to the preprocessing
+    cache directory, so the processes fitting the models memory-map them
+    instead of preparing their own. Returns {"fold_ids", "rows"}.
+    """
+    manager = _make_manager(spec)
+    _, y = manager.prepare_xy(spec["features"], spec["target"], classifier=spec["classifier"])
+    return {"fold_ids": folds.assign(y, spec["cv_folds"], spec["classifier"]), "rows": len(y)}
+
+
+def comparison_params(model: str, params: dict, cv_folds: int) -> dict:
+    """An entry's parameters with the comparison's fold count; out-of-bag scoring would skip the folds."""
+    accepted = inspect.signature(ml.models[model]).parameters
+    params = dict(params or {})
+    if "cv_folds" in accepted:
+        params["cv_folds"] = cv_folds
+    if "oob" in accepted:
+        params["oob"] = False
+    return params
+
+
+def fit_subsets(spec: dict) -> list[dict]:
+    """
+    Score spec["subsets"] of the selected features with linear regression
+    (LinRegManager.fit_subsets) in a pool process, best mean CV R² first.
+    """
+    manager = _make_manager(dict(spec, model="linear_regression"))
+    scored = manager.fit_subsets(spec["target"], spec["features"], spec["subsets"])
+    for row in scored:
+        for name in ("r2", "mse"):
+            if not math.isfinite(row[name]):
+                row[name] = None
+    return sorted(scored, key=lambda r: (r["cv_mean"].get("r2_mean") is None, -(r["cv_mean"].get("r2_mean") or 0.0)))
+
+
+def explain_model(spec: dict) -> dict:
+    """
+    Fit the holdout model of a training request (without cross-validation or
+    evaluation) and explain it with SHAP. Called in a pool process; `spec` is
+    a training spec with an "explain" dict of ml.explain options.
+    """
+    manager = _make_manager(spec)
+    manager.fit_only = True
+    manager.train(spec["target"], spec["features"])
+    return explain.explain(
+        manager.model,
+        manager.X_train,
+        manager.X_test,
+        feature_names=manager.feature_names,
+        **spec["explain"],
+    )
+
+
+def search_model(spec: dict) -> dict:
+    """
+    Run a hyperparameter search (ml.search) in a pool process. The leaderboard
+    is written to the job row after every rung, for the event stream. The best
+    `persist_top` configurations are then trained like a regular request.
+
+    Returns {"leaderboard", "best": [{"params", "score", "outcome"}]}.
+    """
+    job_id = spec.get("job_id")
+    if job_id is not None:
+        _update_job(job_id, status=RUNNING, started_at=_now())
+    opts = spec["search"]
+    s = search.Search(
+        ml.models[spec["model"]],
+        _load_frame(spec),
+        spec["target"],
+        spec["features"],
+        spec["test_split"],
+        params=spec["params"],
+        setup=_setup_manager(spec, load_column_types(spec["username"], spec["filename"])),
+        scoring=opts["scoring"],
+    )
+
+    def progress(leaderboard):
+        if job_id is not None:
+            _update_job(job_id, result={"leaderboard": leaderboard[:LEADERBOARD_SIZE]})
+
+    leaderboard = search.run(
+        s,
+        opts["space"],
+        method=opts["method"],
+        n_trials=opts["n_trials"],
+        eta=opts["eta"],
+        min_resource=opts["min_resource"],
+        max_trials=opts["max_trials"],
+        time_budget=opts["time_budget"],
+        on_progress=progress,
+    )
+    best = []
+    for trial in leaderboard[: opts["persist_top"]]:
+        if trial["score"] is None:
+            break
+        params = {**spec["params"], **trial["params"]}
+        outcome = train_model(dict(spec, params=params, job_id=None))
+        best.append({"params": params, "score": trial["score"], "outcome": outcome})
+    return {"leaderboard": leaderboard, "best": best}
+
+
+def score_batch(spec: dict) -> dict:
+    """
+    Score a file with a saved model (scoring.score_file) in a pool process.
+    Throughput is written to the job row after every chunk.
+    """
+    job_id = spec.get("job_id")
+    if job_id is not None:
+        _update_job(job_id, status=RUNNING, started_at=_now())
+
+    def progress(stats):
+        if job_id is not None:
+            _update_job(job_id, result=stats)
+
+    return scoring.score_file(
+        artifacts.load(spec["artifact"]),
+        spec["input"],
+        spec["output"],
+        keep_columns=spec.get("keep_columns"),
+        workers=SCORING_WORKERS,
+        on_progress=progress,
+    )
+
+
+def worker_cache_stats() -> dict:
+    """This process's cache counters."""
+    return {
+        "dataset_cache": dataset_cache.stats(),
+        "prep_cache": prep_cache.stats(),
+        "linear_stats": linear_stats.stats_cache.stats(),
+    }
+
+
+def _report_stats() -> None:
+    if _worker_stats_dir is None:
+        return
+    path = os.path.join(_worker_stats_dir, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(worker_cache_stats(), f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print("Warning: failed to report cache stats:", e)
+
+
+def _pool_task(fn, spec: dict):
+    # runs in a pool process
+    try:
+        return fn(spec)
+    finally:
+        _report_stats()
+
+
+def cache_stats() -> dict:
+    """
+    Cache counters of every training worker as of its last task, by pid, and
+    their sums (max_bytes included, which is the pool's total budget).
+    """
+    with _pool_lock:
+        stats_dir = _pool_stats_dir
+    workers: dict[str, dict] = {}
+    if stats_dir is not None and os.path.isdir(stats_dir):
+        for name in sorted(os.listdir(stats_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(stats_dir, name), "r") as f:
+                    workers[name[: -len(".json")]] = json.load(f)
+            except Exception:
+                continue
+    total: dict[str, dict] = {}
+    for stats in workers.values():
+        for cache, counters in stats.items():
+            summed = total.setdefault(cache, {})
+            for k, v in counters.items():
+                summed[k] = summed.get(k, 0) + v
+    return {"workers": workers, "total": total}
+
+
+async def _in_pool(fn, spec: dict):
+    try:
+        future = _get_pool().submit(_pool_task, fn, spec)
+    except BrokenProcessPool:
+        # a worker died (e.g. killed for memory); start a fresh pool
+        _reset_pool()
+        future = _get_pool().submit(_pool_task, fn, spec)
+    try:
+        return await asyncio.wrap_future(future)
+    except BrokenProcessPool:
+        _reset_pool()
+        raise RuntimeError("training worker exited unexpectedly")
+
+
+async def run(spec: dict) -> dict:
+    """Run a training request in the pool and wait for it without blocking the event loop."""
+    return await _in_pool(train_model, spec)
+
+
+async def compare(db: Session, user, spec: dict) -> dict:
+    """
+    Train every entry of spec["entries"] ({"model", "params"}) on the same
+    prepared data and CV folds, concurrently in the pool, and save each like a
+    regular request. Entries identical to an earlier comparison are answered by
+    memo unless the request sets "force_retrain". Returns the comparison
+    payload, entries ranked by their mean CV score.
+    """
+    prepared = await _in_pool(prepare_comparison, spec)
+    metric = "accuracy" if spec["classifier"] else "r2"
+    specs = [
+        dict(
+            spec,
+            model=entry["model"],
+            params=comparison_params(entry["model"], entry["params"], spec["cv_folds"]),
+            fold_ids=prepared["fold_ids"],
+        )
+        for entry in spec["entries"]
+    ]
+    force = spec["request"].get("force_retrain")
+    stored = [None if force else memo.lookup(db, user, s) for s in specs]
+    pending = {i: run(s) for i, (s, hit) in enumerate(zip(specs, stored)) if hit is None}
+    outcomes = dict(zip(pending, await asyncio.gather(*pending.values(), return_exceptions=True)))
+
+    models = []
+    for i, (s, hit) in enumerate(zip(specs, stored)):
+        outcome = outcomes.get(i)
+        row: dict[str, Any] = {"model": s["model"], "params": s["params"]}
+        if isinstance(outcome, BaseException):
+            models.append(dict(row, error=str(outcome), rank=None))
+            continue
+        if hit is not None:
+            result, model_id = stored_result(hit), hit.id
+        else:
+            result, model_id = save_training_result(db, user, s, outcome)
+        cv_mean = result.get("cv_mean") or {}
+        row.update({
+            "model_id": model_id,
+            "cached": hit is not None,
+            "score": cv_mean.get(f"{metric}_mean"),
+            "cv_mean": cv_mean,
+            "cv_std": result.get("cv_std") or {},
+            "cv_scores": result.get("cv_scores"),
+            "holdout": {k: result[k] for k in HOLDOUT_METRICS[spec["classifier"]] if k in result},
+        })
+        models.append(row)
+
+    ranked = sorted(
+        (m for m in models if m.get("score") is not None), key=lambda m: m["score"], reverse=True
+    )
+    for i, m in enumerate(ranked):
+        m["rank"] = i + 1
+    for m in models:
+        m.setdefault("rank", None)
+    return {
+        "metric": metric,
+        "classifier": spec["classifier"],
+        "cv_folds": spec["cv_folds"],
+        "rows": prepared["rows"],
+        "models": sorted(models, key=lambda m: (m["rank"] is None, m["rank"] or 0)),
+    }
+
+
+async def run_subsets(spec: dict) -> list[dict]:
+    """Feature-subset sweep of a training spec, in the pool."""
+    return await _in_pool(fit_subsets, spec)
+
+
+async def explain_cached(spec: dict) -> dict:
+    """Explanation for a training spec, computed in the pool unless it is cached."""
+    training = {k: v for k, v in spec.items() if k not in ("request", "username", "explain")}
+    key = explain.make_key(dict(training, user=spec["username"]), spec["explain"])
+    cached = explain.explanation_cache.get(key)
+    if cached is not None:
+        return dict(cached, cached=True)
+    explanation = await _in_pool(explain_model, spec)
+    explain.explanation_cache.put(key, explanation)
+    return dict(explanation, cached=False)
+
+
+def build_plot_data(result: dict) -> list:
+    """
+    Structured numeric plot descriptors for the client to render (the server no
+    longer renders PNGs).
+    """
+    plot_data = []
+
+    try:
+        if "roc_curve" in result:
+            rc = result["roc_curve"]
+            # rc may be binary {fpr:..., tpr:...} or multiclass {classes: [...], fpr: [...], tpr: [...]}.
+            if isinstance(rc, dict) and rc.get('classes') and isinstance(rc.get('fpr'), list):
+                plot_data.append({
+                    "name": "ROC Curve (per-class)",
+                    "key": "roc_curve",
+                    "type": "roc",
+                    "data": {"classes": rc.get('classes', []), "fpr": rc.get('fpr', []), "tpr": rc.get('tpr', []), "auc": result.get("roc_auc")},
+                })
+            else:
+                plot_data.append({
+                    "name": "ROC Curve",
+                    "key": "roc_curve",
+                    "type": "roc",
+                    "data": {"fpr": rc.get("fpr", []), "tpr": rc.get("tpr", []), "auc": result.get("roc_auc")},
+                })
+    except Exception:
+        pass
+
+    try:
+        if "pr_curve" in result:
+            pr = result["pr_curve"]
+            plot_data.append({
+                "name": "Precision-Recall Curve",
+                "key": "pr_curve",
+                "type": "pr",
+                "data": {"precision": pr.get("precision", []), "recall": pr.get("recall", []), "ap": result.get("pr_auc")},
+            })
+    except Exception:
+        pass
+
+    try:
+        if "confusion_matrix" in result:
+            cm = result["confusion_matrix"]
+            # Ensure it's a list of lists (JSON serializable)
+            plot_data.append({
+                "name": "Confusion Matrix",
+                "key": "confusion_matrix",
+                "type": "confusion_matrix",
+                "data": {"matrix": cm},
+            })
+    except Exception:
+        pass
+
+    try:
+        if "learning_curve" in result:
+            lc = result["learning_curve"]
+            plot_data.append({
+                "name": "Learning Curve",
+                "key": "learning_curve",
+                "type": "learning_curve",
+                "data": {
+                    "train_sizes": lc.get("train_sizes", []),
+                    "train_scores_mean": lc.get("train_scores_mean", []),
+                    "test_scores_mean": lc.get("test_scores_mean", []),
+                },
+            })
+    except Exception:
+        pass
+
+    try:
+        if "complexity_curve" in result:
+            cc = result["complexity_curve"]
+            plot_data.append({
+                "name": "Model Complexity Curve",
+                "key": "complexity_curve",
+                "type": "complexity_curve",
+                "data": {
+                    "param": cc.get("param"),
+                    "values": cc.get("values", []),
+                    "train_scores_mean": cc.get("train_scores_mean", []),
+                    "test_scores_mean": cc.get("test_scores_mean", []),
+                },
+            })
+    except Exception:
+        pass
+
+    try:
+        if "pruning_path" in result:
+            pp = result["pruning_path"]
+            plot_data.append({
+                "name": "Pruning Path",
+                "key": "pruning_path",
+                "type": "complexity_curve",
+                "data": {
+                    "param": pp.get("param"),
+                    "values": pp.get("values", []),
+                    "train_scores_mean": pp.get("train_scores_mean", []),
+                    "test_scores_mean": pp.get("test_scores_mean", []),
+                },
+            })
+    except Exception:
+        pass
+
+    try:
+        if "regularization_path" in result:
+            rp = result["regularization_path"]
+            plot_data.append({
+                "name": "Regularization Path",
+                "key": "regularization_path",
+                "type": "regularization_path",
+                "data": {
+                    "C": rp.get("C", []),
+                    "accuracy_mean": rp.get("accuracy_mean", []),
+                    "accuracy_std": rp.get("accuracy_std", []),
+                    "best_C": rp.get("best_C"),
+                },
+            })
+    except Exception:
+        pass
+
+    try:
+        if "feature_importance" in result:
+            fi = result["feature_importance"]
+            plot_data.append({
+                "name": "Feature Importance",
+                "key": "feature_importance",
+                "type": "feature_importance",
+                "data": fi,
+            })
+    except Exception:
+        pass
+
+    try:
+        if "shap_summary" in result:
+            ss = result["shap_summary"]
+            plot_data.append({
+                "name": "SHAP Summary",
+                "key": "shap_summary",
+                "type": "shap_summary",
+                "data": ss,
+            })
+    except Exception:
+        pass
+
+    return plot_data
+
+
+def _is_classifier(model_name: str, saved_params: dict, result: dict, flag: Optional[bool] = None) -> bool:
+    # Determine is_classifier: prefer explicit flags on manager or parameters; fallback to heuristics
+    try:
+        # if parameters provided by frontend include a classifier flag
+        if isinstance(saved_params, dict) and saved_params.get("classifier") is not None:
+            return bool(saved_params.get("classifier"))
+        # if manager has an attribute, prefer that
+        if flag is not None:
+            return bool(flag)
+        # fallback: if ROC was computed, treat as classifier
+        if "roc_auc" in result or "roc_curve" in result:
+            return True
+        # heuristics from model name
+        mn = str(model_name).lower()
+        return any(k in mn for k in ["logistic", "svc", "svm", "forest", "random", "decision", "bagging", "boosting", "classifier", "neural", "dnn"])
+    except Exception:
+        return False
+
+
+def save_training_result(db: Session, user, spec: dict, outcome: dict) -> tuple[dict, int]:
+    """
+    Store a finished training run as a DefaultModel row plus its plots and
+    return (response payload, model id).
+    """
+    result = outcome["result"]
+    model_name = spec["model"]
+    filename = spec["filename"]
+    model_params = spec["params"]
+    truth_spec = spec.get("truth_spec")
+
+    # Save configuration and results
+    # include truth_spec in saved parameters for reproducibility
+    saved_params = dict(model_params) if isinstance(model_params, dict) else {}
+    if truth_spec:
+        saved_params['truth_spec'] = truth_spec
+
+    model_entry = DefaultModel(
+        user_id=user.id,
+        dataset=filename,
+        model_type=model_name,
+        parameters=saved_params,
+        metrics=result,
+        artifact=outcome.get("artifact"),
+        created_at=datetime.datetime.utcnow()
+    )
+
+    db.add(model_entry)
+    db.commit()
+    db.refresh(model_entry)
+
+    # find dataset record (create if missing)
+    dataset = db.query(Dataset).filter(Dataset.filename == filename, Dataset.owner_id == user.id).first()
+    if dataset is None:
+        # create dataset record if absent (keeps compatibility)
+        dataset = Dataset(filename=filename, owner_id=user.id)
+        db.add(dataset)
+        db.commit()
+        db.refresh(dataset)
+
+    plot_data = build_plot_data(result)
+
+    # Keep `plots` empty for compatibility with older frontends that expect image ids.
+    saved_plots = []
+    try:
+        for pd_item in plot_data:
+            plot = Plot(user_id=user.id, dataset_id=dataset.id, name=pd_item.get("key") or pd_item.get("name"), data=pd_item, image=None)
+            db.add(plot)
+            db.commit()
+            db.refresh(plot)
+            saved_plots.append({"id": plot.id, "name": plot.name})
+    except Exception as e:
+        # If saving fails, continue but leave saved_plots as-is
+        print("Warning: failed to save plots to DB:", e)
+
+    result["plots"] = saved_plots
+    result["plot_data"] = plot_data
+
+    # Attach model metadata so frontend can render appropriately
+    result["parameters"] = saved_params
+    result["model_type"] = model_name
+
+    result["is_classifier"] = _is_classifier(model_name, saved_params, result, outcome.get("is_classifier"))
+
+    memo.remember(db, user, spec, model_entry.id)
+    return result, model_entry.id
+
+
+def stored_result(model: DefaultModel) -> dict:
+    """The response payload of a saved model, as save_training_result returned it."""
+    result = dict(model.metrics or {})
+    saved_params = model.parameters or {}
+    result["plots"] = []
+    result["plot_data"] = build_plot_data(result)
+    result["parameters"] = saved_params
+    result["model_type"] = model.model_type
+    result["is_classifier"] = _is_classifier(model.model_type, saved_params, result)
+    result["model_id"] = model.id
+    result["cached"] = True
+    return result
+
+
+def job_dict(job: TrainingJob) -> dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "dataset": job.dataset,
+        "model_type": job.model_type,
+        "model_id": job.model_id,
+        "error": job.error,
+        "result": job.result if job.status == DONE else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def _run_job(job_id: int, user_id: int, spec: dict) -> None:
+    try:
+        outcome = await run(spec)
+    except Exception as e:
+        _update_job(job_id, status=FAILED, error=str(e), finished_at=_now())
+        return
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        result, model_id = save_training_result(db, user, spec, outcome)
+        job = db.get(TrainingJob, job_id)
+        job.status = DONE
+        job.result = result
+        job.model_id = model_id
+        job.finished_at = _now()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        _update_job(job_id, status=FAILED, error=f"saving results failed: {e}", finished_at=_now())
+    finally:
+        db.close()
+
+
+async def _run_search_job(job_id: int, user_id: int, spec: dict) -> None:
+    try:
+        outcome = await _in_pool(search_model, spec)
+    except Exception as e:
+        _update_job(job_id, status=FAILED, error=str(e), finished_at=_now())
+        return
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        best_models = []
+        for best in outcome["best"]:
+            _, model_id = save_training_result(db, user, dict(spec, params=best["params"]), best["outcome"])
+            best_models.append({"model_id": model_id, "params": best["params"], "score": best["score"]})
+        job = db.get(TrainingJob, job_id)
+        job.status = DONE
+        job.result = {"leaderboard": outcome["leaderboard"], "best_models": best_models}
+        job.model_id = best_models[0]["model_id"] if best_models else None
+        job.finished_at = _now()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        _update_job(job_id, status=FAILED, error=f"saving results failed: {e}", finished_at=_now())
+    finally:
+        db.close()
+
+
+async def _run_scoring_job(job_id: int, user_id: int, spec: dict) -> None:
+    try:
+        outcome = await _in_pool(score_batch, spec)
+        _update_job(
+            job_id,
+            status=DONE,
+            result=dict(outcome, download=f"/dashboard/jobs/{job_id}/download"),
+            finished_at=_now(),
+        )
+    except Exception as e:
+        _update_job(job_id, status=FAILED, error=str(e), finished_at=_now())
+    finally:
+        if spec.get("remove_input") and os.path.exists(spec["input"]):
+            os.remove(spec["input"])
+
+
+def _start(runner, job: TrainingJob, user, spec: dict) -> None:
+    task = asyncio.get_running_loop().create_task(runner(job.id, user.id, dict(spec, job_id=job.id)))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def submit_scoring(db: Session, user, model: DefaultModel, spec: dict) -> TrainingJob:
+    """
+    Record a queued batch scoring job for a saved model and start it. `spec`
+    has "input" (file to score), "request", optional "keep_columns" and
+    "remove_input" (delete the input afterwards, for uploads).
+    """
+    job = TrainingJob(
+        user_id=user.id,
+        dataset=os.path.basename(spec["input"]),
+        model_type=model.model_type,
+        model_id=model.id,
+        status=QUEUED,
+        request=spec["request"],
+        created_at=_now(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    spec = dict(spec, artifact=model.artifact, output=storage.scoring_output_path(user.username, job.id))
+    _start(_run_scoring_job, job, user, spec)
+    return job
+
+
+def submit(db: Session, user, spec: dict, is_search: bool = False) -> TrainingJob:
+    """
+    Record a queued job and start it in the pool; returns immediately. With
+    `is_search`, the job is a hyperparameter search described by spec["search"].
+    A training request identical to an earlier one (see memo) is recorded as
+    done at once with the stored result, unless the request sets "force_retrain".
+    """
+    job = TrainingJob(
+        user_id=user.id,
+        dataset=spec["filename"],
+        model_type=spec["model"],
+        status=QUEUED,
+        request=spec["request"],
+        created_at=_now(),
+    )
+    stored = None if is_search or spec["request"].get("force_retrain") else memo.lookup(db, user, spec)
+    if stored is not None:
+        job.status = DONE
+        job.result = stored_result(stored)
+        job.model_id = stored.id
+        job.started_at = job.finished_at = job.created_at
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if stored is not None:
+        return job
+    _start(_run_search_job if is_search else _run_job, job, user, spec)
+    return job
+
+
+async def job_events(job_id: int):
+    """
+    Server-sent events: one `status` event per state change, ending once the
+    job finishes. Searches also send a `progress` event with the current
+    leaderboard after every rung, batch scoring jobs with their throughput
+    after every chunk.
+    """
+    last = None
+    last_progress = None
+    while True:
+        db = SessionLocal()
+        try:
+            job = db.get(TrainingJob, job_id)
+            payload = job_dict(job) if job is not None else None
+            progress = job.result if job is not None and job.status == RUNNING else None
+        finally:
+            db.close()
+        if payload is None:
+            return
+        if payload["status"] != last:
+            last = payload["status"]
+            yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+        if progress is not None and progress != last_progress:
+            last_progress = progress
+            yield f"event: progress\ndata: {json.dumps(dict(progress, job_id=job_id))}\n\n"
+        if last in FINISHED:
+            return
+        await asyncio.sleep(EVENT_POLL_SECONDS)
+
+
+def fail_interrupted() -> int:
+    """Mark jobs left queued or running by a previous server process as failed."""
+    db = SessionLocal()
+    try:
+        n = (
+            db.query(TrainingJob)
+            .filter(TrainingJob.status.in_([QUEUED, RUNNING]))
+            .update({"status": FAILED, "error": "interrupted by server restart", "finished_at": _now()}, synchronize_session=False)
+        )
+        db.commit()
+        return n
+    finally:
+        db.close()
@@ -1,10 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import Base, engine
+from database import Base, add_missing_columns, engine
+import jobs
 import routes
 import auth_routes
 
 Base.metadata.create_all(bind=engine)
+add_missing_columns()
+# training jobs do not survive a restart
+jobs.fail_interrupted()
 
 app = FastAPI()
 # Enable CORS for your Vue dev server
@@ -17,3 +21,8 @@ app.add_middleware(
 
 app.include_router(routes.router)
 app.include_router(auth_routes.router)
+
+
+@app.on_event("shutdown")
+def stop_training_pool():
+    jobs.shutdown()
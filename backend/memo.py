@@ -0,0 +1,109 @@
+# memo.py
+"""
+Training result memoization.
+
+A training request's fingerprint hashes everything its result depends on:
+the dataset content hash, model, features, target, test_split, truth_spec, the
+manager's parameters with its defaults filled in (so random_state is always
+part of it) and the versions of the libraries that train. `training_fingerprints`
+maps fingerprints to the DefaultModel saved for them, so an identical request
+is answered from the stored metrics instead of being trained again.
+"""
+import datetime
+import hashlib
+import inspect
+import json
+import platform
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sqlalchemy.orm import Session
+
+import ml
+from ml.prep_cache import normalize_truth_spec
+from models import DefaultModel, TrainingFingerprint
+
+
+def library_versions() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def _normalize(value: Any) -> Any:
+    # 1 and 1.0 configure the same model
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return str(value)
+
+
+def effective_params(model: str, params: dict) -> dict:
+    """`params` with the manager's defaults for everything not given."""
+    defaults = {}
+    for name, p in inspect.signature(ml.models[model]).parameters.items():
+        if name not in ("dataframe", "test_split") and p.default is not inspect.Parameter.empty:
+            defaults[name] = p.default
+    return _normalize({**defaults, **(params or {})})
+
+
+def fingerprint(spec: dict) -> Optional[str]:
+    """Fingerprint of a training spec (routes._training_spec), or None without a dataset hash."""
+    if not spec.get("dataset_key"):
+        return None
+    payload = {
+        "dataset": spec["dataset_key"],
+        "model": spec["model"],
+        "features": [str(f) for f in spec["features"]],
+        "target": str(spec["target"]),
+        "test_split": _normalize(spec["test_split"]),
+        "truth_spec": normalize_truth_spec(spec.get("truth_spec")),
+        "params": effective_params(spec["model"], spec["params"]),
+        "versions": library_versions(),
+    }
+    if spec.get("fold_ids") is not None:
+        # trained in a comparison, on its shared folds
+        payload["folds"] = hashlib.sha256(np.asarray(spec["fold_ids"], dtype="int64").tobytes()).hexdigest()
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def lookup(db: Session, user, spec: dict) -> Optional[DefaultModel]:
+    """The model saved for an identical earlier request of `user`, if it still exists."""
+    key = fingerprint(spec)
+    if key is None:
+        return None
+    return (
+        db.query(DefaultModel)
+        .join(TrainingFingerprint, TrainingFingerprint.model_id == DefaultModel.id)
+        .filter(TrainingFingerprint.user_id == user.id, TrainingFingerprint.fingerprint == key)
+        .order_by(TrainingFingerprint.created_at.desc())
+        .first()
+    )
+
+
+def remember(db: Session, user, spec: dict, model_id: int) -> None:
+    """Point the request's fingerprint at `model_id` (replacing an earlier model)."""
+    key = fingerprint(spec)
+    if key is None:
+        return
+    entry = (
+        db.query(TrainingFingerprint)
+        .filter(TrainingFingerprint.user_id == user.id, TrainingFingerprint.fingerprint == key)
+        .first()
+    )
+    if entry is None:
+        entry = TrainingFingerprint(user_id=user.id, fingerprint=key)
+        db.add(entry)
+    entry.model_id = model_id
+    entry.created_at = datetime.datetime.utcnow()
+    db.commit()
@@ -1,41 +1,133 @@
-from abc import ABCMeta, abstractmethod
+from abc import ABC, abstractmethod
 from typing import Any, Optional
+import functools
+import inspect
 import os
 
 import numpy as np
 import pandas as pd
 import pandas.api.types as ptypes
-from sklearn.metrics import confusion_matrix
+from pandas.tseries.api import guess_datetime_format
+from sklearn.metrics import (
+    accuracy_score,
+    confusion_matrix,
+    f1_score,
+    mean_absolute_error,
+    mean_squared_error,
+    precision_score,
+    r2_score,
+    recall_score,
+)
 from sklearn.model_selection import learning_curve
 from sklearn.preprocessing import StandardScaler
 
-try:
-    import shap  # optional
-except Exception:
-    shap = None
+from . import folds, parallel
+from .predictions import PredictionCache
+from .prep_cache import make_key, prep_cache
+
+
+def _copy_on_write(method):
+    # column selections and casts in `method` share memory with the source frame
+    # until something is written, instead of copying the whole dataset at every
+    # step; the option is only set while it runs, not for every pandas user
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with pd.option_context("mode.copy_on_write", True):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+# categorical vocabularies larger than this are not stored in the dataset schema;
+# such columns are still known to be categorical, their codes are computed on use
+MAX_STORED_CATEGORIES = 10_000
+
+
+def infer_column_type(series: pd.Series, n_rows: int) -> tuple[dict[str, Any], pd.Series]:
+    """
+    Decide how an object column is turned into numbers: datetime (when at least
+    half of `n_rows` parse), numeric (when anything parses) or categorical codes.
+
+    Returns (decision, converted series). `decision` is JSON-serializable and can
+    be replayed with `apply_column_type`.
+    """
+    # try parse datetime (prefer datetimes only if a reasonable fraction parse)
+    try:
+        parsed = pd.to_datetime(series, errors="coerce")
+        if parsed.notna().sum() >= max(1, int(0.5 * n_rows)):
+            first = series.dropna()
+            fmt = guess_datetime_format(str(first.iloc[0])) if len(first) else None
+            return {"kind": "datetime", "format": fmt}, parsed
+    except Exception:
+        pass
+
+    # try numeric coercion
+    coerced = pd.to_numeric(series, errors="coerce")
+    if coerced.notna().sum() > 0:
+        return {"kind": "numeric"}, coerced
 
+    # fallback to categorical codes (codes may be -1 for NaN; ensure int64)
+    cats = pd.Categorical(series)
+    decision: dict[str, Any] = {"kind": "category"}
+    if len(cats.categories) <= MAX_STORED_CATEGORIES:
+        decision["categories"] = [c.item() if hasattr(c, "item") else c for c in cats.categories]
+    return decision, pd.Series(cats.codes, index=series.index, dtype="int64")
 
-class ModelManager(metaclass=ABCMeta):
+
+def apply_column_type(series: pd.Series, decision: dict[str, Any]) -> pd.Series:
+    """Convert an object column according to a decision from `infer_column_type`."""
+    kind = decision.get("kind")
+    if kind == "datetime":
+        fmt = decision.get("format")
+        try:
+            return pd.to_datetime(series, format=fmt, errors="coerce")
+        except (TypeError, ValueError):
+            return pd.to_datetime(series, errors="coerce")
+    if kind == "numeric":
+        return pd.to_numeric(series, errors="coerce")
+    if kind == "category":
+        cats = pd.Categorical(series, categories=decision.get("categories"))
+        return pd.Series(cats.codes, index=series.index, dtype="int64")
+    return infer_column_type(series, len(series))[1]
+
+
+class ModelManager(ABC):
     def __init__(self, dataframe: pd.DataFrame, test_split: int):
-        # store a raw copy of the dataframe; per-model training will sanitize features
-        # and handle the target column explicitly via prepare_xy
-        self.df = dataframe.copy()
+        # keep a reference to the raw dataframe; with copy-on-write nothing done by
+        # sanitize / prepare_xy can modify the caller's frame
+        self.df = dataframe
         self.test_split = test_split / 100
 
     @abstractmethod
     def train(self, target, features, *args, **kwargs) -> dict[str, Any]:
         pass
 
+    @abstractmethod
+    def estimator(self):
+        """Unfitted sklearn estimator for this manager's parameters (used by ml.search)."""
+
+    @classmethod
+    def check_params(cls, params: dict) -> None:
+        """Raise TypeError for parameters the manager does not take, without building it."""
+        inspect.signature(cls).bind(None, 100, **params)
+
+    @classmethod
+    def classifies(cls, params: dict) -> bool:
+        """Whether the manager is a classifier with `params` (its `classifier` flag by default)."""
+        default = inspect.signature(cls).parameters.get("classifier")
+        return bool(params.get("classifier", default.default if default is not None else False))
+
+    @_copy_on_write
     def sanitize(
-        self, df: Optional[pd.DataFrame] = None, drop_threshold: float = 0.5
+        self, df: Optional[pd.DataFrame] = None, drop_threshold: float = 0.5, reset_index: bool = True
     ) -> pd.DataFrame:
         if df is None:
             # if called before self.df exists, just return an empty DataFrame defensive
             df = getattr(self, "df", pd.DataFrame())
-        df = df.copy()
 
-        # Drop duplicate rows
-        df = df.drop_duplicates().reset_index(drop=True)
+        # Drop duplicate rows (only materializes a new frame when there are any)
+        dup = df.duplicated()
+        if dup.any():
+            df = df[~dup]
 
         # Drop columns with too many missing values
         if len(df) > 0:
@@ -44,28 +136,24 @@ class ModelManager(metaclass=ABCMeta):
                 thresh = 1
             df = df.dropna(axis=1, thresh=thresh)
 
-        # Process object columns: try datetime -> numeric -> categorical codes
+        # Process object columns: apply the type decision stored at upload when
+        # there is one, otherwise infer datetime -> numeric -> categorical codes
+        column_types = getattr(self, "column_types", None) or {}
         obj_cols = df.select_dtypes(include=["object"]).columns.tolist()
+        # every column's decision is kept so new rows can be converted the same way
+        decisions: dict[str, dict] = {}
+        for col in df.columns:
+            if ptypes.is_datetime64_any_dtype(df[col]):
+                decisions[str(col)] = {"kind": "datetime", "format": None}
+            elif col not in obj_cols:
+                decisions[str(col)] = {"kind": "numeric"}
         for col in obj_cols:
-            series = df[col]
-            # try parse datetime (prefer datetimes only if a reasonable fraction parse)
-            try:
-                parsed = pd.to_datetime(series, errors="coerce")
-                if parsed.notna().sum() >= max(1, int(0.5 * len(df))):
-                    df[col] = parsed
-                    continue
-            except Exception:
-                pass
-
-            # try numeric coercion
-            coerced = pd.to_numeric(series, errors="coerce")
-            if coerced.notna().sum() > 0:
-                df[col] = coerced
+            decision = column_types.get(col)
+            if decision:
+                df[col] = apply_column_type(df[col], decision)
             else:
-                # fallback to categorical codes (ensure integer dtype)
-                codes = pd.Categorical(series).codes
-                # convert codes (which may be -1 for NaN) to int64
-                df[col] = pd.Series(codes, index=df.index, dtype="int64")
+                decision, df[col] = infer_column_type(df[col], len(df))
+            decisions[str(col)] = decision
 
         # Ensure datetime columns are native numpy datetime64[ns]
         for col in df.columns:
@@ -88,23 +176,27 @@ class ModelManager(metaclass=ABCMeta):
         # Normalize numeric dtypes to float64 to avoid nullable-int / float promotion issues
         num_cols = [c for c in df.columns if ptypes.is_numeric_dtype(df[c])]
         if num_cols:
-            df[num_cols] = (
-                df[num_cols].apply(pd.to_numeric, errors="coerce").astype("float64")
-            )
+            # columns are numeric already, so a plain cast is enough
+            df[num_cols] = df[num_cols].astype("float64")
 
         # Fill numeric NaNs with column mean (after conversion to float64)
+        fill: dict[str, float] = {}
         for col in num_cols:
+            try:
+                mean_val = float(df[col].mean(skipna=True))
+            except Exception:
+                mean_val = 0.0
+            fill[str(col)] = mean_val if np.isfinite(mean_val) else 0.0
             if df[col].isna().any():
-                try:
-                    mean_val = float(df[col].mean(skipna=True))
-                except Exception:
-                    mean_val = 0.0
                 df[col] = df[col].fillna(mean_val)
+        self.sanitize_state = {"columns": [str(c) for c in df.columns], "column_types": decisions, "fill": fill}
 
-        # Reset index and return
-        df = df.reset_index(drop=True)
+        # Reset index and return; prepare_xy keeps the labels to align the target
+        if reset_index:
+            df = df.reset_index(drop=True)
         return df
 
+    @_copy_on_write
     def prepare_xy(self, features: list[str], target: str, classifier: bool | None = None):
         """
         Prepare X (features) and y (target) for training.
@@ -119,17 +211,32 @@ class ModelManager(metaclass=ABCMeta):
 
         Returns (X, y) where X is a 2D numpy-compatible array / DataFrame and y is a
         1-D pandas Series (numeric dtypes).
+
+        When the manager has a `dataset_key` (content hash of the dataset), the
+        result is served from / stored in the shared preprocessing cache.
         """
         if target not in self.df.columns:
             raise ValueError(f"Target column '{target}' not found in dataframe")
 
-        # Work on copies
-        X_df = self.df[features].copy()
-        y_s = self.df[target].copy()
+        dataset_key = getattr(self, "dataset_key", None)
+        cache_key = None
+        if dataset_key:
+            cache_key = make_key(dataset_key, features, target, classifier, getattr(self, "truth_spec", None))
+            cached = prep_cache.get(cache_key)
+            if cached is not None:
+                X_arr, columns, y_arr = cached
+                self.transform = prep_cache.transform(cache_key)
+                return pd.DataFrame(X_arr, columns=columns, copy=False), pd.Series(y_arr, copy=False)
+
+        # Column selections are lazy under copy-on-write
+        X_df = self.df[features]
+        y_s = self.df[target]
 
         # Sanitize only the feature frame (this will coerce datetimes/numerics/categoricals)
-        X_df = self.sanitize(X_df)
-        y_s = y_s.loc[X_df.index]
+        X_df = self.sanitize(X_df, reset_index=False)
+        if len(X_df) != len(y_s):
+            # duplicate feature rows were dropped; keep the matching targets
+            y_s = y_s.loc[X_df.index]
         # Decide how to treat target
         # If classifier flag not provided, infer from dtype: object or categorical -> classifier
         if classifier is None:
@@ -183,6 +290,7 @@ class ModelManager(metaclass=ABCMeta):
                 print('Warning: failed to apply truth_spec:', e)
 
         # Handle classification targets: map to integer codes if necessary
+        labels = None
         if inferred_classifier:
             # If it's numeric already but continuous, we still coerce to categorical
             if not ptypes.is_integer_dtype(y_s):
@@ -199,6 +307,7 @@ class ModelManager(metaclass=ABCMeta):
                     # convert to categorical codes
                     cats = pd.Categorical(y_s)
                     y_s = pd.Series(cats.codes, index=y_s.index, dtype="int64")
+                    labels = [c.item() if hasattr(c, "item") else c for c in cats.categories]
         else:
             # Regression target: coerce to numeric float and fill NaNs with mean
             y_num = pd.to_numeric(y_s, errors="coerce")
@@ -210,22 +319,127 @@ class ModelManager(metaclass=ABCMeta):
                 y_num = y_num.fillna(mean_val)
             y_s = y_num.astype("float64")
 
-        # Ensure X and y indices align and return
-        X_df = X_df.reset_index(drop=True)
         # --- Feature scaling: scale numeric features for all models ---
+        # Features are copied once into a C-contiguous float64 matrix, which is
+        # scaled in place and handed to the estimators as is.
+        scale = None
         try:
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X_df.values)
-            # reconstruct DataFrame to keep column names
-            X_df = pd.DataFrame(X_scaled, columns=X_df.columns, index=X_df.index)
+            X = np.empty((len(X_df), X_df.shape[1]), dtype="float64")
+            for j, col in enumerate(X_df.columns):
+                X[:, j] = X_df[col].to_numpy(dtype="float64")
+            scaler = StandardScaler(copy=False)
+            scaler.fit_transform(X)
+            scale = {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()}
             # replace any inf/nan introduced by zero-variance columns
-            X_df = X_df.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+            np.nan_to_num(X, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+            X_df = pd.DataFrame(X, columns=X_df.columns, copy=False)
         except Exception as e:
             # if scaling fails, fall back to unscaled features but do not crash
             print("Feature scaling failed, proceeding with unscaled features:", e)
+            X_df = X_df.reset_index(drop=True)
         y_s = y_s.reset_index(drop=True)
+
+        # everything needed to turn new rows into X the same way (see ml.artifacts)
+        self.transform = {
+            **self.sanitize_state,
+            "features": [str(f) for f in features],
+            "scale": scale,
+            "target": str(target),
+            "classifier": inferred_classifier,
+            "truth_spec": truth_spec if inferred_classifier else None,
+            "labels": labels,
+        }
+        if cache_key is not None:
+            # spilled so the other training processes map it instead of preparing their own
+            prep_cache.put(
+                cache_key, X_df.to_numpy(dtype="float64"), list(X_df.columns), y_s.to_numpy(), spill=True, transform=self.transform
+            )
         return X_df, y_s
 
+    def artifact(self) -> dict[str, Any]:
+        """
+        The fitted holdout model and the preprocessing that produced its input,
+        for ml.artifacts. Managers that transform X or y once more before the
+        holdout fit set `holdout_scaler` / `holdout_classes`.
+        """
+        return {
+            "model": self.model,
+            "transform": getattr(self, "transform", None),
+            "scaler": getattr(self, "holdout_scaler", None),
+            "classes": getattr(self, "holdout_classes", None),
+        }
+
+    def splitter(self, cv, rows=None):
+        """
+        `cv`, or the shared fold assignment when the manager was given one
+        (`self.fold_ids`, see folds.assign). `rows` selects the assignment of
+        the rows kept from the prepared data.
+        """
+        fold_ids = getattr(self, "fold_ids", None)
+        if fold_ids is None or isinstance(cv, folds.FixedSplits):
+            return cv
+        fold_ids = np.asarray(fold_ids)
+        return folds.FixedSplits(fold_ids if rows is None else fold_ids[rows])
+
+    def cross_validate(self, estimator, X, y, cv, classifier: bool) -> tuple[dict, dict]:
+        """
+        Cross-validate `estimator` with folds fanned out over the core budget.
+        Returns (cv_mean, cv_std); both are empty if cross-validation fails.
+
+        The fitted fold estimators and out-of-fold predictions are kept in
+        `self.cv_results` for evaluate_model.
+        """
+        if getattr(self, "fit_only", False):
+            # only the holdout model is wanted (e.g. to explain it)
+            self.cv_results = None
+            return {}, {}
+        try:
+            self.cv_results = folds.run_folds(estimator, X, y, self.splitter(cv), classifier)
+        except Exception:
+            self.cv_results = None
+            return {}, {}
+        return self.cv_results["cv_mean"], self.cv_results["cv_std"]
+
+    def out_of_bag(self, model, y_train, classifier: bool) -> dict[str, Any]:
+        """
+        Out-of-bag evaluation of `model` (a bagging ensemble fitted with
+        oob_score=True) in place of cross-validation. The out-of-bag scores
+        serve evaluate_model's ROC/PR curves as out-of-fold scores would.
+        "row_positions" are positions in the training rows and "predictions"
+        the out-of-bag prediction for each.
+        """
+        self.cv_results = None
+        oob = self.oob_results = folds.oob_results(model, y_train, classifier)
+        return {
+            "score": oob["score"],
+            "rows": oob["rows"],
+            **oob["metrics"],
+            "row_positions": oob["positions"].tolist(),
+            "predictions": np.asarray(oob["pred"]).tolist(),
+        }
+
+    def predict(self, model, X, method: str = "predict"):
+        """`model.<method>(X)`, computed once per (model, X) for this manager."""
+        if getattr(self, "predictions", None) is None:
+            self.predictions = PredictionCache()
+        return self.predictions.get(model, X, method)
+
+    def holdout_metrics(self, model, X_test, y_test, classifier: bool) -> dict[str, Any]:
+        """Holdout scores from the cached predictions; AUCs and curves come from evaluate_model."""
+        y_pred = self.predict(model, X_test)
+        if classifier:
+            return {
+                "accuracy": float(accuracy_score(y_test, y_pred)),
+                "precision": float(precision_score(y_test, y_pred, average="macro", zero_division=0)),
+                "recall": float(recall_score(y_test, y_pred, average="macro", zero_division=0)),
+                "f1": float(f1_score(y_test, y_pred, average="macro", zero_division=0)),
+            }
+        return {
+            "r2": float(r2_score(y_test, y_pred)),
+            "mse": float(mean_squared_error(y_test, y_pred)),
+            "mae": float(mean_absolute_error(y_test, y_pred)),
+        }
+
     def evaluate_model(
     self,
     model,
@@ -237,16 +451,27 @@ class ModelManager(metaclass=ABCMeta):
     feature_names: list | None = None,
 ) -> dict[str, Any]:
         """
-        Evaluate a trained model and return metrics, learning curves, and optional SHAP values.
+        Evaluate a trained model and return metrics and learning curves.
 
         Handles:
         - Confusion matrix (classification)
         - ROC / PR curves and AUC (binary & multi-class)
         - Feature importances / coefficients
         - Learning curve
-        - SHAP summary (optional)
+        - Model-complexity curve (ensembles)
+
+        SHAP values are not computed here; see ml.explain. The model and its
+        split are kept on the manager (`self.model`, `self.X_train`,
+        `self.X_test`) so they can be explained afterwards.
         """
+        self.model = model
+        self.X_train, self.X_test = X_train, X_test
+        self.feature_names = feature_names
         out: dict[str, Any] = {}
+        if getattr(self, "fit_only", False):
+            return out
+        cv_results = getattr(self, "cv_results", None)
+        oob = getattr(self, "oob_results", None)
 
         # limit for returned prediction points to avoid huge payloads
         try:
@@ -286,7 +511,7 @@ class ModelManager(metaclass=ABCMeta):
         # --------------------------
         if is_classifier:
             try:
-                y_pred = model.predict(X_test)
+                y_pred = self.predict(model, X_test)
                 out["confusion_matrix"] = confusion_matrix(y_test, y_pred).tolist()
                 # include raw predictions for frontend plotting / diagnostics
                 try:
@@ -308,11 +533,22 @@ class ModelManager(metaclass=ABCMeta):
         # --------------------------
         if is_classifier:
             y_proba = None
+            y_roc = y_test
             try:
-                if hasattr(model, "predict_proba"):
-                    y_proba = model.predict_proba(X_test)
+                # out-of-fold scores from cross-validation cover every row and
+                # need no extra predictions; the holdout split is the fallback
+                if cv_results is not None:
+                    oof = folds.oof_scores(cv_results)
+                elif oob is not None and oob["scores"] is not None:
+                    oof = oob["y"], oob["scores"]
+                else:
+                    oof = None
+                if oof is not None:
+                    y_roc, y_proba = oof
+                elif hasattr(model, "predict_proba"):
+                    y_proba = self.predict(model, X_test, "predict_proba")
                 elif hasattr(model, "decision_function"):
-                    df = model.decision_function(X_test)
+                    df = self.predict(model, X_test, "decision_function")
                     if df.ndim == 1:
                         # Binary decision function → scale to 0-1
                         from sklearn.preprocessing import MinMaxScaler
@@ -331,21 +567,21 @@ class ModelManager(metaclass=ABCMeta):
                         roc_curve,
                     )
 
-                    classes = np.unique(y_test)
+                    classes = np.unique(y_roc)
 
                     if len(classes) == 2:
                         # Binary classification
                         scores = y_proba[:, 1] if y_proba.ndim == 2 else y_proba.ravel()
-                        fpr, tpr, _ = roc_curve(y_test, scores)
-                        prec, rec, _ = precision_recall_curve(y_test, scores)
+                        fpr, tpr, _ = roc_curve(y_roc, scores)
+                        prec, rec, _ = precision_recall_curve(y_roc, scores)
                         out["roc_curve"] = {"fpr": fpr.tolist(), "tpr": tpr.tolist()}
                         out["pr_curve"] = {"precision": prec.tolist(), "recall": rec.tolist()}
-                        out["roc_auc"] = float(roc_auc_score(y_test, scores))
-                        out["pr_auc"] = float(average_precision_score(y_test, scores))
+                        out["roc_auc"] = float(roc_auc_score(y_roc, scores))
+                        out["pr_auc"] = float(average_precision_score(y_roc, scores))
                     else:
                         # Multi-class classification: compute per-class ROC curves (one-vs-rest)
                         try:
-                            y_true_bin = label_binarize(y_test, classes=classes)
+                            y_true_bin = label_binarize(y_roc, classes=classes)
                             # macro averaged AUCs
                             out["roc_auc"] = float(
                                 roc_auc_score(y_true_bin, y_proba, average="macro", multi_class="ovr")
@@ -365,7 +601,7 @@ class ModelManager(metaclass=ABCMeta):
                         try:
                             per_fpr = []
                             per_tpr = []
-                            class_list = list(classes)
+                            class_list = [_to_py_number(c) for c in classes]
                             for i, cls in enumerate(class_list):
                                 fpr_i, tpr_i, _ = roc_curve(y_true_bin[:, i], y_proba[:, i])
                                 per_fpr.append(fpr_i.tolist())
@@ -409,28 +645,48 @@ class ModelManager(metaclass=ABCMeta):
         # Learning Curve
         # --------------------------
         try:
-            lc_res = learning_curve(
-                model,
-                np.vstack([X_train, X_test]),
-                np.concatenate([y_train, y_test]),
-                train_sizes=np.linspace(0.1, 1.0, 5),
-                cv=3,
-                scoring=None,
-                n_jobs=1,
-                shuffle=True,
-                random_state=42,
-                return_times=False,
-            )
-            # learning_curve may return extra timing arrays; only take the first three
-            train_sizes, train_scores, test_scores = lc_res[:3]
-            out["learning_curve"] = {
-                "train_sizes": train_sizes.tolist(),
-                "train_scores_mean": np.mean(train_scores, axis=1).tolist(),
-                "test_scores_mean": np.mean(test_scores, axis=1).tolist(),
-            }
+            if cv_results is not None:
+                # reuses the cross-validation fits; only the smaller sizes are fitted
+                out["learning_curve"] = folds.learning_curve(cv_results)
+            elif oob is None:
+                # out-of-bag evaluation is there to avoid refits, so it gets no curve
+                train_sizes = np.linspace(0.1, 1.0, 5)
+                # every (size, fold) pair is an independent fit
+                with parallel.cores(len(train_sizes) * 3) as n_jobs:
+                    lc_res = learning_curve(
+                        parallel.single_threaded(model),
+                        np.vstack([X_train, X_test]),
+                        np.concatenate([y_train, y_test]),
+                        train_sizes=train_sizes,
+                        cv=3,
+                        scoring=None,
+                        n_jobs=n_jobs,
+                        shuffle=True,
+                        random_state=42,
+                        return_times=False,
+                    )
+                # learning_curve may return extra timing arrays; only take the first three
+                train_sizes, train_scores, test_scores = lc_res[:3]
+                out["learning_curve"] = {
+                    "train_sizes": train_sizes.tolist(),
+                    "train_scores_mean": np.mean(train_scores, axis=1).tolist(),
+                    "test_scores_mean": np.mean(test_scores, axis=1).tolist(),
+                }
         except Exception as e:
             print("Learning curve computation failed:", e)
 
+        # --------------------------
+        # Model-complexity curve (ensembles): score against n_estimators from the
+        # fold estimators, without refitting
+        # --------------------------
+        if cv_results is not None:
+            try:
+                curve = folds.complexity_curve(cv_results)
+                if curve is not None:
+                    out["complexity_curve"] = curve
+            except Exception as e:
+                print("Complexity curve computation failed:", e)
+
         # --------------------------
         # Save regression predictions (sampled) so frontend can show predicted vs actual
         # --------------------------
@@ -438,30 +694,11 @@ class ModelManager(metaclass=ABCMeta):
             try:
                 # attempt to compute predictions if model supports it
                 if 'predictions' not in out:
-                    y_pred_reg = model.predict(X_test)
+                    y_pred_reg = self.predict(model, X_test)
                     out.setdefault('predictions', {})
                     out['predictions']['y_true'] = _limit_and_convert(y_test.tolist())
                     out['predictions']['y_pred'] = _limit_and_convert(y_pred_reg.tolist())
             except Exception as e:
                 print('Regression prediction saving failed:', e)
 
-        # --------------------------
-        # SHAP summary (optional)
-        # --------------------------
-        if shap is not None:
-            try:
-                explainer = None
-                if hasattr(shap, "TreeExplainer") and hasattr(model, "feature_importances_"):
-                    explainer = shap.TreeExplainer(model)
-                else:
-                    explainer = shap.Explainer(model, X_train)
-                sv = explainer(X_test)
-                mean_abs = np.mean(np.abs(sv.values), axis=0)
-                names = feature_names or [f"f{i}" for i in range(len(mean_abs))]
-                out["shap_summary"] = [
-                    {"name": n, "mean_abs_shap": float(v)} for n, v in zip(names, mean_abs)
-                ]
-            except Exception as e:
-                print("SHAP computation failed:", e)
-
         return out
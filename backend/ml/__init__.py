@@ -1,4 +1,4 @@
-from .ModelManager import ModelManager
+from .ModelManager import ModelManager, apply_column_type, infer_column_type
 from .linear_regression import LinRegManager
 from .logistic_regression import LogRegManager
 from .bagging import BaggingManager
@@ -11,6 +11,8 @@ from .support_vector_machine import SVMManager
 # expose classes at package level for `from ..ml import LinRegManager`
 __all__ = [
     "ModelManager",
+    "infer_column_type",
+    "apply_column_type",
     "LinRegManager",
     "LogRegManager",
     "DecisionTreeManager",
@@ -0,0 +1,282 @@
+"""
+Saved models.
+
+An artifact is a directory holding the fitted holdout model of a training run
+(`model.joblib`) and the preprocessing that produced its input
+(`transform.json`, see ModelManager.prepare_xy): kept columns, per-column type
+decisions with their category vocabularies, fill values, the feature scaling
+and the target labels.
+
+Models are written uncompressed with joblib, which stores numpy arrays as raw
+buffers, and loaded with mmap_mode="r": coefficient and support-vector arrays
+are paged in from the file on use rather than read up front. sklearn trees copy
+their node arrays when unpickled, so the trees of an ensemble are kept out of
+the pickle: their node and value arrays go to `tree_nodes.npy` and
+`tree_values.npy`, are memory-mapped on load and each tree is rebuilt from its
+slice only while it is used (see StoredTree). Loaded artifacts are kept in a
+small LRU cache per process.
+"""
+import copy
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+import joblib
+import numpy as np
+import pandas as pd
+import pandas.api.types as ptypes
+from sklearn.tree._tree import Tree
+
+from .ModelManager import apply_column_type
+
+MODEL_FILE = "model.joblib"
+TRANSFORM_FILE = "transform.json"
+TREE_NODES_FILE = "tree_nodes.npy"
+TREE_VALUES_FILE = "tree_values.npy"
+
+
+class StoredTree:
+    """
+    Stand-in for the `tree_` of an ensemble member in a saved artifact: its
+    slice of the memory-mapped node and value arrays. Every attribute access
+    (predict, apply, ...) rebuilds the sklearn Tree from the slice and lets it
+    go afterwards, so a forest never holds more than the trees in use.
+    """
+
+    def __init__(self, tree: Tree, node_start: int, value_start: int):
+        state = tree.__getstate__()
+        self.n_features = tree.n_features
+        self.n_classes = np.asarray(tree.n_classes, dtype="intp")
+        self.n_outputs = tree.n_outputs
+        self.max_depth = state["max_depth"]
+        self.node_count = state["node_count"]
+        self.value_shape = state["values"].shape
+        self.node_start = node_start
+        self.value_start = value_start
+        self.arrays = None
+
+    def __getstate__(self):
+        # the arrays are saved beside the pickle, not in it
+        return {k: v for k, v in self.__dict__.items() if k != "arrays"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, arrays=None)
+
+    def tree(self) -> Tree:
+        if self.arrays is None:
+            raise RuntimeError("the tree arrays of this artifact are not loaded")
+        nodes, values = self.arrays
+        size = int(np.prod(self.value_shape))
+        tree = Tree(self.n_features, self.n_classes, self.n_outputs)
+        tree.__setstate__({
+            "max_depth": self.max_depth,
+            "node_count": self.node_count,
+            "nodes": nodes[self.node_start:self.node_start + self.node_count],
+            "values": values[self.value_start:self.value_start + size].reshape(self.value_shape),
+        })
+        return tree
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name == "arrays":
+            raise AttributeError(name)
+        return getattr(self.tree(), name)
+
+
+def _stored_members(model) -> list:
+    """The ensemble members of `model` whose trees are saved outside the pickle."""
+    members = getattr(model, "estimators_", None)
+    if not isinstance(members, list):
+        return []
+    return [m for m in members if isinstance(getattr(m, "tree_", None), (Tree, StoredTree))]
+
+
+def _split_trees(model, path: str):
+    """
+    A shallow copy of `model` whose ensemble trees are StoredTrees, with their
+    arrays written to `path` (the fitted model itself is left untouched).
+    """
+    members = _stored_members(model)
+    if not members:
+        return model
+    nodes, values, node_start, value_start = [], [], 0, 0
+    stored = {}
+    for member in members:
+        state = member.tree_.__getstate__()
+        stored[id(member)] = StoredTree(member.tree_, node_start, value_start)
+        nodes.append(state["nodes"])
+        values.append(state["values"].ravel())
+        node_start += len(state["nodes"])
+        value_start += state["values"].size
+    np.save(os.path.join(path, TREE_NODES_FILE), np.concatenate(nodes))
+    np.save(os.path.join(path, TREE_VALUES_FILE), np.concatenate(values))
+
+    split = copy.copy(model)
+    split.estimators_ = []
+    for member in model.estimators_:
+        if id(member) in stored:
+            member_copy = copy.copy(member)
+            member_copy.tree_ = stored[id(member)]
+            member = member_copy
+        split.estimators_.append(member)
+    return split
+
+
+def _attach_trees(model, path: str) -> None:
+    nodes_path = os.path.join(path, TREE_NODES_FILE)
+    if not os.path.exists(nodes_path):
+        return
+    arrays = (
+        np.load(nodes_path, mmap_mode="r"),
+        np.load(os.path.join(path, TREE_VALUES_FILE), mmap_mode="r"),
+    )
+    for member in _stored_members(model):
+        member.tree_.arrays = arrays
+
+
+def save(artifact: dict[str, Any], path: str) -> str:
+    """Write `ModelManager.artifact()` to the directory `path` (replaced atomically)."""
+    if artifact.get("transform") is None:
+        raise ValueError("the model has no recorded preprocessing")
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp)
+    try:
+        joblib.dump(
+            {"model": _split_trees(artifact["model"], tmp), "scaler": artifact.get("scaler"), "classes": artifact.get("classes")},
+            os.path.join(tmp, MODEL_FILE),
+        )
+        with open(os.path.join(tmp, TRANSFORM_FILE), "w") as f:
+            json.dump(artifact["transform"], f)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+def load(path: str) -> dict[str, Any]:
+    """{"model", "scaler", "classes", "transform"} of a saved artifact."""
+    artifact = joblib.load(os.path.join(path, MODEL_FILE), mmap_mode="r")
+    _attach_trees(artifact["model"], path)
+    with open(os.path.join(path, TRANSFORM_FILE), "r") as f:
+        artifact["transform"] = json.load(f)
+    return artifact
+
+
+def transform_rows(df: pd.DataFrame, transform: dict[str, Any]) -> np.ndarray:
+    """
+    The feature matrix for new rows, converted like the training rows: stored
+    type decisions, training means for missing values and the training scaling.
+    Raises ValueError when columns are missing.
+    """
+    columns = transform["columns"]
+    df = df.rename(columns=str)
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    X = np.empty((len(df), len(columns)), dtype="float64")
+    for j, col in enumerate(columns):
+        series = df[col]
+        decision = transform["column_types"].get(col) or {"kind": "numeric"}
+        kind = decision.get("kind")
+        if kind == "category" and decision.get("categories") is None:
+            raise ValueError(f"Column '{col}' had too many categories to store its vocabulary")
+        if kind in ("category", "datetime") and not ptypes.is_datetime64_any_dtype(series):
+            series = apply_column_type(series.astype(object), decision)
+        if ptypes.is_datetime64_any_dtype(series):
+            # epoch seconds, as sanitize stores them
+            stamps = pd.to_datetime(series, errors="coerce")
+            values = stamps.to_numpy(dtype="datetime64[ns]").astype("int64") / 1e9
+            values[stamps.isna().to_numpy()] = np.nan
+        else:
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", copy=True)
+        values[np.isnan(values)] = transform["fill"].get(col, 0.0)
+        X[:, j] = values
+    scale = transform.get("scale")
+    if scale is not None:
+        X -= np.asarray(scale["mean"])
+        X /= np.asarray(scale["scale"])
+        np.nan_to_num(X, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    return X
+
+
+def predict(artifact: dict[str, Any], df: pd.DataFrame) -> dict[str, Any]:
+    """
+    Score `df` with a loaded artifact. Returns {"predictions"} plus
+    {"classes", "probabilities"} for classifiers that give probabilities.
+    Predictions are the original target labels.
+    """
+    transform = artifact["transform"]
+    X = transform_rows(df, transform)
+    if artifact.get("scaler") is not None:
+        X = artifact["scaler"].transform(X)
+    model = artifact["model"]
+
+    def labels(codes):
+        codes = np.asarray(codes)
+        if artifact.get("classes") is not None:
+            codes = np.asarray(artifact["classes"])[codes.astype("int64")]
+        if transform.get("labels") is not None:
+            codes = np.asarray(transform["labels"], dtype=object)[codes.astype("int64")]
+        return [v.item() if hasattr(v, "item") else v for v in codes]
+
+    out: dict[str, Any] = {}
+    if transform.get("classifier"):
+        out["predictions"] = labels(model.predict(X))
+        if hasattr(model, "predict_proba"):
+            try:
+                out["probabilities"] = np.asarray(model.predict_proba(X)).tolist()
+                out["classes"] = labels(model.classes_)
+            except Exception:
+                # e.g. SVC without probability estimates
+                pass
+    else:
+        out["predictions"] = np.asarray(model.predict(X), dtype="float64").tolist()
+    return out
+
+
+class ArtifactCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str) -> dict[str, Any]:
+        """The artifact at `path`, loaded on first use."""
+        with self._lock:
+            artifact = self._entries.get(path)
+            if artifact is not None:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return artifact
+            self.misses += 1
+        artifact = load(path)
+        with self._lock:
+            self._entries[path] = artifact
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return artifact
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+try:
+    _max_entries = int(os.environ.get("MODEL_ARTIFACT_CACHE_ENTRIES", "8"))
+except Exception:
+    _max_entries = 8
+
+artifact_cache = ArtifactCache(_max_entries)
@@ -1,23 +1,95 @@
 from typing import Any
 import numpy as np
 import pandas as pd
-from sklearn.metrics import (
-    accuracy_score,
-    average_precision_score,
-    f1_score,
-    mean_absolute_error,
-    mean_squared_error,
-    precision_recall_curve,
-    precision_score,
-    r2_score,
-    recall_score,
-    roc_auc_score,
-    roc_curve,
-)
-from sklearn.model_selection import train_test_split, KFold, StratifiedKFold, cross_validate
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, KFold
 from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 
-from . import ModelManager
+from . import ModelManager, parallel
+
+# most ccp_alpha values scored on a pruning path
+PRUNING_PATH_POINTS = 50
+
+
+def collapse_alphas(tree) -> np.ndarray:
+    """
+    For every node of a fitted sklearn tree, the ccp_alpha at which minimal
+    cost-complexity pruning turns it into a leaf (0 for leaves). The subtree
+    pruned at `a` is the tree cut at every node with collapse alpha <= a.
+    """
+    t = tree.tree_
+    left, right = t.children_left, t.children_right
+    n_nodes = t.node_count
+    # node cost R(t): impurity weighted by the share of training samples
+    r = t.impurity * t.weighted_n_node_samples / t.weighted_n_node_samples[0]
+    parent = np.full(n_nodes, -1)
+    internal = left != -1
+    parent[left[internal]] = np.flatnonzero(internal)
+    parent[right[internal]] = np.flatnonzero(internal)
+
+    subtree_r = np.where(internal, 0.0, r)
+    n_leaves = np.where(internal, 0, 1)
+    # children have larger ids than their parent, so a reverse pass is bottom-up
+    for node in range(n_nodes - 1, 0, -1):
+        subtree_r[parent[node]] += subtree_r[node]
+        n_leaves[parent[node]] += n_leaves[node]
+
+    collapse = np.zeros(n_nodes)
+    active = internal.copy()
+    alpha = 0.0
+    while active.any():
+        # weakest link: the internal node whose removal costs least per leaf
+        with np.errstate(divide="ignore", invalid="ignore"):
+            g = np.where(active, (r - subtree_r) / (n_leaves - 1), np.inf)
+        node = int(np.argmin(g))
+        alpha = max(alpha, float(g[node]))
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if active[n]:
+                active[n] = False
+                collapse[n] = alpha
+                stack.extend((left[n], right[n]))
+        delta_r, delta_leaves = subtree_r[node] - r[node], n_leaves[node] - 1
+        n = node
+        while n != -1:
+            subtree_r[n] -= delta_r
+            n_leaves[n] -= delta_leaves
+            n = parent[n]
+    return collapse
+
+
+def pruned_predict(tree, X, collapse: np.ndarray, alphas: list[float]) -> list[np.ndarray]:
+    """Predictions of `tree` pruned at each of `alphas`, from one pass down the tree."""
+    path = tree.decision_path(X)
+    # node ids grow along a root-to-leaf path, so each row's indices run root first
+    nodes, starts = path.indices, path.indptr[:-1]
+    values = tree.tree_.value[:, 0, :]
+    out = []
+    for a in alphas:
+        # collapse alphas shrink going down, so the kept nodes are a prefix of the path
+        depth = np.add.reduceat((collapse[nodes] > a).astype("int64"), starts)
+        node = nodes[starts + depth]
+        if hasattr(tree, "classes_"):
+            out.append(tree.classes_[np.argmax(values[node], axis=1)])
+        else:
+            out.append(values[node, 0])
+    return out
+
+
+def _fold_pruning(prototype, X, y, train, test, alphas: list[float]) -> tuple[list, list]:
+    est = clone(prototype).fit(X[train], y[train])
+    collapse = collapse_alphas(est)
+
+    def scores(rows):
+        if hasattr(est, "classes_"):
+            return [float(np.mean(p == y[rows])) for p in pruned_predict(est, X[rows], collapse, alphas)]
+        sst = float(np.sum((y[rows] - y[rows].mean()) ** 2))
+        return [1.0 - float(np.sum((y[rows] - p) ** 2)) / sst if sst > 0 else float("nan")
+                for p in pruned_predict(est, X[rows], collapse, alphas)]
+
+    return scores(train), scores(test)
 
 
 class DecisionTreeManager(ModelManager):
@@ -30,6 +102,8 @@ class DecisionTreeManager(ModelManager):
         random_state: int = 42,
         classifier: bool = False,
         cv_folds: int = 5,
+        ccp_alpha: float = 0.0,
+        pruning_path: bool = False,
     ):
         super().__init__(dataframe, test_split)
         self.max_depth = max_depth
@@ -37,72 +111,83 @@ class DecisionTreeManager(ModelManager):
         self.random_state = random_state
         self.classifier = classifier
         self.cv_folds = cv_folds
+        self.ccp_alpha = ccp_alpha
+        self.pruning_path = pruning_path
+
+    def estimator(self):
+        cls = DecisionTreeClassifier if self.classifier else DecisionTreeRegressor
+        return cls(
+            max_depth=self.max_depth,
+            min_samples_split=self.min_samples_split,
+            random_state=self.random_state,
+            ccp_alpha=self.ccp_alpha,
+        )
+
+    def prune(self, X, y, cv, X_train, y_train) -> dict[str, Any]:
+        """
+        Cost-complexity pruning sweep. The candidate ccp_alphas come from the
+        full tree on the holdout training rows; every CV fold grows one full
+        tree and scores all of them by pruning it in place of a refit. Sets
+        `self.ccp_alpha` to the alpha with the best mean test score.
+        """
+        unpruned = clone(self.estimator()).set_params(ccp_alpha=0.0)
+        full = parallel.fit(clone(unpruned), X_train, y_train)
+        collapse = collapse_alphas(full)
+        alphas = np.unique(np.concatenate([[0.0], collapse[collapse > 0]]))
+        if len(alphas) > PRUNING_PATH_POINTS:
+            alphas = alphas[np.unique(np.linspace(0, len(alphas) - 1, PRUNING_PATH_POINTS).round().astype(int))]
+        alphas = [float(a) for a in alphas]
+
+        X, y = np.asarray(X), np.asarray(y)
+        splits = list(cv.split(X, y))
+        prototype = parallel.single_threaded(unpruned)
+        with parallel.cores(len(splits)) as n_jobs:
+            per_fold = Parallel(n_jobs=n_jobs)(
+                delayed(_fold_pruning)(prototype, X, y, train, test, alphas) for train, test in splits
+            )
+        train_scores = np.array([f[0] for f in per_fold])
+        test_scores = np.array([f[1] for f in per_fold])
+        test_mean = test_scores.mean(axis=0)
+
+        # the simplest tree among equally good ones
+        best = len(alphas) - 1 - int(np.nanargmax(test_mean[::-1]))
+        self.ccp_alpha = alphas[best]
+        parent_collapse = np.full(len(collapse), np.inf)
+        left, right = full.tree_.children_left, full.tree_.children_right
+        internal = left != -1
+        parent_collapse[left[internal]] = collapse[internal]
+        parent_collapse[right[internal]] = collapse[internal]
+        return {
+            "param": "ccp_alpha",
+            "values": alphas,
+            "n_leaves": [int(np.sum((collapse <= a) & (parent_collapse > a))) for a in alphas],
+            "train_scores_mean": [float(v) for v in train_scores.mean(axis=0)],
+            "test_scores_mean": [float(v) for v in test_mean],
+            "test_scores_std": [float(v) for v in test_scores.std(axis=0)],
+            "best_ccp_alpha": self.ccp_alpha,
+        }
 
     def train(self, target, features):
         X, y = self.prepare_xy(features, target, classifier=self.classifier)
+        path = None
+        if self.pruning_path and not getattr(self, "fit_only", False):
+            cv = KFold(n_splits=self.cv_folds, shuffle=True, random_state=self.random_state)
+            X_train, _, y_train, _ = train_test_split(
+                X,
+                y,
+                test_size=self.test_split,
+                random_state=self.random_state,
+                stratify=y if self.classifier else None,
+            )
+            path = self.prune(X, y, self.splitter(cv), X_train, y_train)
 
         # Cross-validation summary
         if self.classifier:
-            scoring = {
-                "accuracy": "accuracy",
-                "precision": "precision_macro",
-                "recall": "recall_macro",
-                "f1": "f1_macro",
-                "roc_auc": "roc_auc",
-                "pr_auc": "average_precision",
-            }
-            cv = KFold(
-                n_splits=self.cv_folds, shuffle=True, random_state=self.random_state
-            )
-            try:
-                cv_res = cross_validate(
-                    DecisionTreeClassifier(
-                        max_depth=self.max_depth,
-                        min_samples_split=self.min_samples_split,
-                        random_state=self.random_state,
-                    ),
-                    X,
-                    y,
-                    cv=cv,
-                    scoring=scoring,
-                )
-                cv_mean = {k + "_mean": float(np.mean(cv_res[f"test_{k}"])) for k in scoring}
-                cv_std = {k + "_std": float(np.std(cv_res[f"test_{k}"])) for k in scoring}
-            except Exception:
-                cv_mean = {}
-                cv_std = {}
+            cv = KFold(n_splits=self.cv_folds, shuffle=True, random_state=self.random_state)
+            cv_mean, cv_std = self.cross_validate(self.estimator(), X, y, cv, classifier=True)
         else:
-            scoring = {
-                "r2": "r2",
-                "neg_mse": "neg_mean_squared_error",
-                "neg_mae": "neg_mean_absolute_error",
-            }
             cv = KFold(n_splits=self.cv_folds, shuffle=True, random_state=self.random_state)
-            try:
-                cv_res = cross_validate(
-                    DecisionTreeRegressor(
-                        max_depth=self.max_depth,
-                        min_samples_split=self.min_samples_split,
-                        random_state=self.random_state,
-                    ),
-                    X,
-                    y,
-                    cv=cv,
-                    scoring=scoring,
-                )
-                cv_mean = {
-                    "r2_mean": float(np.mean(cv_res["test_r2"])),
-                    "mse_mean": float(-np.mean(cv_res["test_neg_mse"])),
-                    "mae_mean": float(-np.mean(cv_res["test_neg_mae"])),
-                }
-                cv_std = {
-                    "r2_std": float(np.std(cv_res["test_r2"])),
-                    "mse_std": float(np.std(cv_res["test_neg_mse"])),
-                    "mae_std": float(np.std(cv_res["test_neg_mae"])),
-                }
-            except Exception:
-                cv_mean = {}
-                cv_std = {}
+            cv_mean, cv_std = self.cross_validate(self.estimator(), X, y, cv, classifier=False)
 
         X_train, X_test, y_train, y_test = train_test_split(
             X,
@@ -113,37 +198,14 @@ class DecisionTreeManager(ModelManager):
         )
 
         if self.classifier:
-            model = DecisionTreeClassifier(
-                max_depth=self.max_depth,
-                min_samples_split=self.min_samples_split,
-                random_state=self.random_state,
-            )
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            y_proba = None
-            try:
-                y_proba = model.predict_proba(X_test)[:, 1]
-            except Exception:
-                y_proba = None
-
-            result: dict[str, Any] = {
-                "accuracy": float(accuracy_score(y_test, y_pred)),
-                "precision": float(precision_score(y_test, y_pred, average="macro")),
-                "recall": float(recall_score(y_test, y_pred, average="macro")),
-                "f1": float(f1_score(y_test, y_pred, average="macro")),
-            }
-            if y_proba is not None:
-                result["roc_auc"] = float(roc_auc_score(y_test, y_proba))
-                result["pr_auc"] = float(average_precision_score(y_test, y_proba))
-                fpr, tpr, _ = roc_curve(y_test, y_proba)
-                precision, recall, _ = precision_recall_curve(y_test, y_proba)
-                result["roc_curve"] = {"fpr": fpr.tolist(), "tpr": tpr.tolist()}
-                result["pr_curve"] = {
-                    "precision": precision.tolist(),
-                    "recall": recall.tolist(),
-                }
+            model = self.estimator()
+            parallel.fit(model, X_train, y_train)
+            # ROC/PR curves and AUCs are computed by evaluate_model
+            result: dict[str, Any] = self.holdout_metrics(model, X_test, y_test, classifier=True)
             result["cv_mean"] = cv_mean
             result["cv_std"] = cv_std
+            if path is not None:
+                result["pruning_path"] = path
             try:
                 eval_artifacts = self.evaluate_model(
                     model,
@@ -159,21 +221,13 @@ class DecisionTreeManager(ModelManager):
                 pass
             return result
         else:
-            model = DecisionTreeRegressor(
-                max_depth=self.max_depth,
-                min_samples_split=self.min_samples_split,
-                random_state=self.random_state,
-            )
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-
-            result: dict[str, Any] = {
-                "r2": float(r2_score(y_test, y_pred)),
-                "mse": float(mean_squared_error(y_test, y_pred)),
-                "mae": float(mean_absolute_error(y_test, y_pred)),
-            }
+            model = self.estimator()
+            parallel.fit(model, X_train, y_train)
+            result: dict[str, Any] = self.holdout_metrics(model, X_test, y_test, classifier=False)
             result["cv_mean"] = cv_mean
             result["cv_std"] = cv_std
+            if path is not None:
+                result["pruning_path"] = path
             try:
                 eval_artifacts = self.evaluate_model(
                     model,
@@ -0,0 +1,192 @@
+"""
+On-demand SHAP explanations of a fitted model.
+
+Training no longer computes SHAP values. An explanation explains at most
+`max_rows` holdout rows against a small background sample of the training rows
+(k-means centers or random rows), in batches that run in parallel within the
+core budget. Batches are started in waves and no new wave starts once
+`time_budget` seconds have passed, so the result may cover fewer rows than
+requested; `complete` says whether it did.
+
+`explanation_cache` keeps finished explanations so that asking again for the
+same model and options is free.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+
+from . import parallel
+
+try:
+    import shap  # optional
+except Exception:
+    shap = None
+
+BACKGROUND_METHODS = ("kmeans", "random")
+
+DEFAULTS = {
+    "background": "kmeans",
+    "background_size": 50,
+    "max_rows": 200,
+    "time_budget": 30.0,
+    "batch_size": 20,
+}
+
+
+def options(raw: Optional[dict]) -> dict[str, Any]:
+    """Explanation options from a request body, with defaults filled in."""
+    raw = raw or {}
+    opts = dict(DEFAULTS)
+    if raw.get("background") is not None:
+        opts["background"] = str(raw["background"])
+    for name in ("background_size", "max_rows", "batch_size"):
+        if raw.get(name) is not None:
+            opts[name] = int(raw[name])
+    if raw.get("time_budget") is not None:
+        opts["time_budget"] = float(raw["time_budget"])
+    if opts["background"] not in BACKGROUND_METHODS:
+        raise ValueError(f"background must be one of: {', '.join(BACKGROUND_METHODS)}")
+    if min(opts["background_size"], opts["max_rows"], opts["batch_size"]) < 1 or opts["time_budget"] <= 0:
+        raise ValueError("background_size, max_rows, batch_size and time_budget must be positive")
+    return opts
+
+
+def background_sample(X, size: int, method: str = "kmeans", random_state: int = 42) -> np.ndarray:
+    """At most `size` rows summarizing X: k-means centers or a random subset."""
+    X = np.asarray(X, dtype="float64")
+    if len(X) <= size:
+        return X
+    if method == "kmeans":
+        from sklearn.cluster import MiniBatchKMeans
+
+        km = MiniBatchKMeans(n_clusters=size, random_state=random_state, n_init=3)
+        return km.fit(X).cluster_centers_
+    rng = np.random.RandomState(random_state)
+    return X[rng.choice(len(X), size, replace=False)]
+
+
+def make_explainer(model, background: np.ndarray):
+    if hasattr(model, "feature_importances_") and hasattr(shap, "TreeExplainer"):
+        try:
+            return shap.TreeExplainer(model)
+        except Exception:
+            pass
+    try:
+        return shap.Explainer(model, background)
+    except Exception:
+        # models shap does not recognize (SVMs, MLPs) are explained model-agnostically
+        fn = model.predict_proba if hasattr(model, "predict_proba") else model.predict
+        return shap.KernelExplainer(fn, background)
+
+
+def _abs_sums(explainer, X_batch: np.ndarray) -> np.ndarray:
+    values = explainer(X_batch).values
+    values = np.abs(np.asarray(values, dtype="float64"))
+    # (rows, features[, outputs]): sum over rows, average over outputs
+    totals = values.sum(axis=0)
+    if totals.ndim > 1:
+        totals = totals.mean(axis=tuple(range(1, totals.ndim)))
+    return totals
+
+
+def explain(
+    model,
+    X_train,
+    X_test,
+    feature_names: Optional[list] = None,
+    background: str = "kmeans",
+    background_size: int = 50,
+    max_rows: int = 200,
+    time_budget: float = 30.0,
+    batch_size: int = 20,
+    random_state: int = 42,
+) -> dict[str, Any]:
+    """
+    Mean |SHAP value| per feature over a sample of X_test.
+
+    Returns {"shap_summary", "rows_explained", "rows_requested", "background",
+    "background_size", "complete", "elapsed"}.
+    """
+    if shap is None:
+        raise RuntimeError("shap is not installed")
+    started = time.monotonic()
+    X_test = np.asarray(X_test, dtype="float64")
+    rng = np.random.RandomState(random_state)
+    rows = X_test
+    if len(rows) > max_rows:
+        rows = rows[np.sort(rng.choice(len(rows), max_rows, replace=False))]
+
+    bg = background_sample(X_train, background_size, background, random_state)
+    explainer = make_explainer(model, bg)
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+    totals = None
+    explained = 0
+    with parallel.cores(len(batches)) as n_jobs:
+        # threads: explainers hold the model and need not be pickled
+        runner = Parallel(n_jobs=n_jobs, prefer="threads")
+        for start in range(0, len(batches), n_jobs):
+            if explained and time.monotonic() - started > time_budget:
+                break
+            wave = batches[start:start + n_jobs]
+            for batch, sums in zip(wave, runner(delayed(_abs_sums)(explainer, b) for b in wave)):
+                totals = sums if totals is None else totals + sums
+                explained += len(batch)
+
+    mean_abs = totals / explained if explained else np.zeros(X_test.shape[1])
+    names = feature_names or [f"f{i}" for i in range(len(mean_abs))]
+    return {
+        "shap_summary": [{"name": n, "mean_abs_shap": float(v)} for n, v in zip(names, mean_abs)],
+        "rows_explained": explained,
+        "rows_requested": len(rows),
+        "background": background,
+        "background_size": len(bg),
+        "complete": explained == len(rows),
+        "elapsed": time.monotonic() - started,
+    }
+
+
+def make_key(training: dict, opts: dict) -> str:
+    """Key of an explanation: the training request that produced the model plus the options."""
+    payload = {"training": training, "options": opts}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, explanation: dict) -> None:
+        with self._lock:
+            self._entries[key] = explanation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+try:
+    _max_entries = int(os.environ.get("EXPLANATION_CACHE_ENTRIES", "256"))
+except Exception:
+    _max_entries = 256
+
+explanation_cache = ExplanationCache(_max_entries)
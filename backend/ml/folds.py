@@ -0,0 +1,342 @@
+"""
+Cross-validation fits that the rest of an evaluation can reuse.
+
+`run_folds` fits one estimator per fold and keeps the fitted estimators and
+their out-of-fold predictions. `ModelManager.evaluate_model` then takes the
+ROC/PR curves from the out-of-fold scores and the full-size learning-curve
+point from the fold estimators, so a request needs cv_folds + 1 (holdout) +
+len(LEARNING_CURVE_SIZES) - 1 fits instead of cv_folds + 1 + 15.
+
+For ensembles, `complexity_curve` scores the fold estimators against their
+number of estimators without fitting anything: boosting through
+`staged_score`, forests and bagging through their first k members.
+
+Bagging ensembles can skip the folds altogether: `oob_results` scores the one
+holdout fit on the rows each member did not draw.
+
+Models compared with each other share one fold assignment (`assign`), which
+`FixedSplits` replays in place of each manager's own splitter.
+"""
+import copy
+from typing import Any, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import KFold, StratifiedKFold
+from sklearn.metrics import (
+    accuracy_score,
+    average_precision_score,
+    f1_score,
+    mean_absolute_error,
+    mean_squared_error,
+    precision_score,
+    r2_score,
+    recall_score,
+    roc_auc_score,
+)
+
+from . import parallel
+
+# fractions of a fold's training set, as in the learning curve used before
+LEARNING_CURVE_SIZES = np.linspace(0.1, 1.0, 5)
+# most n_estimators values on a model-complexity curve
+COMPLEXITY_CURVE_POINTS = 10
+
+
+def ranking_scores(estimator, X) -> Optional[np.ndarray]:
+    """
+    Continuous scores for ROC/PR metrics, preferring decision_function like the
+    sklearn `roc_auc` / `average_precision` scorers. Binary problems get a 1-D
+    array for the positive class.
+    """
+    for method in ("decision_function", "predict_proba"):
+        if hasattr(estimator, method):
+            try:
+                scores = np.asarray(getattr(estimator, method)(X))
+            except Exception:
+                continue
+            if scores.ndim == 2 and scores.shape[1] == 2:
+                scores = scores[:, 1]
+            return scores
+    return None
+
+
+def _fit_fold(estimator, X, y, train, test, classifier: bool) -> dict:
+    est = clone(estimator)
+    est.fit(X[train], y[train])
+    X_test = X[test]
+    return {
+        "estimator": est,
+        "train": train,
+        "test": test,
+        "pred": est.predict(X_test),
+        "scores": ranking_scores(est, X_test) if classifier else None,
+    }
+
+
+def fold_metrics(y_true, pred, scores, classifier: bool) -> dict[str, float]:
+    def safe(fn):
+        try:
+            return float(fn())
+        except Exception:
+            return float("nan")
+
+    if not classifier:
+        return {
+            "r2": safe(lambda: r2_score(y_true, pred)),
+            "mse": safe(lambda: mean_squared_error(y_true, pred)),
+            "mae": safe(lambda: mean_absolute_error(y_true, pred)),
+        }
+    binary = scores is not None and scores.ndim == 1
+    return {
+        "accuracy": safe(lambda: accuracy_score(y_true, pred)),
+        "precision": safe(lambda: precision_score(y_true, pred, average="macro", zero_division=0)),
+        "recall": safe(lambda: recall_score(y_true, pred, average="macro", zero_division=0)),
+        "f1": safe(lambda: f1_score(y_true, pred, average="macro", zero_division=0)),
+        "roc_auc": safe(lambda: roc_auc_score(y_true, scores)) if binary else float("nan"),
+        "pr_auc": safe(lambda: average_precision_score(y_true, scores, pos_label=np.unique(y_true)[-1])) if binary else float("nan"),
+    }
+
+
+def _mean_std(values: list) -> tuple[Optional[float], Optional[float]]:
+    arr = np.asarray(values, dtype="float64")
+    arr = arr[np.isfinite(arr)]
+    if not len(arr):
+        # metric not defined for this problem (e.g. binary AUC on multi-class)
+        return None, None
+    return float(np.mean(arr)), float(np.std(arr))
+
+
+def summarize(metrics: list[dict]) -> tuple[dict, dict]:
+    """(cv_mean, cv_std) with "<metric>_mean" / "<metric>_std" keys from per-fold metrics."""
+    cv_mean, cv_std = {}, {}
+    for name in metrics[0]:
+        mean, std = _mean_std([m[name] for m in metrics])
+        cv_mean[name + "_mean"] = mean
+        cv_std[name + "_std"] = std
+    return cv_mean, cv_std
+
+
+def assign(y, n_folds: int, classifier: bool, random_state: int = 42) -> np.ndarray:
+    """
+    Fold index of every row of `y`: stratified for classifiers, unless a class
+    has too few rows for `n_folds`.
+    """
+    y = np.asarray(y)
+    X = np.empty((len(y), 0))
+    splits = None
+    if classifier:
+        try:
+            splits = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state).split(X, y))
+        except ValueError:
+            splits = None
+    if splits is None:
+        splits = KFold(n_splits=n_folds, shuffle=True, random_state=random_state).split(X)
+    fold_ids = np.empty(len(y), dtype="int64")
+    for k, (_, test) in enumerate(splits):
+        fold_ids[test] = k
+    return fold_ids
+
+
+class FixedSplits:
+    """CV splitter replaying a fold assignment from `assign`."""
+
+    def __init__(self, fold_ids):
+        self.fold_ids = np.asarray(fold_ids, dtype="int64")
+
+    def get_n_splits(self, X=None, y=None, groups=None) -> int:
+        return int(self.fold_ids.max()) + 1 if len(self.fold_ids) else 0
+
+    def split(self, X=None, y=None, groups=None):
+        if X is not None and len(X) != len(self.fold_ids):
+            raise ValueError(f"fold assignment covers {len(self.fold_ids)} rows, not {len(X)}")
+        for k in range(self.get_n_splits()):
+            yield np.flatnonzero(self.fold_ids != k), np.flatnonzero(self.fold_ids == k)
+
+
+def run_folds(estimator, X, y, cv, classifier: bool) -> dict[str, Any]:
+    """
+    Fit `estimator` on every fold of `cv` (in parallel, within the core budget)
+    and return {"folds", "metrics", "cv_mean", "cv_std", "estimator", "X", "y"}.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    splits = list(cv.split(X, y))
+    prototype = parallel.single_threaded(estimator)
+    with parallel.cores(len(splits)) as n_jobs:
+        folds = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_fold)(prototype, X, y, train, test, classifier) for train, test in splits
+        )
+    metrics = [fold_metrics(y[f["test"]], f["pred"], f["scores"], classifier) for f in folds]
+    cv_mean, cv_std = summarize(metrics)
+    return {
+        "folds": folds,
+        "metrics": metrics,
+        "cv_mean": cv_mean,
+        "cv_std": cv_std,
+        "estimator": prototype,
+        "classifier": classifier,
+        "X": X,
+        "y": y,
+    }
+
+
+def _left_out_counts(model, n_rows: int) -> np.ndarray:
+    """Number of ensemble members that did not draw each row."""
+    counts = np.zeros(n_rows, dtype="int64")
+    for drawn in model.estimators_samples_:
+        in_bag = np.zeros(n_rows, dtype=bool)
+        in_bag[drawn] = True
+        counts += ~in_bag
+    return counts
+
+
+def oob_results(model, y, classifier: bool) -> dict[str, Any]:
+    """
+    Out-of-bag metrics of a bagging ensemble fitted with oob_score=True on
+    (X, y): {"score", "metrics", "rows", "positions", "y", "pred", "scores"},
+    where "positions" are the row positions in (X, y) of "y", "pred" and
+    "scores". Rows that were
+    in every bootstrap sample have no out-of-bag prediction (sklearn leaves
+    them as zero probabilities or a 0.0 prediction) and are left out, of the
+    score as well.
+    """
+    y = np.asarray(y)
+    if classifier:
+        proba = np.asarray(model.oob_decision_function_)
+        rows = np.flatnonzero(np.isfinite(proba).all(axis=1) & (proba.sum(axis=1) > 0))
+        proba = proba[rows]
+        pred = model.classes_[np.argmax(proba, axis=1)]
+        scores = proba[:, 1] if proba.shape[1] == 2 else proba
+    else:
+        pred = np.asarray(model.oob_prediction_)
+        rows = np.flatnonzero(np.isfinite(pred) & (_left_out_counts(model, len(y)) > 0))
+        pred, scores = pred[rows], None
+    metrics = fold_metrics(y[rows], pred, scores, classifier)
+    return {
+        "score": metrics["accuracy" if classifier else "r2"],
+        "metrics": metrics,
+        "rows": int(len(rows)),
+        "positions": rows,
+        "y": y[rows],
+        "pred": pred,
+        "scores": scores,
+    }
+
+
+def oof_scores(cv_results: dict) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """(y, out-of-fold ranking scores) over all cross-validated rows, or None."""
+    folds = cv_results["folds"]
+    if not cv_results["classifier"] or any(f["scores"] is None for f in folds):
+        return None
+    shapes = {f["scores"].shape[1:] for f in folds}
+    if len(shapes) != 1:
+        # a fold missed a class, so its score columns do not line up
+        return None
+    idx = np.concatenate([f["test"] for f in folds])
+    scores = np.concatenate([f["scores"] for f in folds])
+    order = np.argsort(idx, kind="stable")
+    return cv_results["y"][idx[order]], scores[order]
+
+
+def _fit_subset(estimator, X, y, train, test) -> Optional[tuple[float, float]]:
+    # a small subset can miss a class or be too small for the estimator
+    try:
+        est = clone(estimator)
+        est.fit(X[train], y[train])
+        return est.score(X[train], y[train]), est.score(X[test], y[test])
+    except Exception:
+        return None
+
+
+def learning_curve(cv_results: dict, random_state: int = 42) -> dict[str, list]:
+    """
+    Learning curve over the CV folds. The full-size point is scored with the
+    fold estimators that already exist; each smaller size is one fit on a
+    random subset of one fold's training rows (folds are used in turn).
+    """
+    X, y = cv_results["X"], cv_results["y"]
+    folds = cv_results["folds"]
+    rng = np.random.RandomState(random_state)
+
+    jobs = []
+    for i, frac in enumerate(LEARNING_CURVE_SIZES[:-1]):
+        fold = folds[i % len(folds)]
+        n = max(2, int(frac * len(fold["train"])))
+        train = rng.permutation(fold["train"])[:n]
+        jobs.append((n, train, fold["test"]))
+
+    with parallel.cores(len(jobs)) as n_jobs:
+        scores = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_subset)(cv_results["estimator"], X, y, train, test) for _, train, test in jobs
+        )
+
+    sizes, train_means, test_means = [], [], []
+    for (n, _, _), score in zip(jobs, scores):
+        if score is None:
+            continue
+        sizes.append(n)
+        train_means.append(float(score[0]))
+        test_means.append(float(score[1]))
+
+    # estimator.score is accuracy / r2, which the fold metrics already hold
+    full_train = [f["estimator"].score(X[f["train"]], y[f["train"]]) for f in folds]
+    key = "accuracy" if cv_results["classifier"] else "r2"
+    full_test = [m[key] for m in cv_results["metrics"]]
+    sizes.append(int(np.mean([len(f["train"]) for f in folds])))
+    train_means.append(float(np.mean(full_train)))
+    test_means.append(float(np.mean(full_test)))
+    return {"train_sizes": sizes, "train_scores_mean": train_means, "test_scores_mean": test_means}
+
+
+
+def _sub_ensemble(estimator, k: int):
+    # a fitted forest / bagging ensemble predicts from estimators_[:n_estimators]
+    sub = copy.copy(estimator)
+    sub.estimators_ = estimator.estimators_[:k]
+    if hasattr(estimator, "estimators_features_"):
+        sub.estimators_features_ = estimator.estimators_features_[:k]
+    sub.n_estimators = k
+    return sub
+
+
+def _staged_scores(estimator, X, y, stages: list[int]) -> list[float]:
+    if hasattr(estimator, "staged_score"):
+        # boosting scores every stage in one pass; it may stop before n_estimators
+        scores = list(estimator.staged_score(X, y))
+        return [scores[min(k, len(scores)) - 1] for k in stages]
+    return [_sub_ensemble(estimator, k).score(X, y) for k in stages]
+
+
+def _fold_complexity(fold: dict, X, y, stages: list[int]) -> tuple[list, list]:
+    est = fold["estimator"]
+    train, test = fold["train"], fold["test"]
+    return _staged_scores(est, X[train], y[train], stages), _staged_scores(est, X[test], y[test], stages)
+
+
+def complexity_curve(cv_results: dict) -> Optional[dict[str, Any]]:
+    """
+    Mean train/test score of the fold estimators against n_estimators, or None
+    when the estimator is not an ensemble that can be evaluated stage by stage.
+    """
+    folds = cv_results["folds"]
+    est = folds[0]["estimator"]
+    n_estimators = est.get_params(deep=False).get("n_estimators")
+    if not n_estimators or not (hasattr(est, "staged_score") or isinstance(getattr(est, "estimators_", None), list)):
+        return None
+    X, y = cv_results["X"], cv_results["y"]
+    n_points = min(n_estimators, COMPLEXITY_CURVE_POINTS)
+    stages = sorted({int(k) for k in np.linspace(1, n_estimators, n_points).round()})
+
+    with parallel.cores(len(folds)) as n_jobs:
+        # threads: the fitted fold estimators need not be copied to workers
+        per_fold = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_fold_complexity)(f, X, y, stages) for f in folds
+        )
+    return {
+        "param": "n_estimators",
+        "values": stages,
+        "train_scores_mean": np.mean([p[0] for p in per_fold], axis=0).tolist(),
+        "test_scores_mean": np.mean([p[1] for p in per_fold], axis=0).tolist(),
+    }
@@ -1,47 +1,158 @@
+import hashlib
+import itertools
+import math
 from typing import Any
 import numpy as np
 import pandas as pd
-from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
 from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split, KFold, cross_validate
+from sklearn.model_selection import train_test_split, KFold
 
-from . import ModelManager
+from . import ModelManager, folds, linear_stats
+from .prep_cache import make_key
+
+SWEEPS = ("each", "drop_one", "all")
+# most subsets scored by one sweep ("all" of 10 features is 1023)
+MAX_SUBSETS = 1024
+
+
+def sweep_subsets(features: list, sweep: str) -> list[list]:
+    """
+    Feature subsets of a sweep: "each" feature alone, "drop_one" (every
+    feature left out once) or "all" non-empty subsets. Raises ValueError.
+    """
+    features = list(features)
+    if sweep == "each":
+        return [[f] for f in features]
+    if sweep == "drop_one":
+        return [[g for g in features if g != f] for f in features if len(features) > 1]
+    if sweep == "all":
+        if 2 ** len(features) - 1 > MAX_SUBSETS:
+            raise ValueError(f"'all' is limited to {int(math.log2(MAX_SUBSETS + 1))} features")
+        return [list(c) for k in range(1, len(features) + 1) for c in itertools.combinations(features, k)]
+    raise ValueError(f"sweep must be one of: {', '.join(SWEEPS)}")
 
 
 class LinRegManager(ModelManager):
+    """
+    Ordinary least squares solved from sufficient statistics (see
+    ml.linear_stats): one pass over the prepared rows serves every CV fold, the
+    holdout fit and `fit_subsets`, and is cached per prepared dataset.
+    """
+
     def __init__(self, dataframe: pd.DataFrame, test_split, fit_intercept: bool = True, cv_folds: int = 5):
         super().__init__(dataframe, test_split)
         self.fit_intercept = fit_intercept
         self.cv_folds = cv_folds
 
+    @classmethod
+    def classifies(cls, params: dict) -> bool:
+        return False
+
+    def estimator(self):
+        return LinearRegression(fit_intercept=self.fit_intercept)
+
+    def sufficient_stats(self, X, y, features: list, target: str) -> tuple:
+        """
+        (stats, fold_ids, holdout_test) for the same folds and holdout split the
+        estimator-based training used (KFold / train_test_split, random_state=42),
+        or for the shared fold assignment when the manager was given one.
+        """
+        cache_key = None
+        dataset_key = getattr(self, "dataset_key", None)
+        shared = getattr(self, "fold_ids", None)
+        if dataset_key:
+            prep_key = make_key(dataset_key, features, target, False, getattr(self, "truth_spec", None))
+            cache_key = f"{prep_key}:{self.cv_folds}:{self.test_split}"
+            if shared is not None:
+                cache_key += ":" + hashlib.sha256(np.asarray(shared, dtype="int64").tobytes()).hexdigest()
+            cached = linear_stats.stats_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        n = len(y)
+        if shared is not None:
+            fold_ids = np.asarray(shared, dtype="int64")
+        else:
+            fold_ids = np.empty(n, dtype="int64")
+            cv = KFold(n_splits=self.cv_folds, shuffle=True, random_state=42)
+            for k, (_, test) in enumerate(cv.split(np.empty((n, 0)))):
+                fold_ids[test] = k
+        _, test_rows = train_test_split(np.arange(n), test_size=self.test_split, random_state=42)
+        holdout_test = np.zeros(n, dtype=bool)
+        holdout_test[test_rows] = True
+
+        entry = (linear_stats.accumulate(X, y, fold_ids, holdout_test, self.cv_folds), fold_ids, holdout_test)
+        if cache_key is not None:
+            linear_stats.stats_cache.put(cache_key, entry)
+        return entry
+
+    def _fitted(self, beta: np.ndarray, n_features: int) -> LinearRegression:
+        model = self.estimator()
+        if self.fit_intercept:
+            model.intercept_, model.coef_ = float(beta[0]), np.asarray(beta[1:])
+        else:
+            model.intercept_, model.coef_ = 0.0, np.asarray(beta)
+        model.n_features_in_ = n_features
+        return model
+
+    def _cross_validate(self, X, y, stats, fold_ids) -> tuple[dict, dict]:
+        """Same results as ModelManager.cross_validate, solved from the statistics."""
+        if getattr(self, "fit_only", False):
+            self.cv_results = None
+            return {}, {}
+        try:
+            self.cv_results = self._fold_results(X, y, stats, fold_ids)
+        except Exception:
+            self.cv_results = None
+            return {}, {}
+        return self.cv_results["cv_mean"], self.cv_results["cv_std"]
+
+    def _fold_results(self, X, y, stats, fold_ids) -> dict[str, Any]:
+        y_arr = np.asarray(y, dtype="float64")
+        cols = linear_stats.columns(list(range(X.shape[1])), self.fit_intercept)
+        betas = linear_stats.fold_betas(stats, cols)
+        scores = linear_stats.fold_scores(stats, betas, cols)
+        pred = linear_stats.fold_predictions(X, fold_ids, betas, cols)
+
+        fold_list, metrics = [], []
+        rows = np.arange(len(y_arr))
+        for k, beta in enumerate(betas):
+            test = rows[fold_ids == k]
+            fold_list.append({
+                "estimator": self._fitted(beta, X.shape[1]),
+                "train": rows[fold_ids != k],
+                "test": test,
+                "pred": pred[test],
+                "scores": None,
+            })
+            metrics.append({**scores[k], "mae": float(np.mean(np.abs(y_arr[test] - pred[test])))})
+        cv_mean, cv_std = folds.summarize(metrics)
+        return {
+            "folds": fold_list,
+            "metrics": metrics,
+            "cv_mean": cv_mean,
+            "cv_std": cv_std,
+            "estimator": self.estimator(),
+            "classifier": False,
+            "X": np.asarray(X),
+            "y": y_arr,
+        }
+
     # renamed to `train` to match abstract interface and use self.test_split
     def train(self, target, features):
         X, y = self.prepare_xy(features, target, classifier=False)
+        stats, fold_ids, holdout_test = self.sufficient_stats(X, y, features, target)
 
         # Cross-validation summary (regression)
-        scoring = {"r2": "r2", "neg_mse": "neg_mean_squared_error", "neg_mae": "neg_mean_absolute_error"}
-        cv = KFold(n_splits=self.cv_folds, shuffle=True, random_state=42)
-        try:
-            cv_res = cross_validate(LinearRegression(fit_intercept=self.fit_intercept), X, y, cv=cv, scoring=scoring)
-            cv_mean = {"r2_mean": float(np.mean(cv_res["test_r2"])), "mse_mean": float(-np.mean(cv_res["test_neg_mse"])), "mae_mean": float(-np.mean(cv_res["test_neg_mae"]))}
-            cv_std = {"r2_std": float(np.std(cv_res["test_r2"])), "mse_std": float(np.std(cv_res["test_neg_mse"])), "mae_std": float(np.std(cv_res["test_neg_mae"]))}
-        except Exception:
-            cv_mean = {}
-            cv_std = {}
+        cv_mean, cv_std = self._cross_validate(X, y, stats, fold_ids)
 
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=self.test_split, random_state=42
         )
 
-        model = LinearRegression(fit_intercept=self.fit_intercept)
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-
-        result: dict[str, Any] = {
-            "r2": float(r2_score(y_test, y_pred)),
-            "mse": float(mean_squared_error(y_test, y_pred)),
-            "mae": float(mean_absolute_error(y_test, y_pred)),
-        }
+        cols = linear_stats.columns(list(range(X.shape[1])), self.fit_intercept)
+        model = self._fitted(linear_stats.holdout_beta(stats, cols), X.shape[1])
+        result: dict[str, Any] = self.holdout_metrics(model, X_test, y_test, classifier=False)
         result["cv_mean"] = cv_mean
         result["cv_std"] = cv_std
 
@@ -51,3 +162,26 @@ class LinRegManager(ModelManager):
         except Exception:
             pass
         return result
+
+    def fit_subsets(self, target, features, subsets: list[list[str]]) -> list[dict[str, Any]]:
+        """
+        Cross-validated and holdout R²/MSE for each subset of `features`, all
+        solved from the statistics of the full selection (its rows, after
+        sanitize, are used for every subset).
+        """
+        X, y = self.prepare_xy(features, target, classifier=False)
+        stats, _, _ = self.sufficient_stats(X, y, features, target)
+        position = {str(c): j for j, c in enumerate(X.columns)}
+        out = []
+        for subset in subsets:
+            missing = [f for f in subset if str(f) not in position]
+            if missing:
+                raise ValueError(f"Features not in the prepared selection: {', '.join(map(str, missing))}")
+            cols = linear_stats.columns([position[str(f)] for f in subset], self.fit_intercept)
+            fold_scores = linear_stats.fold_scores(stats, linear_stats.fold_betas(stats, cols), cols)
+            cv_mean, cv_std = folds.summarize(fold_scores)
+            beta = linear_stats.holdout_beta(stats, cols)
+            _, test_cells = stats.holdout_cells()
+            holdout = linear_stats.scores(*stats.total(test_cells), beta, cols)
+            out.append({"features": list(subset), **holdout, "cv_mean": cv_mean, "cv_std": cv_std})
+        return out
@@ -0,0 +1,190 @@
+"""
+Sufficient statistics for ordinary least squares.
+
+Rows are grouped into cells by (CV fold, holdout side). For every cell one pass
+over the rows accumulates ZᵀZ and Zᵀy with Z = [1, X], plus yᵀy, Σy and the row
+count. Any union of cells (a fold's training rows, the holdout training rows)
+is then a sum of cell statistics, so every fold, the holdout fit and any
+subset of the features are solved in O(p³) without reading the rows again.
+
+R² and MSE follow from the statistics as well; MAE needs the residuals, which
+`fold_predictions` computes for all folds in one more pass.
+
+Statistics are cached per prepared dataset (prep_cache key) and split layout.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+# rows gathered per block while accumulating, to bound temporary memory
+CHUNK_ROWS = 262_144
+
+
+class SufficientStats:
+    def __init__(self, n_features: int, n_folds: int):
+        q = n_features + 1
+        n_cells = 2 * n_folds
+        self.n_folds = n_folds
+        self.G = np.zeros((n_cells, q, q))
+        self.b = np.zeros((n_cells, q))
+        self.yy = np.zeros(n_cells)
+        self.ysum = np.zeros(n_cells)
+        self.n = np.zeros(n_cells, dtype="int64")
+
+    @staticmethod
+    def cell(fold, holdout_test):
+        return 2 * fold + holdout_test
+
+    def total(self, cells) -> tuple:
+        """(G, b, yy, ysum, n) summed over `cells`."""
+        cells = list(cells)
+        return (
+            self.G[cells].sum(axis=0),
+            self.b[cells].sum(axis=0),
+            self.yy[cells].sum(),
+            self.ysum[cells].sum(),
+            int(self.n[cells].sum()),
+        )
+
+    def fold_cells(self, fold: int) -> tuple[list, list]:
+        """(training cells, test cells) of CV fold `fold`."""
+        test = [self.cell(fold, 0), self.cell(fold, 1)]
+        train = [c for c in range(2 * self.n_folds) if c not in test]
+        return train, test
+
+    def holdout_cells(self) -> tuple[list, list]:
+        cells = range(2 * self.n_folds)
+        return [c for c in cells if c % 2 == 0], [c for c in cells if c % 2 == 1]
+
+
+def accumulate(X, y, fold_ids: np.ndarray, holdout_test: np.ndarray, n_folds: int) -> SufficientStats:
+    """One pass over (X, y); `fold_ids` and `holdout_test` give every row's cell."""
+    X = np.asarray(X, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    stats = SufficientStats(X.shape[1], n_folds)
+    cells = SufficientStats.cell(fold_ids.astype("int64"), holdout_test.astype("int64"))
+    order = np.argsort(cells, kind="stable")
+    bounds = np.searchsorted(cells[order], np.arange(2 * n_folds + 1))
+    for c in range(2 * n_folds):
+        rows = order[bounds[c]:bounds[c + 1]]
+        for start in range(0, len(rows), CHUNK_ROWS):
+            block = rows[start:start + CHUNK_ROWS]
+            Z = np.empty((len(block), X.shape[1] + 1))
+            Z[:, 0] = 1.0
+            Z[:, 1:] = X[block]
+            yb = y[block]
+            stats.G[c] += Z.T @ Z
+            stats.b[c] += Z.T @ yb
+            stats.yy[c] += yb @ yb
+            stats.ysum[c] += yb.sum()
+            stats.n[c] += len(block)
+    return stats
+
+
+def columns(features: list[int], fit_intercept: bool) -> list[int]:
+    """Indices into Z = [1, X] for a subset of feature indices."""
+    return ([0] if fit_intercept else []) + [1 + j for j in features]
+
+
+def solve(G: np.ndarray, b: np.ndarray, cols: list[int]) -> np.ndarray:
+    """Least-squares coefficients over Z[:, cols] (minimum norm when rank deficient)."""
+    return np.linalg.lstsq(G[np.ix_(cols, cols)], b[cols], rcond=None)[0]
+
+
+def scores(G, b, yy, ysum, n, beta, cols) -> dict[str, float]:
+    """R² and MSE of `beta` on rows summarized by (G, b, yy, ysum, n)."""
+    Gs = G[np.ix_(cols, cols)]
+    sse = max(float(yy - 2 * beta @ b[cols] + beta @ Gs @ beta), 0.0)
+    sst = float(yy - ysum * ysum / n) if n else 0.0
+    return {
+        "r2": 1.0 - sse / sst if sst > 0 else float("nan"),
+        "mse": sse / n if n else float("nan"),
+    }
+
+
+def fold_betas(stats: SufficientStats, cols: list[int]) -> list[np.ndarray]:
+    betas = []
+    for k in range(stats.n_folds):
+        train, _ = stats.fold_cells(k)
+        G, b, *_ = stats.total(train)
+        betas.append(solve(G, b, cols))
+    return betas
+
+
+def fold_scores(stats: SufficientStats, betas: list[np.ndarray], cols: list[int]) -> list[dict[str, float]]:
+    out = []
+    for k, beta in enumerate(betas):
+        _, test = stats.fold_cells(k)
+        out.append(scores(*stats.total(test), beta, cols))
+    return out
+
+
+def holdout_beta(stats: SufficientStats, cols: list[int]) -> np.ndarray:
+    train, _ = stats.holdout_cells()
+    G, b, *_ = stats.total(train)
+    return solve(G, b, cols)
+
+
+def fold_predictions(X, fold_ids: np.ndarray, betas: list[np.ndarray], cols: list[int]) -> np.ndarray:
+    """Out-of-fold predictions: every row predicted by its own fold's coefficients."""
+    X = np.asarray(X, dtype="float64")
+    # (q, k) coefficient matrix on Z = [1, X]; unused columns stay zero
+    B = np.zeros((X.shape[1] + 1, len(betas)))
+    for k, beta in enumerate(betas):
+        B[cols, k] = beta
+    pred = np.empty(len(X))
+    for start in range(0, len(X), CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, len(X))
+        block = X[start:stop] @ B[1:] + B[0]
+        pred[start:stop] = block[np.arange(stop - start), fold_ids[start:stop]]
+    return pred
+
+
+class StatsCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: tuple) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+try:
+    _max_entries = int(os.environ.get("LINEAR_STATS_CACHE_ENTRIES", "64"))
+except Exception:
+    _max_entries = 64
+
+stats_cache = StatsCache(_max_entries)
@@ -1,22 +1,41 @@
-from typing import Any, Literal
+import copy
+from typing import Any, Literal, Optional, Union
 import numpy as np
 import pandas as pd
-from sklearn.calibration import label_binarize
-from sklearn.metrics import (
-    accuracy_score,
-    average_precision_score,
-    f1_score,
-    precision_recall_curve,
-    precision_score,
-    recall_score,
-    roc_auc_score,
-    roc_curve,
-)
+from joblib import Parallel, delayed
+from sklearn.base import clone
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_validate
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.multiclass import OneVsRestClassifier
+from sklearn.preprocessing import StandardScaler
 
-from . import ModelManager
+from . import ModelManager, folds, parallel
+
+# C values of a regularization path given as a count, as in LogisticRegressionCV
+PATH_C_RANGE = (-4, 4)
+
+
+def _fit_path(prototype, X, y, train, test, Cs: list[float], prefix: str = "") -> list[dict]:
+    """
+    Fit one fold along `Cs` (ascending), each fit warm-started from the
+    previous coefficients; returns one run_folds-style fold per C. `prefix`
+    addresses the wrapped model's parameters (one-vs-rest).
+    """
+    est = clone(prototype)
+    est.set_params(**{prefix + "warm_start": True})
+    X_test = X[test]
+    out = []
+    for C in Cs:
+        est.set_params(**{prefix + "C": C})
+        est.fit(X[train], y[train])
+        out.append({
+            "estimator": copy.deepcopy(est),
+            "train": train,
+            "test": test,
+            "pred": est.predict(X_test),
+            "scores": folds.ranking_scores(est, X_test),
+        })
+    return out
 
 
 class LogRegManager(ModelManager):
@@ -31,6 +50,8 @@ class LogRegManager(ModelManager):
         ] = "lbfgs",
         max_iter: int = 1000,
         cv_folds: int = 5,
+        multi_class: Literal["auto", "multinomial", "ovr"] = "auto",
+        Cs: Optional[Union[int, list[float]]] = None,
     ):
         super().__init__(dataframe, test_split)
         self.penalty = penalty
@@ -38,6 +59,74 @@ class LogRegManager(ModelManager):
         self.solver = solver
         self.max_iter = max_iter
         self.cv_folds = cv_folds
+        self.multi_class = multi_class
+        self.Cs = Cs
+
+    def one_vs_rest(self) -> bool:
+        """liblinear only fits binary problems; every other solver is natively multinomial."""
+        if self.multi_class == "auto":
+            return self.solver == "liblinear"
+        return self.multi_class == "ovr"
+
+    @classmethod
+    def classifies(cls, params: dict) -> bool:
+        return True
+
+    def estimator(self):
+        model = LogisticRegression(penalty=self.penalty, C=self.C, solver=self.solver, max_iter=self.max_iter)
+        return OneVsRestClassifier(model) if self.one_vs_rest() else model
+
+    def path_values(self) -> list[float]:
+        if isinstance(self.Cs, int):
+            return [float(c) for c in np.logspace(*PATH_C_RANGE, self.Cs)]
+        return sorted(float(c) for c in self.Cs)
+
+    def regularization_path(self, X, y, cv) -> dict[str, Any]:
+        """
+        Cross-validate every C of `self.Cs` with warm starts along the path.
+        Keeps the folds of the best C (by accuracy) in `self.cv_results`, sets
+        `self.C` to it and returns the per-C scores.
+        """
+        Cs = self.path_values()
+        if not Cs or min(Cs) <= 0:
+            raise ValueError("Cs must be positive")
+        X = np.asarray(X)
+        y = np.asarray(y)
+        splits = list(cv.split(X, y))
+        # the holdout model's own form; one-vs-rest refits every class from
+        # scratch, so only the native model gains from the warm starts
+        prototype = parallel.single_threaded(self.estimator())
+        prefix = "estimator__" if self.one_vs_rest() else ""
+        with parallel.cores(len(splits)) as n_jobs:
+            per_fold = Parallel(n_jobs=n_jobs)(
+                delayed(_fit_path)(prototype, X, y, train, test, Cs, prefix) for train, test in splits
+            )
+
+        path: dict[str, Any] = {"C": Cs}
+        runs = []
+        for i in range(len(Cs)):
+            fold_list = [fold[i] for fold in per_fold]
+            metrics = [folds.fold_metrics(y[f["test"]], f["pred"], f["scores"], True) for f in fold_list]
+            cv_mean, cv_std = folds.summarize(metrics)
+            runs.append((fold_list, metrics, cv_mean, cv_std))
+            for name, value in {**cv_mean, **cv_std}.items():
+                path.setdefault(name, []).append(value)
+
+        best = int(np.nanargmax([r[2]["accuracy_mean"] for r in runs]))
+        fold_list, metrics, cv_mean, cv_std = runs[best]
+        self.C = Cs[best]
+        path["best_C"] = self.C
+        self.cv_results = {
+            "folds": fold_list,
+            "metrics": metrics,
+            "cv_mean": cv_mean,
+            "cv_std": cv_std,
+            "estimator": prototype.set_params(**{prefix + "C": self.C}),
+            "classifier": True,
+            "X": X,
+            "y": y,
+        }
+        return path
 
     def train(self, target, features):
         # prepare features and target; logistic regression is a classifier
@@ -48,82 +137,35 @@ class LogRegManager(ModelManager):
 
         X_filtered = X.loc[mask]
         y_filtered = y.loc[mask]
-        X=X_filtered
+        # one scaling for the CV/path fits and the holdout model, so the C they
+        # choose is the C the saved model is fitted with
+        scaler = StandardScaler()
+        X = scaler.fit_transform(X_filtered)
+        self.holdout_scaler = scaler
         y = y_filtered
         # Cross-validation summary (classification)
-        scoring = {
-            "accuracy": "accuracy",
-            "precision": "precision_macro",
-            "recall": "recall_macro",
-            "f1": "f1_macro",
-            "roc_auc": "roc_auc",
-            "pr_auc": "average_precision",
-        }
-        cv = StratifiedKFold(n_splits=self.cv_folds, shuffle=True, random_state=42)
-        try:
-            cv_res = cross_validate(
-                LogisticRegression(
-                    penalty=self.penalty,
-                    C=self.C,
-                    solver=self.solver,
-                    max_iter=self.max_iter,
-                ),
-                X,
-                y,
-                cv=cv,
-                scoring=scoring,
-            )
-            cv_mean = {k + "_mean": float(np.mean(cv_res[f"test_{k}"])) for k in scoring}
-            cv_std = {k + "_std": float(np.std(cv_res[f"test_{k}"])) for k in scoring}
-        except Exception:
-            cv_mean = {}
-            cv_std = {}
-        y = pd.Categorical(y).codes
+        cv = self.splitter(StratifiedKFold(n_splits=self.cv_folds, shuffle=True, random_state=42), rows=mask.to_numpy())
+        path = None
+        if self.Cs is not None and not getattr(self, "fit_only", False):
+            path = self.regularization_path(X, y, cv)
+            cv_mean, cv_std = self.cv_results["cv_mean"], self.cv_results["cv_std"]
+        else:
+            cv_mean, cv_std = self.cross_validate(self.estimator(), X, y, cv, classifier=True)
+        classes = pd.Categorical(y)
+        y = classes.codes
+        self.holdout_classes = np.asarray(classes.categories)
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=self.test_split, random_state=42, stratify=y
         )
-        from sklearn.preprocessing import StandardScaler
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
-        X_train = X_train_scaled
-        X_test = X_test_scaled
-        model = OneVsRestClassifier(
-            LogisticRegression(
-            penalty=self.penalty,
-            C=1,
-            solver=self.solver,
-            max_iter=self.max_iter,
-            multi_class='ovr',
-        ))
-
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        y_proba = None
-        try:
-            y_proba = model.predict_proba(X_test)[:, 1]
-        except Exception:
-            y_proba = None
+        model = self.estimator()
 
-        result: dict[str, Any] = {
-            "accuracy": float(accuracy_score(y_test, y_pred)),
-            "precision": float(precision_score(y_test, y_pred, average="macro", zero_division=0)),
-            "recall": float(recall_score(y_test, y_pred, average="macro")),
-            "f1": float(f1_score(y_test, y_pred, average="macro")),
-        }
-        if y_proba is not None:
-            result["roc_auc"] = float(roc_auc_score(y_test, y_proba, multi_class='ovr', average="macro"))
-            y_true_bin = label_binarize(y_test, classes=np.unique(y_test))
-            average_precision_score(y_true_bin, y_proba, average="macro")
-            fpr, tpr, _ = roc_curve(y_test, y_proba)
-            precision, recall, _ = precision_recall_curve(y_test, y_proba)
-            result["roc_curve"] = {"fpr": fpr.tolist(), "tpr": tpr.tolist()}
-            result["pr_curve"] = {
-                "precision": precision.tolist(),
-                "recall": recall.tolist(),
-            }
+        parallel.fit(model, X_train, y_train)
+        # ROC/PR curves and AUCs are computed by evaluate_model
+        result: dict[str, Any] = self.holdout_metrics(model, X_test, y_test, classifier=True)
         result["cv_mean"] = cv_mean
         result["cv_std"] = cv_std
+        if path is not None:
+            result["regularization_path"] = path
 
         try:
             eval_artifacts = self.evaluate_model(
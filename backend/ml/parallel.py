@@ -0,0 +1,124 @@
+"""
+Core budget shared by everything that trains models.
+
+Cross-validation folds, learning-curve points and ensemble estimators run with
+n_jobs > 1, but every parallel section first reserves cores from one budget
+(ML_CORE_BUDGET, default: all CPUs) so that concurrent training runs share the
+machine instead of each assuming it owns all of it. BLAS/OpenMP threads inside
+a reservation are limited to the reserved count as well.
+
+The budget is per process unless `use_shared_budget` installs a counter shared
+between processes; the training pool in jobs.py does that for its workers.
+"""
+import multiprocessing.util
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from sklearn.base import clone
+from threadpoolctl import threadpool_limits
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except Exception:
+        return default
+
+
+CORE_BUDGET = max(1, _env_int("ML_CORE_BUDGET", os.cpu_count() or 1))
+
+
+class _Counter:
+    # same interface as multiprocessing.Value for the in-process budget
+    def __init__(self, value: int):
+        self.value = value
+
+
+class CoreBudget:
+    def __init__(self, total: int, free=None, cond=None):
+        self.total = max(1, int(total))
+        self._free = free if free is not None else _Counter(self.total)
+        self._cond = cond if cond is not None else threading.Condition()
+
+    def acquire(self, want: int) -> int:
+        """Block until at least one core is free, then take up to `want` of them."""
+        want = max(1, min(int(want), self.total))
+        with self._cond:
+            while self._free.value < 1:
+                self._cond.wait()
+            n = min(want, self._free.value)
+            self._free.value -= n
+            return n
+
+    def release(self, n: int) -> None:
+        with self._cond:
+            self._free.value += n
+            self._cond.notify_all()
+
+    def available(self) -> int:
+        with self._cond:
+            return int(self._free.value)
+
+
+budget = CoreBudget(CORE_BUDGET)
+_local = threading.local()
+
+
+def _stop_joblib_workers() -> None:
+    from joblib.externals.loky import reusable_executor
+
+    executor = getattr(reusable_executor, "_executor", None)
+    if executor is not None:
+        executor.shutdown(wait=True, kill_workers=True)
+
+
+def use_shared_budget(total: int, free, cond) -> None:
+    """Pool initializer: take cores from a budget shared with sibling processes."""
+    global budget
+    budget = CoreBudget(total, free, cond)
+    # a pool process waits for its children on exit, and idle joblib workers
+    # would otherwise keep it alive until their own timeout
+    multiprocessing.util.Finalize(None, _stop_joblib_workers, exitpriority=10)
+
+
+@contextmanager
+def cores(want: int) -> Iterator[int]:
+    """
+    Reserve up to `want` cores for a parallel section and yield the number
+    granted (at least 1). Nested sections run inside the outer reservation.
+    """
+    if getattr(_local, "held", 0):
+        yield 1
+        return
+    b = budget
+    n = b.acquire(want)
+    _local.held = n
+    try:
+        with threadpool_limits(limits=n):
+            yield n
+    finally:
+        _local.held = 0
+        b.release(n)
+
+
+def single_threaded(estimator):
+    """Unfitted copy of `estimator` that does not parallelize internally."""
+    estimator = clone(estimator)
+    if "n_jobs" in estimator.get_params(deep=False):
+        estimator.set_params(n_jobs=1)
+    return estimator
+
+
+def fit(model, X, y):
+    """
+    Fit `model`; estimators with an `n_jobs` parameter (forests, bagging,
+    one-vs-rest) get a share of the budget sized by their number of estimators.
+    """
+    if "n_jobs" not in model.get_params(deep=False):
+        with cores(1):
+            return model.fit(X, y)
+    with cores(getattr(model, "n_estimators", None) or CORE_BUDGET) as n_jobs:
+        model.set_params(n_jobs=n_jobs)
+        return model.fit(X, y)
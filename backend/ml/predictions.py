@@ -0,0 +1,28 @@
+"""
+Per-manager cache of model outputs.
+
+`predict`, `predict_proba` and `decision_function` are each run at most once
+per (model, X) pair; the holdout metrics, the confusion matrix, the ROC/PR
+fallback and the saved predictions all read the same arrays.
+"""
+from typing import Any
+
+
+class PredictionCache:
+    def __init__(self):
+        # entries keep the model and X alive, so their ids cannot be reused
+        self._entries: dict[tuple, tuple[Any, Any, Any]] = {}
+        self.calls = 0
+
+    def get(self, model, X, method: str = "predict"):
+        key = (id(model), id(X), method)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry[2]
+        out = getattr(model, method)(X)
+        self.calls += 1
+        self._entries[key] = (model, X, out)
+        return out
+
+    def clear(self) -> None:
+        self._entries.clear()
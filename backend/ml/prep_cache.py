@@ -0,0 +1,212 @@
+"""
+Cache of prepared training matrices.
+
+`ModelManager.prepare_xy` output (the scaled float64 feature matrix and the
+encoded target) only depends on the dataset content, the feature list, the
+target, the classifier flag and the truth_spec. Training several models on the
+same selection therefore only needs to prepare it once.
+
+Training runs in several pool processes, each with its own instance, so
+prepare_xy spills every entry as .npy files to PREP_CACHE_DIR (bounded by
+PREP_CACHE_DISK_BYTES) and keeps the memory-mapped files rather than a private
+copy: every process finds the entry on disk and they share its pages. Entries
+put without `spill` live in memory up to PREP_CACHE_BYTES (per process) and
+are spilled once they are the least recently used. Each entry also keeps the
+description of its preprocessing, which saved model artifacts replay.
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except Exception:
+        return default
+
+
+def normalize_truth_spec(truth_spec: Optional[dict]) -> Optional[dict]:
+    # "5", 5 and 5.0 select the same rows, so they must produce the same key
+    if not truth_spec:
+        return None
+    val = truth_spec.get("value")
+    try:
+        val = float(val)
+    except Exception:
+        val = None if val is None else str(val)
+    return {"operator": truth_spec.get("operator"), "value": val}
+
+
+def make_key(dataset_key: str, features: list, target: str, classifier: Optional[bool], truth_spec: Optional[dict]) -> str:
+    payload = {
+        "dataset": dataset_key,
+        "features": [str(f) for f in features],
+        "target": str(target),
+        "classifier": classifier,
+        "truth_spec": normalize_truth_spec(truth_spec),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class PreprocessingCache:
+    def __init__(self, max_bytes: int, spill_dir: Optional[str], max_disk_bytes: int):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _paths(self, key: str) -> tuple[str, str, str]:
+        base = os.path.join(self.spill_dir, key)
+        return base + ".X.npy", base + ".y.npy", base + ".json"
+
+    def _spill(self, key: str, entry: dict) -> bool:
+        """Write `entry` to the spill directory; whether it is there afterwards."""
+        if not self.spill_dir:
+            return False
+        x_path, y_path, meta_path = self._paths(key)
+        if os.path.exists(meta_path):
+            return True
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # other processes may spill the same key or have its files mapped, so each
+        # file is written under a unique name and swapped in
+        tmp = f".{uuid.uuid4().hex}.tmp"
+        try:
+            with open(x_path + tmp, "wb") as f:
+                np.save(f, entry["X"])
+            with open(y_path + tmp, "wb") as f:
+                np.save(f, entry["y"])
+            with open(meta_path + tmp, "w") as f:
+                json.dump({"columns": entry["columns"], "transform": entry.get("transform")}, f)
+            os.replace(x_path + tmp, x_path)
+            os.replace(y_path + tmp, y_path)
+            # metadata last: its presence marks a complete spill
+            os.replace(meta_path + tmp, meta_path)
+        finally:
+            for path in (x_path, y_path, meta_path):
+                if os.path.exists(path + tmp):
+                    os.remove(path + tmp)
+        self._prune_disk()
+        return os.path.exists(meta_path)
+
+    def _prune_disk(self) -> None:
+        files = []
+        for name in os.listdir(self.spill_dir):
+            if name.endswith(".json"):
+                key = name[: -len(".json")]
+                paths = self._paths(key)
+                size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+                files.append((os.path.getmtime(paths[2]), size, paths))
+        total = sum(f[1] for f in files)
+        for _, size, paths in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            for p in paths:
+                if os.path.exists(p):
+                    os.remove(p)
+            total -= size
+
+    def _load_spilled(self, key: str) -> Optional[dict]:
+        if not self.spill_dir:
+            return None
+        x_path, y_path, meta_path = self._paths(key)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            os.utime(meta_path)
+            return {
+                "X": np.load(x_path, mmap_mode="r"),
+                "y": np.load(y_path, allow_pickle=False),
+                "columns": meta["columns"],
+                "transform": meta.get("transform"),
+                "bytes": 0,  # memory-mapped; pages are owned by the OS cache
+            }
+        except Exception:
+            return None
+
+    def get(self, key: str) -> Optional[tuple[np.ndarray, list, np.ndarray]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["X"], entry["columns"], entry["y"]
+        entry = self._load_spilled(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._entries[key] = entry
+        return entry["X"], entry["columns"], entry["y"]
+
+    def transform(self, key: str) -> Optional[dict]:
+        """The preprocessing description stored with an entry (see ModelManager.prepare_xy)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry.get("transform") if entry is not None else None
+
+    def put(
+        self, key: str, X: np.ndarray, columns: list, y: np.ndarray, spill: bool = False, transform: Optional[dict] = None
+    ) -> None:
+        X = np.ascontiguousarray(X, dtype="float64")
+        y = np.asarray(y)
+        # shared between managers, so never let a caller modify them in place
+        X.flags.writeable = False
+        y.flags.writeable = False
+        entry = {
+            "X": X,
+            "y": y,
+            "columns": [str(c) for c in columns],
+            "transform": transform,
+            "bytes": X.nbytes + y.nbytes,
+        }
+        if spill and self._spill(key, entry):
+            # keep the mapped files, which every process shares, not this copy
+            entry = self._load_spilled(key) or entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            evicted = []
+            total = sum(e["bytes"] for e in self._entries.values())
+            while total > self.max_bytes and self._entries:
+                old_key, old = self._entries.popitem(last=False)
+                total -= old["bytes"]
+                evicted.append((old_key, old))
+        for old_key, old in evicted:
+            if old["bytes"]:
+                self._spill(old_key, old)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e["bytes"] for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+prep_cache = PreprocessingCache(
+    max_bytes=_env_int("PREP_CACHE_BYTES", 1024 * 1024 * 1024),
+    spill_dir=os.environ.get("PREP_CACHE_DIR", os.path.join("cache", "prep")),
+    max_disk_bytes=_env_int("PREP_CACHE_DISK_BYTES", 4 * 1024 * 1024 * 1024),
+)
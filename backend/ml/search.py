@@ -0,0 +1,304 @@
+"""
+Hyperparameter search over any manager in `ml.models`.
+
+A search prepares X/y once (through the manager's prepare_xy and the shared
+preprocessing cache), holds out `test_split` of the rows for validation and
+scores every configuration on that holdout. Trials are fitted in parallel
+within the core budget.
+
+Methods:
+- "grid": every combination of the listed values
+- "random": `n_trials` configurations sampled from the space
+- "halving": successive halving; all sampled configurations start on a small
+  random subset of the training rows, and only the best 1/eta of each rung is
+  refitted on eta times more rows, up to all of them
+- "hyperband": several successive-halving brackets with different starting
+  subset sizes, trading many cheap trials against fewer thorough ones
+
+A space maps parameter names to a list of values, or (for every method but
+grid) to {"low", "high", "log": bool, "type": "int" | "float"}. The search
+stops starting new rungs once `max_trials` fits were run or `time_budget`
+seconds have passed.
+"""
+import itertools
+import math
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import train_test_split
+
+from . import parallel
+
+METHODS = ("grid", "random", "halving", "hyperband")
+
+DEFAULTS = {
+    "method": "random",
+    "n_trials": 20,
+    "eta": 3,
+    "min_resource": None,
+    "max_trials": 100,
+    "time_budget": None,
+    "scoring": None,
+    "persist_top": 1,
+}
+
+
+def _check_space(space: dict, method: str) -> None:
+    if not isinstance(space, dict) or not space:
+        raise ValueError("space must map parameter names to candidate values")
+    for name, dist in space.items():
+        if isinstance(dist, list):
+            if not dist:
+                raise ValueError(f"space for '{name}' has no values")
+        elif isinstance(dist, dict) and "low" in dist and "high" in dist:
+            if method == "grid":
+                raise ValueError(f"grid search needs a list of values for '{name}'")
+            if dist.get("log") and float(dist["low"]) <= 0:
+                raise ValueError(f"log-scaled range for '{name}' must be positive")
+        else:
+            raise ValueError(f"space for '{name}' must be a list or a {{low, high}} range")
+
+
+def options(raw: Optional[dict]) -> dict[str, Any]:
+    """Search options from a request body, with defaults filled in; raises ValueError."""
+    raw = raw or {}
+    opts = dict(DEFAULTS)
+    opts["space"] = raw.get("space")
+    if raw.get("method") is not None:
+        opts["method"] = str(raw["method"])
+    for name in ("n_trials", "eta", "min_resource", "max_trials", "persist_top"):
+        if raw.get(name) is not None:
+            opts[name] = int(raw[name])
+    if raw.get("time_budget") is not None:
+        opts["time_budget"] = float(raw["time_budget"])
+    if raw.get("scoring") is not None:
+        opts["scoring"] = str(raw["scoring"])
+        get_scorer(opts["scoring"])
+    if opts["method"] not in METHODS:
+        raise ValueError(f"method must be one of: {', '.join(METHODS)}")
+    if min(opts["n_trials"], opts["max_trials"]) < 1 or opts["persist_top"] < 0:
+        raise ValueError("n_trials and max_trials must be positive and persist_top not negative")
+    _check_space(opts["space"], opts["method"])
+    return opts
+
+
+def grid(space: dict) -> list[dict]:
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def _draw(dist, rng: np.random.RandomState):
+    if isinstance(dist, list):
+        return dist[rng.randint(len(dist))]
+    low, high = float(dist["low"]), float(dist["high"])
+    if dist.get("log"):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    if dist.get("type") == "int":
+        return int(round(value))
+    return float(value)
+
+
+def sample(space: dict, n: int, rng: np.random.RandomState) -> list[dict]:
+    """Up to `n` distinct configurations drawn from `space`."""
+    names = sorted(space)
+    if all(isinstance(space[k], list) for k in names):
+        configs = grid(space)
+        if len(configs) <= n:
+            return configs
+        return [configs[i] for i in rng.choice(len(configs), n, replace=False)]
+    configs, seen = [], set()
+    # ranges rarely repeat; the attempt cap only matters for tiny integer ranges
+    for _ in range(n * 10):
+        config = {k: _draw(space[k], rng) for k in names}
+        key = repr(sorted(config.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+            if len(configs) == n:
+                break
+    return configs
+
+
+def _fit_trial(estimator, X_train, y_train, X_val, y_val, rows, scorer) -> Optional[float]:
+    # a configuration may be invalid for this data (e.g. too few rows on a subset)
+    try:
+        est = clone(estimator)
+        est.fit(X_train[rows], y_train[rows])
+        score = float(scorer(est, X_val, y_val))
+        return score if np.isfinite(score) else None
+    except Exception:
+        return None
+
+
+class Search:
+    def __init__(
+        self,
+        manager_cls,
+        df,
+        target: str,
+        features: list,
+        test_split: float,
+        params: Optional[dict] = None,
+        setup: Optional[Callable] = None,
+        scoring: Optional[str] = None,
+        random_state: int = 42,
+    ):
+        """
+        `params` are fixed for every trial; `setup(manager)` attaches dataset
+        state (column_types, dataset_key, truth_spec) to each manager.
+        """
+        self.manager_cls = manager_cls
+        self.df = df
+        self.test_split = test_split
+        self.params = dict(params or {})
+        self.setup = setup
+        self.random_state = random_state
+
+        base = self.manager(self.params)
+        estimator = base.estimator()
+        self.classifier = is_classifier(estimator)
+        X, y = base.prepare_xy(features, target, classifier=self.classifier)
+        X, y = np.asarray(X, dtype="float64"), np.asarray(y)
+        self.X_train, self.X_val, self.y_train, self.y_val = train_test_split(
+            X, y, test_size=base.test_split, random_state=random_state,
+            stratify=y if self.classifier else None,
+        )
+        self.scoring = scoring or ("accuracy" if self.classifier else "r2")
+        self.scorer = get_scorer(self.scoring)
+        self.trials: list[dict] = []
+
+    def manager(self, config: dict):
+        manager = self.manager_cls(self.df, self.test_split, **{**self.params, **config})
+        if self.setup is not None:
+            self.setup(manager)
+        return manager
+
+    def _rows(self, n: int) -> np.ndarray:
+        n_train = len(self.y_train)
+        if n >= n_train:
+            return np.arange(n_train)
+        rng = np.random.RandomState(self.random_state)
+        if self.classifier:
+            # keep every class represented on small subsets where possible
+            try:
+                rows, _ = train_test_split(
+                    np.arange(n_train), train_size=n, random_state=rng, stratify=self.y_train
+                )
+                return np.sort(rows)
+            except ValueError:
+                pass
+        return np.sort(rng.choice(n_train, n, replace=False))
+
+    def run_rung(self, configs: list[dict], resource: int, rung: int, bracket: int = 0) -> list[dict]:
+        """Fit every configuration on `resource` training rows and record the trials."""
+        rows = self._rows(resource)
+        estimators = []
+        for config in configs:
+            manager = self.manager(config)
+            # size-aware managers (SVMManager) choose their engine by training rows
+            manager.n_rows = len(rows)
+            estimators.append(parallel.single_threaded(manager.estimator()))
+        with parallel.cores(len(configs)) as n_jobs:
+            scores = Parallel(n_jobs=n_jobs)(
+                delayed(_fit_trial)(est, self.X_train, self.y_train, self.X_val, self.y_val, rows, self.scorer)
+                for est in estimators
+            )
+        trials = [
+            {"params": c, "score": s, "resource": len(rows), "rung": rung, "bracket": bracket}
+            for c, s in zip(configs, scores)
+        ]
+        self.trials.extend(trials)
+        return trials
+
+    def leaderboard(self) -> list[dict]:
+        """Each configuration once, at the largest resource it reached, best first."""
+        best: dict[str, dict] = {}
+        for trial in self.trials:
+            key = repr(sorted(trial["params"].items()))
+            if key not in best or trial["resource"] >= best[key]["resource"]:
+                best[key] = trial
+        ranked = sorted(
+            best.values(),
+            key=lambda t: (t["resource"], t["score"] is not None, t["score"] or 0.0),
+            reverse=True,
+        )
+        return [dict(t, rank=i + 1) for i, t in enumerate(ranked)]
+
+
+def _survivors(trials: list[dict], keep: int) -> list[dict]:
+    ranked = sorted((t for t in trials if t["score"] is not None), key=lambda t: t["score"], reverse=True)
+    return [t["params"] for t in ranked[:keep]]
+
+
+def run(
+    search: Search,
+    space: dict,
+    method: str = "random",
+    n_trials: int = 20,
+    eta: int = 3,
+    min_resource: Optional[int] = None,
+    max_trials: int = 100,
+    time_budget: Optional[float] = None,
+    on_progress: Optional[Callable[[list], None]] = None,
+) -> list[dict]:
+    """
+    Run a search and return the final leaderboard. `on_progress(leaderboard)`
+    is called after every rung.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of: {', '.join(METHODS)}")
+    _check_space(space, method)
+    eta = max(2, int(eta))
+    started = time.monotonic()
+    rng = np.random.RandomState(search.random_state)
+    n_train = len(search.y_train)
+    min_resource = max(2, min(int(min_resource or max(20, n_train // eta ** 3)), n_train))
+    fits = 0
+
+    def out_of_budget() -> bool:
+        if fits >= max_trials:
+            return True
+        return time_budget is not None and time.monotonic() - started > time_budget
+
+    def rung(configs, resource, index, bracket=0):
+        nonlocal fits
+        configs = configs[: max(0, max_trials - fits)]
+        trials = search.run_rung(configs, resource, index, bracket)
+        fits += len(configs)
+        if on_progress is not None:
+            on_progress(search.leaderboard())
+        return trials
+
+    def halving(configs, resource, bracket=0):
+        index = 0
+        while configs and not out_of_budget():
+            trials = rung(configs, resource, index, bracket)
+            if resource >= n_train:
+                break
+            configs = _survivors(trials, max(1, len(configs) // eta))
+            resource = min(n_train, resource * eta)
+            index += 1
+
+    if method == "grid":
+        rung(grid(space), n_train, 0)
+    elif method == "random":
+        rung(sample(space, min(n_trials, max_trials), rng), n_train, 0)
+    elif method == "halving":
+        # enough rungs to grow min_resource to the full training set
+        n_rungs = 1 + max(0, math.ceil(math.log(n_train / min_resource, eta)))
+        start = max(min_resource, n_train // eta ** (n_rungs - 1))
+        halving(sample(space, min(n_trials, max_trials), rng), start)
+    else:
+        s_max = max(0, int(math.log(n_train / min_resource, eta)))
+        for s in range(s_max, -1, -1):
+            if out_of_budget():
+                break
+            n = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+            halving(sample(space, n, rng), max(min_resource, n_train // eta ** s), bracket=s_max - s)
+    return search.leaderboard()
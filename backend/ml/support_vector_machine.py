@@ -1,23 +1,31 @@
-from typing import Any, Literal
-import numpy as np
+from typing import Any, Literal, Optional
+import os
 import pandas as pd
-from sklearn.metrics import (
-    accuracy_score,
-    average_precision_score,
-    f1_score,
-    mean_absolute_error,
-    mean_squared_error,
-    precision_recall_curve,
-    precision_score,
-    r2_score,
-    recall_score,
-    roc_auc_score,
-    roc_curve,
-)
-from sklearn.model_selection import train_test_split, KFold, StratifiedKFold, cross_validate
-from sklearn.svm import SVC, SVR
-
-from . import ModelManager
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.kernel_approximation import Nystroem
+from sklearn.model_selection import train_test_split, KFold, StratifiedKFold, StratifiedShuffleSplit
+from sklearn.pipeline import make_pipeline
+from sklearn.svm import SVC, SVR, LinearSVC, LinearSVR
+
+from . import ModelManager, parallel
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except Exception:
+        return default
+
+
+# above this many training rows the kernel solver (O(n^2) memory, up to O(n^3)
+# time) is replaced by a linear solver on approximate kernel features
+SVM_EXACT_MAX_ROWS = _env_int("SVM_EXACT_MAX_ROWS", 20_000)
+# Nystroem components used by the approximate engine
+SVM_APPROX_COMPONENTS = _env_int("SVM_APPROX_COMPONENTS", 300)
+# share of the training rows held out for the single calibration pass
+CALIBRATION_SIZE = 0.1
+
+ENGINES = ("exact", "kernel_approx", "linear")
 
 
 class SVMManager(ModelManager):
@@ -31,6 +39,10 @@ class SVMManager(ModelManager):
         random_state: int = 42,
         classifier: bool = False,
         cv_folds: int = 5,
+        engine: Literal["auto", "exact", "kernel_approx", "linear"] = "auto",
+        exact_max_rows: Optional[int] = None,
+        n_components: Optional[int] = None,
+        calibrate: bool = True,
     ):
         super().__init__(dataframe, test_split)
         self.kernel = kernel
@@ -39,31 +51,77 @@ class SVMManager(ModelManager):
         self.random_state = random_state
         self.classifier = classifier
         self.cv_folds = cv_folds
+        if engine != "auto" and engine not in ENGINES:
+            raise ValueError(f"engine must be 'auto' or one of: {', '.join(ENGINES)}")
+        self.engine = engine
+        self.exact_max_rows = exact_max_rows if exact_max_rows is not None else SVM_EXACT_MAX_ROWS
+        self.n_components = n_components or SVM_APPROX_COMPONENTS
+        self.calibrate = calibrate
+        # training rows the estimator is built for; set by train (and ml.search)
+        self.n_rows: Optional[int] = None
+
+    def chosen_engine(self) -> str:
+        """The engine for `self.n_rows` training rows."""
+        if self.engine != "auto":
+            return self.engine
+        if self.kernel == "precomputed" or self.n_rows is None or self.n_rows <= self.exact_max_rows:
+            return "exact"
+        return "linear" if self.kernel == "linear" else "kernel_approx"
+
+    def estimator(self, calibrate: Optional[bool] = None):
+        """
+        `calibrate` (default: self.calibrate) adds probabilities: Platt scaling
+        inside SVC for the exact engine, one sigmoid calibration on a held-out
+        slice for the others. Cross-validation does not need them, since ROC/PR
+        scores come from decision_function.
+        """
+        calibrate = self.calibrate if calibrate is None else calibrate
+        engine = self.chosen_engine()
+        if engine == "exact":
+            if self.classifier:
+                return SVC(kernel=self.kernel, C=self.C, gamma=self.gamma, probability=calibrate)
+            return SVR(kernel=self.kernel, C=self.C, gamma=self.gamma)
+
+        if self.classifier:
+            linear = LinearSVC(C=self.C, dual="auto", random_state=self.random_state)
+        else:
+            linear = LinearSVR(C=self.C, dual="auto", random_state=self.random_state)
+        if engine == "kernel_approx":
+            # "scale"/"auto" are 1/n_features on standardized features, which is
+            # Nystroem's default
+            gamma = self.gamma if isinstance(self.gamma, (int, float)) else None
+            model = make_pipeline(
+                Nystroem(kernel=self.kernel, gamma=gamma, n_components=self.n_components, random_state=self.random_state),
+                linear,
+            )
+        else:
+            model = linear
+        if self.classifier and calibrate:
+            split = StratifiedShuffleSplit(n_splits=1, test_size=CALIBRATION_SIZE, random_state=self.random_state)
+            return CalibratedClassifierCV(model, method="sigmoid", cv=split)
+        return model
+
+    def engine_info(self) -> dict[str, Any]:
+        engine = self.chosen_engine()
+        info: dict[str, Any] = {"name": engine, "rows": self.n_rows, "exact_max_rows": self.exact_max_rows}
+        if engine == "kernel_approx":
+            info["n_components"] = self.n_components
+        if self.classifier:
+            info["calibrated"] = bool(self.calibrate)
+        return info
 
     def train(self, target, features):
         X, y = self.prepare_xy(features, target, classifier=self.classifier)
+        # fold and holdout training sets are about this size
+        self.n_rows = int(len(y) * (1 - self.test_split))
 
         # Cross-validation summary
         if self.classifier:
-            scoring = {"accuracy": "accuracy", "precision": "precision_macro", "recall": "recall_macro", "f1": "f1_macro", "roc_auc": "roc_auc", "pr_auc": "average_precision"}
             cv = StratifiedKFold(n_splits=self.cv_folds, shuffle=True, random_state=self.random_state)
-            try:
-                cv_res = cross_validate(SVC(kernel=self.kernel, C=self.C, gamma=self.gamma, probability=True), X, y, cv=cv, scoring=scoring)
-                cv_mean = {k + "_mean": float(np.mean(cv_res[f"test_{k}"])) for k in scoring}
-                cv_std = {k + "_std": float(np.std(cv_res[f"test_{k}"])) for k in scoring}
-            except Exception:
-                cv_mean = {}
-                cv_std = {}
+            cv_mean, cv_std = self.cross_validate(self.estimator(calibrate=False), X, y, cv, classifier=True)
         else:
-            scoring = {"r2": "r2", "neg_mse": "neg_mean_squared_error", "neg_mae": "neg_mean_absolute_error"}
             cv = KFold(n_splits=self.cv_folds, shuffle=True, random_state=self.random_state)
-            try:
-                cv_res = cross_validate(SVR(kernel=self.kernel, C=self.C, gamma=self.gamma), X, y, cv=cv, scoring=scoring)
-                cv_mean = {"r2_mean": float(np.mean(cv_res["test_r2"])), "mse_mean": float(-np.mean(cv_res["test_neg_mse"])), "mae_mean": float(-np.mean(cv_res["test_neg_mae"]))}
-                cv_std = {"r2_std": float(np.std(cv_res["test_r2"])), "mse_std": float(np.std(cv_res["test_neg_mse"])), "mae_std": float(np.std(cv_res["test_neg_mae"]))}
-            except Exception:
-                cv_mean = {}
-                cv_std = {}
+            cv_mean, cv_std = self.cross_validate(self.estimator(), X, y, cv, classifier=False)
 
         # Hold-out split for final training/evaluation
         X_train, X_test, y_train, y_test = train_test_split(
@@ -75,30 +133,13 @@ class SVMManager(ModelManager):
         )
 
         if self.classifier:
-            model = SVC(kernel=self.kernel, C=self.C, gamma=self.gamma, probability=True)
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            y_proba = None
-            try:
-                y_proba = model.predict_proba(X_test)[:, 1]
-            except Exception:
-                y_proba = None
-
-            result: dict[str, Any] = {
-                "accuracy": float(accuracy_score(y_test, y_pred)),
-                "precision": float(precision_score(y_test, y_pred, average="macro")),
-                "recall": float(recall_score(y_test, y_pred, average="macro")),
-                "f1": float(f1_score(y_test, y_pred, average="macro")),
-            }
-            if y_proba is not None:
-                result["roc_auc"] = float(roc_auc_score(y_test, y_proba))
-                result["pr_auc"] = float(average_precision_score(y_test, y_proba))
-                fpr, tpr, _ = roc_curve(y_test, y_proba)
-                precision, recall, _ = precision_recall_curve(y_test, y_proba)
-                result["roc_curve"] = {"fpr": fpr.tolist(), "tpr": tpr.tolist()}
-                result["pr_curve"] = {"precision": precision.tolist(), "recall": recall.tolist()}
+            model = self.estimator()
+            parallel.fit(model, X_train, y_train)
+            # ROC/PR curves and AUCs are computed by evaluate_model
+            result: dict[str, Any] = self.holdout_metrics(model, X_test, y_test, classifier=True)
             result["cv_mean"] = cv_mean
             result["cv_std"] = cv_std
+            result["engine"] = self.engine_info()
             try:
                 eval_artifacts = self.evaluate_model(model, X_train, X_test, y_train, y_test, is_classifier=True, feature_names=features)
                 result.update(eval_artifacts)
@@ -106,17 +147,12 @@ class SVMManager(ModelManager):
                 pass
             return result
         else:
-            model = SVR(kernel=self.kernel, C=self.C, gamma=self.gamma)
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-
-            result: dict[str, Any] = {
-                "r2": float(r2_score(y_test, y_pred)),
-                "mse": float(mean_squared_error(y_test, y_pred)),
-                "mae": float(mean_absolute_error(y_test, y_pred)),
-            }
+            model = self.estimator()
+            parallel.fit(model, X_train, y_train)
+            result: dict[str, Any] = self.holdout_metrics(model, X_test, y_test, classifier=False)
             result["cv_mean"] = cv_mean
             result["cv_std"] = cv_std
+            result["engine"] = self.engine_info()
             try:
                 eval_artifacts = self.evaluate_model(model, X_train, X_test, y_train, y_test, is_classifier=False, feature_names=features)
                 result.update(eval_artifacts)
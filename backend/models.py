@@ -44,11 +44,37 @@ class DefaultModel(Base):
     dataset = Column(String, index=True)
     parameters = Column(JSON)  # store model parameters if needed
     metrics = Column(JSON)     # store performance metrics
+    artifact = Column(String, nullable=True)  # directory of the saved model (ml.artifacts)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="models")
 
 
+class TrainingJob(Base):
+    __tablename__ = "training_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    dataset = Column(String, index=True)
+    model_type = Column(String)
+    status = Column(String, index=True)  # queued, running, done, failed
+    request = Column(JSON)               # the submitted training request
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    model_id = Column(Integer, ForeignKey("default_model.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class TrainingFingerprint(Base):
+    __tablename__ = "training_fingerprints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    fingerprint = Column(String, index=True)  # memo.fingerprint of the training request
+    model_id = Column(Integer, ForeignKey("default_model.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 
@@ -0,0 +1,186 @@
+# profiling.py
+"""
+Dataset profiles computed once at upload time.
+
+A profile holds the row count, columns, dtypes, missing-value counts and
+per-column statistics (min/max/mean/std, distinct count, histogram, top values)
+so metadata endpoints can answer without reading the dataset, the row-group
+index used to serve preview pages and the type decision of every text column
+that training replays (see infer_column_types). Profiles are stored next to the pipeline
+config as `configs/<user>/<file>_profile.json` and record the stat of the
+Parquet file they describe; a stale or missing profile is rebuilt on first access.
+"""
+import datetime
+import json
+import os
+import uuid
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import storage
+from ml import infer_column_type
+
+HISTOGRAM_BINS = 20
+TOP_K = 10
+# bump when the profile layout changes so stored profiles get rebuilt
+PROFILE_VERSION = 3
+
+
+def _json_value(v):
+    # arrow scalars -> plain JSON types
+    if isinstance(v, pa.Scalar):
+        v = v.as_py()
+    if isinstance(v, (datetime.datetime, datetime.date, datetime.time)):
+        return v.isoformat()
+    if isinstance(v, (np.integer,)):
+        return int(v)
+    if isinstance(v, (np.floating, float)):
+        fv = float(v)
+        return fv if np.isfinite(fv) else None
+    if isinstance(v, bytes):
+        return v.decode("utf-8", errors="replace")
+    return v
+
+
+def _column_stats(arr: pa.ChunkedArray, top_k: int, bins: int) -> dict[str, Any]:
+    stats: dict[str, Any] = {"missing": int(arr.null_count)}
+    valid = arr.drop_null()
+    stats["distinct_count"] = int(pc.count_distinct(valid).as_py()) if len(valid) else 0
+
+    t = arr.type
+    if (pa.types.is_integer(t) or pa.types.is_floating(t)) and len(valid):
+        mm = pc.min_max(valid)
+        stats["min"] = _json_value(mm["min"])
+        stats["max"] = _json_value(mm["max"])
+        stats["mean"] = _json_value(pc.mean(valid))
+        stats["std"] = _json_value(pc.stddev(valid, ddof=1)) if len(valid) > 1 else None
+        values = valid.to_numpy().astype("float64")
+        values = values[np.isfinite(values)]
+        if len(values):
+            counts, edges = np.histogram(values, bins=bins)
+            stats["histogram"] = {"bin_edges": edges.tolist(), "counts": counts.tolist()}
+    elif (pa.types.is_timestamp(t) or pa.types.is_date(t)) and len(valid):
+        mm = pc.min_max(valid)
+        stats["min"] = _json_value(mm["min"])
+        stats["max"] = _json_value(mm["max"])
+
+    if len(valid):
+        vc = pc.value_counts(valid)
+        counts = vc.field("counts").to_numpy()
+        order = np.argsort(-counts, kind="stable")[:top_k]
+        values = vc.field("values")
+        stats["top_values"] = [
+            {"value": _json_value(values[int(i)]), "count": int(counts[i])} for i in order
+        ]
+    else:
+        stats["top_values"] = []
+    return stats
+
+
+def build_profile(path: str, top_k: int = TOP_K, bins: int = HISTOGRAM_BINS) -> dict[str, Any]:
+    """
+    Profile a Parquet dataset one column at a time, so memory is bounded by the
+    largest single column rather than the whole table.
+    """
+    pf = pq.ParquetFile(path)
+    schema = pf.schema_arrow
+    dtypes = {str(c): str(d) for c, d in schema.empty_table().to_pandas().dtypes.items()}
+    column_stats = {}
+    for name in schema.names:
+        arr = pf.read(columns=[name]).column(name)
+        column_stats[name] = {"dtype": dtypes.get(name), **_column_stats(arr, top_k, bins)}
+
+    st = os.stat(path)
+    return {
+        "row_count": int(pf.metadata.num_rows),
+        "columns": list(schema.names),
+        "dtypes": dtypes,
+        "missing_values": {c: s["missing"] for c, s in column_stats.items()},
+        "column_stats": column_stats,
+        # row-group offsets used to page through the file without scanning it
+        "row_index": storage.build_row_index(path),
+        # identifies the data itself, e.g. for caches of derived training matrices
+        "content_hash": storage.file_digest(path),
+        "column_types": infer_column_types(path),
+        "source": {"mtime_ns": st.st_mtime_ns, "size": st.st_size},
+        "version": PROFILE_VERSION,
+    }
+
+
+def save_profile(profile: dict, username, filename) -> str:
+    path = storage.profile_path(username, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # requests and training workers may rebuild the same profile at once
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f, indent=4)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def load_profile(username, filename) -> Optional[dict]:
+    """
+    Return the stored profile for a dataset, rebuilding it if it is missing or
+    describes an older version of the file. Returns None if the dataset does not exist.
+    """
+    data_path = storage.resolve_dataset(username, filename)
+    if data_path is None:
+        return None
+    st = os.stat(data_path)
+    path = storage.profile_path(username, filename)
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                profile = json.load(f)
+            source = profile.get("source", {})
+            fresh = source.get("mtime_ns") == st.st_mtime_ns and source.get("size") == st.st_size
+            if fresh and profile.get("version") == PROFILE_VERSION:
+                return profile
+        except Exception:
+            pass
+    profile = build_profile(data_path)
+    save_profile(profile, username, filename)
+    return profile
+
+
+def duplicate_rows(pf: pq.ParquetFile) -> np.ndarray:
+    """
+    DataFrame.duplicated() of the whole file, from row hashes combined one
+    column at a time so only a single column is in memory.
+    """
+    hashes = np.zeros(pf.metadata.num_rows, dtype="uint64")
+    for name in pf.schema_arrow.names:
+        column = pf.read(columns=[name]).column(name).to_pandas()
+        hashes = hashes * np.uint64(1000003) ^ pd.util.hash_pandas_object(column, index=False).to_numpy()
+    return pd.Series(hashes).duplicated().to_numpy()
+
+
+def infer_column_types(path: str) -> dict[str, dict]:
+    """
+    Make the datetime / numeric / categorical decision that ModelManager.sanitize
+    would make for every text column of the whole dataset, so training can
+    replay it instead of re-inferring on every run. Like sanitize, it decides
+    on the rows left after dropping duplicates.
+    """
+    pf = pq.ParquetFile(path)
+    dtypes = pf.schema_arrow.empty_table().to_pandas().dtypes
+    text = [name for name, dtype in dtypes.items() if str(dtype) == "object"]
+    if not text:
+        return {}
+    keep = ~duplicate_rows(pf)
+    n_rows = int(keep.sum())
+    decisions = {}
+    for name in text:
+        series = pf.read(columns=[name]).column(name).to_pandas()[keep]
+        decisions[str(name)], _ = infer_column_type(series, n_rows)
+    return decisions
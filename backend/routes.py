@@ -1,25 +1,42 @@
 import csv
-import datetime
+import inspect
 import json
-from fastapi import APIRouter, Depends, FastAPI, File, HTTPException, Query, Request, Response, UploadFile
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import os
 import io
+import shutil
+import uuid
 import matplotlib
-from pydantic import BaseModel
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 from sqlalchemy.orm import Session
+import numpy as np
 import pandas as pd
 from auth_routes import get_current_user
-from database import SessionLocal, get_db
+from database import get_db
 import ml
-from models import Dataset, DefaultModel, Plot, User
-from typing import List
+from ml import artifacts, explain, search
+from ml.linear_regression import MAX_SUBSETS, sweep_subsets
+from models import Dataset, DefaultModel, TrainingJob, User
+import downloads
+import jobs
+import memo
+import profiling
+import scoring
+import storage
+from typing import List, Optional
 
 router = APIRouter()
 
 ALLOWED_EXTENSIONS = {".txt", ".csv", ".xlsx", ".xls"}
+MAX_ROWS = 1_000_000
+MAX_PREVIEW_ROWS = 1000
+DOWNLOAD_FORMATS = ("csv", "parquet")
+# bytes of an upload inspected when sniffing its delimiter
+SNIFF_BYTES = 64 * 1024
+# rows scored by one /predict request
+MAX_PREDICT_ROWS = 100_000
 
 @router.get("/")
 def index():
@@ -53,7 +70,8 @@ def get_user_datasets(current_user: User = Depends(get_current_user), db: Sessio
     return {"files": [d.filename for d in datasets]}
 
 async def detect_delimiter(file: UploadFile):
-    content = await file.read()
+    # sniff from a bounded prefix; a partial last line is harmless to the sniffer
+    content = await file.read(SNIFF_BYTES)
     await file.seek(0)
     sample = content.decode('utf-8', errors='ignore')
     sniffer = csv.Sniffer()
@@ -74,76 +92,75 @@ async def add_user_dataset(
         )
 
     # Create user-specific uploads folder
-    user_folder = os.path.join("uploads", str(current_user.username))
+    user_folder = storage.user_folder(current_user.username)
     os.makedirs(user_folder, exist_ok=True)
-    file_path = os.path.join(user_folder, str(file.filename))
+    processed_path = storage.processed_path(current_user.username, file.filename)
 
-    # Save uploaded file
+    # Parse the upload straight into the processed store. Delimited files are
+    # streamed in chunks so memory stays bounded regardless of upload size.
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
-    await file.seek(0)
-
-    # Read file into DataFrame
-    if ext.lower() in {".txt", ".csv"}:
-        delimiter = ","  # default
-        if ext.lower() == ".txt":
-            # Assuming you have a detect_delimiter function
-            delimiter = await detect_delimiter(file)
-        df = pd.read_csv(file.file, delimiter=delimiter)
-    elif ext.lower() == ".xlsx":
-        # pandas may require an explicit engine for xlsx (openpyxl). Provide a helpful error if missing.
-        try:
-            df = pd.read_excel(file.file, engine='openpyxl')
+        if ext.lower() in {".txt", ".csv"}:
+            delimiter = ","  # default
+            if ext.lower() == ".txt":
+                delimiter = await detect_delimiter(file)
+            summary = storage.ingest_csv(file.file, processed_path, delimiter=delimiter, max_rows=MAX_ROWS)
+        elif ext.lower() == ".xlsx":
+            # pandas may require an explicit engine for xlsx (openpyxl). Provide a helpful error if missing.
             delimiter = None
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Failed to read .xlsx file: openpyxl engine required. Ensure 'openpyxl' is installed on the server.")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to read Excel file: {e}")
-    elif ext.lower() == ".xls":
-        # older Excel format; try using xlrd if available
-        try:
-            df = pd.read_excel(file.file, engine='xlrd')
+            try:
+                df = pd.read_excel(file.file, engine='openpyxl')
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Failed to read .xlsx file: openpyxl engine required. Ensure 'openpyxl' is installed on the server.")
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Failed to read Excel file: {e}")
+            summary = storage.ingest_chunks([df], processed_path, max_rows=MAX_ROWS)
+        elif ext.lower() == ".xls":
+            # older Excel format; try using xlrd if available
             delimiter = None
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Failed to read .xls file: xlrd engine required. Ensure 'xlrd' is installed on the server.")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to read Excel (.xls) file: {e}")
+            try:
+                df = pd.read_excel(file.file, engine='xlrd')
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Failed to read .xls file: xlrd engine required. Ensure 'xlrd' is installed on the server.")
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Failed to read Excel (.xls) file: {e}")
+            summary = storage.ingest_chunks([df], processed_path, max_rows=MAX_ROWS)
+    except HTTPException:
+        raise
+    except storage.DatasetTooLarge:
+        raise HTTPException(status_code=400, detail="Uploaded file too large")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to read file: {e}")
 
     # Basic schema and type checks
-    schema_info = {col: str(dtype) for col, dtype in zip(df.columns, df.dtypes)}
+    schema_info = summary["dtypes"]
 
     # Missing value info
-    missing_info = df.isnull().sum().to_dict()
-    # df = df.dropna(how="any")
-    if df.shape[0] == 0:
-        os.remove(file_path)
+    missing_info = summary["missing_values"]
+    if summary["row_count"] == 0:
+        if os.path.exists(processed_path):
+            os.remove(processed_path)
         raise HTTPException(status_code=400, detail="Uploaded file has no rows after cleaning")
-    if df.shape[0] > 1_000_000:
-        os.remove(file_path)
-        raise HTTPException(status_code=400, detail="Uploaded file too large")
+
+    # Profile the stored dataset once so metadata endpoints never need to read it;
+    # the profile also settles each text column's type so training does not re-infer it
+    try:
+        profile = profiling.build_profile(processed_path)
+    except Exception as e:
+        os.remove(processed_path)
+        raise HTTPException(status_code=500, detail=f"Failed to profile dataset: {e}")
 
     # Save a basic preprocessing config
     pipeline_config = {
-        "columns": list(df.columns),
+        "columns": summary["columns"],
         "dtypes": schema_info,
-        "missing_values": missing_info
+        "missing_values": missing_info,
     }
 
-    config_folder = os.path.join("configs", str(current_user.username))
-    os.makedirs(config_folder, exist_ok=True)
-    config_path = os.path.join(config_folder, file.filename + "_config.json")
+    config_path = storage.config_path(current_user.username, file.filename)
+    os.makedirs(os.path.dirname(config_path), exist_ok=True)
     with open(config_path, "w") as f:
         json.dump(pipeline_config, f, indent=4)
-
-    # Save processed DataFrame without encoding step
-    processed_path = os.path.join(user_folder, str(file.filename) + "_processed.csv")
-    df.to_csv(processed_path, index=False)
-
-    # Remove original raw file
-    os.remove(file_path)
+    profile_path = profiling.save_profile(profile, current_user.username, file.filename)
 
     # Save dataset info in database
     try:
@@ -156,6 +173,8 @@ async def add_user_dataset(
             os.remove(processed_path)
         if os.path.exists(config_path):
             os.remove(config_path)
+        if os.path.exists(profile_path):
+            os.remove(profile_path)
         raise HTTPException(status_code=500, detail=f"Failed to save dataset record: {e}")
 
     return {
@@ -165,17 +184,12 @@ async def add_user_dataset(
         "schema": schema_info,
         "missing_values": missing_info,
         "config_file": config_path,
+        "profile_file": profile_path,
         "processed_file": processed_path
     }
 
-@router.post("/dashboard/modelevaluation")
-async def model_eval(
-    request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    body = await request.json()
-    
+def _training_spec(body: dict, current_user: User) -> dict:
+    """Validate a training request and describe it for jobs.train_model."""
     # Extract frontend inputs
     filename = body.get("filename")
     target = body.get("target")
@@ -189,229 +203,286 @@ async def model_eval(
     if not all([filename, target, features, model_name]):
         raise HTTPException(status_code=400, detail="Missing required fields")
 
-    # Load processed dataset
-    file_path = os.path.join("uploads", str(current_user.username), str(filename) + "_processed.csv")
-    if not os.path.exists(file_path):
+    profile = profiling.load_profile(current_user.username, filename)
+    if profile is None:
         raise HTTPException(status_code=404, detail="Dataset not found")
-    
-    df = pd.read_csv(file_path)
 
-    # Train the model
     if model_name not in ml.models:
         raise HTTPException(status_code=400, detail=f"Invalid model: {model_name}")
-        
+
+    # read only the columns the model needs; unknown columns are left out here
+    # so prepare_xy reports them as before
+    available = set(profile["columns"])
+    wanted = [c for c in dict.fromkeys(list(features) + [target]) if c in available]
+
+    return {
+        "request": body,
+        "username": current_user.username,
+        "filename": filename,
+        "target": target,
+        "features": features,
+        "test_split": test_split,
+        "model": model_name,
+        "params": model_params,
+        "truth_spec": truth_spec,
+        "columns": wanted,
+        # lets prepare_xy reuse matrices prepared for earlier models on this selection
+        "dataset_key": profile.get("content_hash"),
+    }
+
+
+@router.post("/dashboard/modelevaluation")
+async def model_eval(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    body = await request.json()
+    spec = _training_spec(body, current_user)
+
+    # identical request trained before: answer with its stored metrics
+    if not body.get("force_retrain"):
+        stored = memo.lookup(db, current_user, spec)
+        if stored is not None:
+            return jobs.stored_result(stored)
+
+    # Train the model in the job pool; the event loop keeps serving other requests
     try:
-        # Instantiate manager and attach truth_spec if provided
-        manager = ml.models[model_name](df, test_split, **model_params)
-        if truth_spec:
-            # attach to manager for use during prepare_xy/evaluation
-            try:
-                manager.truth_spec = truth_spec
-            except Exception:
-                pass
-        result = manager.train(target, features)
+        outcome = await jobs.run(spec)
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-    # Get SQLAlchemy model/table class from mapping
-    model_table_class = DefaultModel
-    if model_table_class is None:
-        raise HTTPException(status_code=400, detail=f"No DB table mapped for model: {model_name}")
-
-    # Save configuration and results to the specific model table
-    # include truth_spec in saved parameters for reproducibility
-    saved_params = dict(model_params) if isinstance(model_params, dict) else {}
-    if truth_spec:
-        saved_params['truth_spec'] = truth_spec
-
-    model_entry = model_table_class(
-        user_id=current_user.id,
-        dataset=filename,
-        model_type=model_name,
-        parameters=saved_params,
-        metrics=result,
-        created_at=datetime.datetime.utcnow()
-    )
+    result, _ = jobs.save_training_result(db, current_user, spec, outcome)
+    return result
 
-    db.add(model_entry)
-    db.commit()
-    db.refresh(model_entry)
 
-    # Return the result to the frontend
+@router.post("/dashboard/modelevaluation/explain")
+async def explain_model(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    SHAP summary for the model a training request produces. Takes the training
+    request body plus an optional "explain" object: background ("kmeans" or
+    "random"), background_size, max_rows, time_budget (seconds), batch_size.
+    Results are cached per model and options.
+    """
+    body = await request.json()
+    spec = _training_spec(body, current_user)
+    try:
+        spec["explain"] = explain.options(body.get("explain"))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if explain.shap is None:
+        raise HTTPException(status_code=501, detail="SHAP explanations require the 'shap' package")
 
+    try:
+        explanation = await jobs.explain_cached(spec)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    explanation["plot_data"] = jobs.build_plot_data(explanation)
+    return explanation
 
-    # find dataset record (create if missing)
-    dataset = db.query(Dataset).filter(Dataset.filename == filename, Dataset.owner_id == current_user.id).first()
-    if dataset is None:
-        # create dataset record if absent (keeps compatibility)
-        dataset = Dataset(filename=filename, owner_id=current_user.id)
-        db.add(dataset)
-        db.commit()
-        db.refresh(dataset)
 
-    # Instead of rendering and storing server-side PNGs, return structured numeric
-    # plot data to the frontend so the client can render plots. Keep `plots` empty
-    # for backwards compatibility and add `plot_data` with typed descriptors.
-    plot_data = []
+@router.post("/dashboard/modelevaluation/jobs", status_code=202)
+async def submit_training_job(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    body = await request.json()
+    spec = _training_spec(body, current_user)
+    job = jobs.submit(db, current_user, spec)
+    return {"job_id": job.id, "status": job.status}
 
-    try:
-        if "roc_curve" in result:
-            rc = result["roc_curve"]
-            # rc may be binary {fpr:..., tpr:...} or multiclass {classes: [...], fpr: [...], tpr: [...]}.
-            if isinstance(rc, dict) and rc.get('classes') and isinstance(rc.get('fpr'), list):
-                plot_data.append({
-                    "name": "ROC Curve (per-class)",
-                    "key": "roc_curve",
-                    "type": "roc",
-                    "data": {"classes": rc.get('classes', []), "fpr": rc.get('fpr', []), "tpr": rc.get('tpr', []), "auc": result.get("roc_auc")},
-                })
-            else:
-                plot_data.append({
-                    "name": "ROC Curve",
-                    "key": "roc_curve",
-                    "type": "roc",
-                    "data": {"fpr": rc.get("fpr", []), "tpr": rc.get("tpr", []), "auc": result.get("roc_auc")},
-                })
-    except Exception:
-        pass
 
+@router.post("/dashboard/modelevaluation/search", status_code=202)
+async def submit_search_job(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Start a hyperparameter search. Takes a training request whose "params" are
+    fixed for every trial, plus a "search" object: space, method (grid, random,
+    halving, hyperband), n_trials, eta, min_resource, max_trials, time_budget,
+    scoring and persist_top. Progress is streamed by /dashboard/jobs/{id}/events.
+    """
+    body = await request.json()
+    spec = _training_spec(body, current_user)
     try:
-        if "pr_curve" in result:
-            pr = result["pr_curve"]
-            plot_data.append({
-                "name": "Precision-Recall Curve",
-                "key": "pr_curve",
-                "type": "pr",
-                "data": {"precision": pr.get("precision", []), "recall": pr.get("recall", []), "ap": result.get("pr_auc")},
-            })
-    except Exception:
-        pass
-
+        spec["search"] = search.options(body.get("search"))
+        # fail fast on parameter names the manager does not accept
+        for config in search.sample(spec["search"]["space"], 1, np.random.RandomState(0)):
+            ml.models[spec["model"]].check_params({**spec["params"], **config})
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = jobs.submit(db, current_user, spec, is_search=True)
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.post("/dashboard/modelevaluation/subsets")
+async def linear_subsets(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Feature-selection sweep with linear regression. Takes a training request
+    (its "model" is ignored) plus "subsets": [[feature, ...], ...] or "sweep":
+    "each" | "drop_one" | "all". Every subset is scored from the sufficient
+    statistics of the full selection, so a sweep costs one pass over the rows.
+    """
+    body = await request.json()
+    spec = _training_spec(dict(body, model="linear_regression"), current_user)
+    subsets = body.get("subsets")
     try:
-        if "confusion_matrix" in result:
-            cm = result["confusion_matrix"]
-            # Ensure it's a list of lists (JSON serializable)
-            plot_data.append({
-                "name": "Confusion Matrix",
-                "key": "confusion_matrix",
-                "type": "confusion_matrix",
-                "data": {"matrix": cm},
-            })
-    except Exception:
-        pass
+        if subsets is None:
+            subsets = sweep_subsets(spec["features"], str(body.get("sweep") or "each"))
+        elif not isinstance(subsets, list) or not all(isinstance(sub, list) and sub for sub in subsets):
+            raise ValueError("subsets must be a list of non-empty feature lists")
+        if len(subsets) > MAX_SUBSETS:
+            raise ValueError(f"At most {MAX_SUBSETS} subsets can be scored at once")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    spec["subsets"] = subsets
+    # the request may carry another model's parameters
+    accepted = inspect.signature(ml.models["linear_regression"]).parameters
+    spec["params"] = {k: v for k, v in (spec["params"] or {}).items() if k in accepted}
 
     try:
-        if "learning_curve" in result:
-            lc = result["learning_curve"]
-            plot_data.append({
-                "name": "Learning Curve",
-                "key": "learning_curve",
-                "type": "learning_curve",
-                "data": {
-                    "train_sizes": lc.get("train_sizes", []),
-                    "train_scores_mean": lc.get("train_scores_mean", []),
-                    "test_scores_mean": lc.get("test_scores_mean", []),
-                },
-            })
-    except Exception:
-        pass
+        return {"subsets": await jobs.run_subsets(spec)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
-    try:
-        if "feature_importance" in result:
-            fi = result["feature_importance"]
-            plot_data.append({
-                "name": "Feature Importance",
-                "key": "feature_importance",
-                "type": "feature_importance",
-                "data": fi,
-            })
-    except Exception:
-        pass
 
+@router.post("/dashboard/modelevaluation/compare")
+async def compare_model_batch(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Train several models on one selection and compare them. Takes a training
+    request without "model"/"params", plus "models": [{"model", "params"}, ...]
+    (names from ml.models, all classifiers or all regressors), optional
+    "cv_folds" (default 5) and "force_retrain". The data is prepared once and
+    every model is cross-validated on the same folds.
+    """
+    body = await request.json()
+    entries = body.get("models")
+    if not isinstance(entries, list) or not entries:
+        raise HTTPException(status_code=400, detail="models must be a non-empty list")
+    if len(entries) > jobs.MAX_COMPARE_MODELS:
+        raise HTTPException(status_code=400, detail=f"At most {jobs.MAX_COMPARE_MODELS} models can be compared at once")
     try:
-        if "shap_summary" in result:
-            ss = result["shap_summary"]
-            plot_data.append({
-                "name": "SHAP Summary",
-                "key": "shap_summary",
-                "type": "shap_summary",
-                "data": ss,
-            })
-    except Exception:
-        pass
-
-    # Keep `plots` empty for compatibility with older frontends that expect image ids.
-    saved_plots = []
+        cv_folds = int(body.get("cv_folds") or 5)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="cv_folds must be an integer")
+    if cv_folds < 2:
+        raise HTTPException(status_code=400, detail="cv_folds must be at least 2")
+
+    kinds = set()
+    for entry in entries:
+        name = entry.get("model") if isinstance(entry, dict) else None
+        if name not in ml.models:
+            raise HTTPException(status_code=400, detail=f"Invalid model: {name}")
+        params = entry.get("params") or {}
+        try:
+            # fail fast on parameters the manager does not accept
+            ml.models[name].check_params(params)
+            kinds.add(ml.models[name].classifies(params))
+        except TypeError as e:
+            raise HTTPException(status_code=400, detail=f"{name}: {e}")
+    if len(kinds) > 1:
+        raise HTTPException(status_code=400, detail="Compared models must all be classifiers or all regressors")
+
+    first = entries[0]
+    spec = _training_spec(dict(body, model=first["model"], params=first.get("params") or {}), current_user)
+    spec.update(
+        request=body,
+        entries=[{"model": e["model"], "params": e.get("params") or {}} for e in entries],
+        classifier=kinds.pop(),
+        cv_folds=cv_folds,
+    )
     try:
-        for pd_item in plot_data:
-            plot = Plot(user_id=current_user.id, dataset_id=dataset.id, name=pd_item.get("key") or pd_item.get("name"), data=pd_item, image=None)
-            db.add(plot)
-            db.commit()
-            db.refresh(plot)
-            saved_plots.append({"id": plot.id, "name": plot.name})
+        return await jobs.compare(db, current_user, spec)
     except Exception as e:
-        # If saving fails, continue but leave saved_plots as-is
-        print("Warning: failed to save plots to DB:", e)
+        return {"success": False, "error": str(e)}
 
-    result["plots"] = saved_plots
-    result["plot_data"] = plot_data
 
-    # Attach model metadata so frontend can render appropriately
-    try:
-        # include parameters/config if available
-        result["parameters"] = saved_params if saved_params is not None else {}
-    except Exception:
-        result["parameters"] = {}
+def _user_job(db: Session, job_id: int, current_user: User) -> TrainingJob:
+    job = db.query(TrainingJob).filter(TrainingJob.id == job_id, TrainingJob.user_id == current_user.id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-    try:
-        result["model_type"] = model_name
-    except Exception:
-        result["model_type"] = None
 
-    # Determine is_classifier: prefer explicit flags on manager or parameters; fallback to heuristics
-    try:
-        is_cl = False
-        # if parameters provided by frontend include a classifier flag
-        if isinstance(saved_params, dict) and saved_params.get("classifier") is not None:
-            is_cl = bool(saved_params.get("classifier"))
-        # if manager has an attribute, prefer that
-        elif hasattr(manager, "is_classifier"):
-            try:
-                is_cl = bool(getattr(manager, "is_classifier"))
-            except Exception:
-                is_cl = False
-        # fallback: if ROC was computed, treat as classifier
-        elif "roc_auc" in result or "roc_curve" in result:
-            is_cl = True
-        else:
-            # heuristics from model name
-            mn = str(model_name).lower()
-            if any(k in mn for k in ["logistic", "svc", "svm", "forest", "random", "decision", "bagging", "boosting", "classifier", "neural", "dnn"]):
-                is_cl = True
-        result["is_classifier"] = is_cl
-    except Exception:
-        result["is_classifier"] = False
+@router.get("/dashboard/jobs")
+def list_training_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    rows = (
+        db.query(TrainingJob)
+        .filter(TrainingJob.user_id == current_user.id)
+        .order_by(TrainingJob.id.desc())
+        .limit(limit)
+        .all()
+    )
+    # results can be large; fetch them per job
+    return [{**jobs.job_dict(j), "result": None} for j in rows]
 
-    return result
 
-@router.get("/dashboard/datasets/columns")
-def get_columns(
-    filename: str = Query(..., description="Name of the dataset file"),
+@router.get("/dashboard/jobs/{job_id}")
+def get_training_job(
+    job_id: int,
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    user_folder = os.path.join("uploads", str(current_user.username))
-    file_path = os.path.join(user_folder, filename + "_processed.csv")
+    return jobs.job_dict(_user_job(db, job_id, current_user))
 
 
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail=f"File {filename} not found")
+@router.get("/dashboard/jobs/{job_id}/events")
+def training_job_events(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    _user_job(db, job_id, current_user)
+    return StreamingResponse(
+        jobs.job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+@router.get("/dashboard/jobs/{job_id}/download")
+def download_job_output(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Predictions written by a finished batch scoring job."""
+    job = _user_job(db, job_id, current_user)
+    path = storage.scoring_output_path(current_user.username, job.id)
+    if job.status != jobs.DONE or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No output for this job")
+    return downloads.file_response(request, path, "text/csv", f"predictions_{job.id}.csv")
 
+
+@router.get("/dashboard/datasets/columns")
+def get_columns(
+    filename: str = Query(..., description="Name of the dataset file"),
+    current_user: User = Depends(get_current_user)
+):
     try:
-        df = pd.read_csv(file_path)
-        columns = df.columns.tolist()
-        return {"columns": columns}
+        profile = profiling.load_profile(current_user.username, filename)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading CSV: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading dataset: {str(e)}")
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"File {filename} not found")
+    return {"columns": profile["columns"]}
 
 
 @router.get("/dashboard/datasets/column_info")
@@ -420,18 +491,16 @@ def get_column_info(
     current_user: User = Depends(get_current_user),
 ):
     """
-    Return column dtype information from the stored preprocessing config if available.
-    Falls back to empty mapping when no config exists.
+    Return column dtype information from the dataset profile.
+    Falls back to empty mapping when the dataset does not exist.
     """
-    config_path = os.path.join("configs", current_user.username, filename + "_config.json")
-    if not os.path.exists(config_path):
-        return {"dtypes": {}}
     try:
-        with open(config_path, "r") as f:
-            cfg = json.load(f)
-        return {"dtypes": cfg.get("dtypes", {})}
+        profile = profiling.load_profile(current_user.username, filename)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to read config: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to read profile: {e}")
+    if profile is None:
+        return {"dtypes": {}}
+    return {"dtypes": profile.get("dtypes", {})}
 
 
 
@@ -441,68 +510,114 @@ def dataset_info(
     current_user: User = Depends(get_current_user),
 ):
     """
-    Return simple dataset information: row count and missing values (from config if available).
+    Return simple dataset information: row count and missing values (from the profile).
     """
-    user_folder = os.path.join("uploads", str(current_user.username))
-    file_path = os.path.join(user_folder, filename + "_processed.csv")
-    config_path = os.path.join("configs", str(current_user.username), filename + "_config.json")
-
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail=f"File {filename} not found")
-
     try:
-        df = pd.read_csv(file_path)
-        row_count = int(df.shape[0])
+        profile = profiling.load_profile(current_user.username, filename)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading CSV: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading dataset: {str(e)}")
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"File {filename} not found")
 
-    missing_values = {}
-    if os.path.exists(config_path):
-        try:
-            with open(config_path, 'r') as f:
-                cfg = json.load(f)
-            missing_values = cfg.get('missing_values', {})
-        except Exception:
-            missing_values = {}
+    return {"row_count": profile["row_count"], "missing_values": profile.get("missing_values", {})}
 
-    return {"row_count": row_count, "missing_values": missing_values}
+
+@router.get("/dashboard/datasets/profile")
+def dataset_profile(
+    filename: str = Query(..., description="Name of the dataset file"),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Return the full dataset profile: row count, dtypes, missing values and per-column
+    statistics (min/max/mean/std, distinct count, histogram, top values).
+    """
+    try:
+        profile = profiling.load_profile(current_user.username, filename)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading dataset: {str(e)}")
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"File {filename} not found")
+    return {k: v for k, v in profile.items() if k not in ("source", "row_index", "version")}
 
 
 @router.get('/dashboard/datasets/preview')
 def dataset_preview(
     filename: str = Query(..., description="Name of the dataset file"),
-    n: int = Query(10, description="Number of rows to preview"),
+    n: int = Query(10, description="Number of rows to preview (alias of limit)"),
+    offset: int = Query(0, ge=0, description="Index of the first row to return"),
+    limit: Optional[int] = Query(None, ge=0, le=MAX_PREVIEW_ROWS, description="Number of rows to return"),
+    columns: Optional[List[str]] = Query(None, description="Columns to return (default: all)"),
     current_user: User = Depends(get_current_user),
 ):
-    user_folder = os.path.join('uploads', str(current_user.username))
-    file_path = os.path.join(user_folder, filename + '_processed.csv')
-    if not os.path.exists(file_path):
+    """
+    Return one page of rows. Only the row groups overlapping the page are read,
+    located through the row index stored in the dataset profile.
+    """
+    try:
+        profile = profiling.load_profile(current_user.username, filename)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Failed to read dataset: {e}')
+    if profile is None:
         raise HTTPException(status_code=404, detail='File not found')
+    if columns:
+        unknown = [c for c in columns if c not in profile["columns"]]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    page_size = min(limit if limit is not None else n, MAX_PREVIEW_ROWS)
     try:
-        df = pd.read_csv(file_path)
-        rows = df.head(n).to_dict(orient='records')
-        return {'rows': rows}
+        file_path = storage.resolve_dataset(current_user.username, filename)
+        df = storage.read_rows(file_path, offset, page_size, columns=columns or None, row_index=profile.get("row_index"))
+        # NaN is not valid JSON
+        rows = df.astype(object).where(df.notna(), None).to_dict(orient='records')
+        return {
+            'rows': rows,
+            'offset': offset,
+            'limit': page_size,
+            'total_rows': profile["row_count"],
+            'columns': list(df.columns),
+        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f'Failed to read CSV: {e}')
+        raise HTTPException(status_code=500, detail=f'Failed to read dataset: {e}')
 
 
 @router.get('/dashboard/datasets/download')
 def dataset_download(
+    request: Request,
     filename: str = Query(..., description='Name of the dataset file'),
+    format: str = Query('csv', description='Export format: csv or parquet'),
     current_user: User = Depends(get_current_user)
 ):
-    user_folder = os.path.join('uploads', str(current_user.username))
-    file_path = os.path.join(user_folder, filename + '_processed.csv')
-    if not os.path.exists(file_path):
+    """
+    Stream the processed dataset. Supports Range requests for resuming and
+    gzip/zstd encoding when the client accepts it.
+    """
+    if format not in DOWNLOAD_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Allowed formats: {', '.join(DOWNLOAD_FORMATS)}")
+    file_path = storage.resolve_dataset(current_user.username, filename)
+    if file_path is None:
         raise HTTPException(status_code=404, detail='File not found')
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        return Response(content, media_type='text/csv')
+        if format == 'parquet':
+            # parquet pages are already compressed, so send the stored file as-is
+            return downloads.file_response(request, file_path, 'application/vnd.apache.parquet', filename + '.parquet', compress=False)
+        # CSV is rendered to disk once per dataset version, then served like any file
+        export_path = storage.ensure_csv_export(file_path, storage.csv_export_path(current_user.username, filename))
+        return downloads.file_response(request, export_path, 'text/csv', filename + '.csv')
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Failed to read file: {e}')
 
 
+@router.get('/dashboard/datasets/cache_stats')
+def dataset_cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    Return the dataset, preprocessing and linear statistics cache counters of
+    every training worker, and their totals.
+    """
+    return jobs.cache_stats()
+
+
 @router.get("/dashboard/datasets/models")
 def fetch_models(
     filename: str,
@@ -609,6 +724,121 @@ def get_model(
 
 
 
+def _saved_model(db: Session, model_id: int, current_user: User) -> DefaultModel:
+    model = (
+        db.query(DefaultModel)
+        .filter(DefaultModel.id == model_id, DefaultModel.user_id == current_user.id)
+        .first()
+    )
+    if not model:
+        raise HTTPException(status_code=404, detail=f"Model with ID {model_id} not found for user")
+    if not model.artifact or not os.path.isdir(model.artifact):
+        raise HTTPException(status_code=409, detail="This model was not saved; train it again to score new data")
+    return model
+
+
+async def _read_scoring_file(file: UploadFile) -> pd.DataFrame:
+    """Rows of an uploaded csv/txt/xlsx/xls/parquet file, up to MAX_PREDICT_ROWS."""
+    _, ext = os.path.splitext(file.filename or "")
+    ext = ext.lower()
+    if ext in {".txt", ".csv"}:
+        delimiter = await detect_delimiter(file) if ext == ".txt" else ","
+        return pd.read_csv(file.file, sep=delimiter, nrows=MAX_PREDICT_ROWS + 1)
+    if ext in {".xlsx", ".xls"}:
+        return pd.read_excel(file.file, engine="openpyxl" if ext == ".xlsx" else "xlrd", nrows=MAX_PREDICT_ROWS + 1)
+    if ext == ".parquet":
+        return pd.read_parquet(io.BytesIO(await file.read()))
+    raise ValueError(f"Invalid file type. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS | {'.parquet'}))}")
+
+
+@router.post("/dashboard/models/{model_id}/predict")
+async def predict_with_model(
+    model_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Score rows with a saved model. Takes JSON {"rows": [{column: value, ...}, ...]}
+    or a multipart upload with a "file" field. Rows need the model's feature
+    columns and are converted with the preprocessing fitted at training time.
+    Returns {"predictions"} plus {"classes", "probabilities"} for classifiers.
+    """
+    model = _saved_model(db, model_id, current_user)
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or not hasattr(upload, "file"):
+                raise ValueError("Missing 'file' upload")
+            df = await _read_scoring_file(upload)
+        else:
+            body = await request.json()
+            rows = body.get("rows") if isinstance(body, dict) else None
+            if not isinstance(rows, list) or not rows:
+                raise ValueError("'rows' must be a non-empty list of objects")
+            df = pd.DataFrame(rows)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to read rows: {e}")
+    if len(df) > MAX_PREDICT_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PREDICT_ROWS} rows can be scored per request")
+
+    def score():
+        return artifacts.predict(artifacts.artifact_cache.get(model.artifact), df)
+
+    try:
+        out = await run_in_threadpool(score)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"model_id": model.id, "model_type": model.model_type, "rows": len(df), **out}
+
+
+@router.post("/dashboard/models/{model_id}/predict/batch", status_code=202)
+async def submit_batch_prediction(
+    model_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Score a large file with a saved model as a background job. Takes a
+    multipart upload ("file", plus optional comma-separated "keep_columns" to
+    copy into the output) or JSON {"filename": stored dataset, "keep_columns": [...]}.
+    Progress (rows, rows_per_second) is streamed by /dashboard/jobs/{id}/events;
+    the predictions CSV is served by /dashboard/jobs/{id}/download.
+    """
+    model = _saved_model(db, model_id, current_user)
+    folder = storage.scoring_folder(current_user.username)
+    os.makedirs(folder, exist_ok=True)
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or not hasattr(upload, "file"):
+            raise HTTPException(status_code=400, detail="Missing 'file' upload")
+        ext = os.path.splitext(upload.filename or "")[1].lower()
+        if ext not in scoring.SCORING_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed types: {', '.join(sorted(scoring.SCORING_EXTENSIONS))}")
+        keep = [c.strip() for c in str(form.get("keep_columns") or "").split(",") if c.strip()]
+        input_path = os.path.join(folder, f"{uuid.uuid4().hex}_input{ext}")
+        # copied in pieces; the upload is never held in memory
+        with open(input_path, "wb") as f:
+            shutil.copyfileobj(upload.file, f, downloads.DOWNLOAD_CHUNK_BYTES)
+        spec = {"input": input_path, "remove_input": True, "request": {"upload": upload.filename, "keep_columns": keep}}
+    else:
+        body = await request.json()
+        filename = body.get("filename")
+        input_path = storage.resolve_dataset(current_user.username, filename) if filename else None
+        if input_path is None:
+            raise HTTPException(status_code=404, detail="Dataset not found")
+        keep = list(body.get("keep_columns") or [])
+        spec = {"input": input_path, "request": body}
+    spec["keep_columns"] = keep
+    job = jobs.submit_scoring(db, current_user, model, spec)
+    return {"job_id": job.id, "status": job.status}
+
+
 @router.get('/dashboard/models')
 def list_models_grouped(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
@@ -0,0 +1,130 @@
+# scoring.py
+"""
+Batch scoring of large files against a saved model.
+
+The input is read SCORING_CHUNK_ROWS rows at a time (CSV/TXT through the pandas
+chunked reader, Parquet row batch by row batch). Each chunk is converted with
+the model's saved preprocessing and predicted by a bounded thread pool, and
+the predictions are appended to a CSV file in input order. At most
+`workers + 1` chunks are in memory at once, whatever the size of the input.
+Excel files cannot be read in pieces and are loaded whole.
+"""
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from ml import artifacts, parallel
+
+try:
+    CHUNK_ROWS = max(1, int(os.environ.get("SCORING_CHUNK_ROWS", "100000")))
+except Exception:
+    CHUNK_ROWS = 100_000
+
+SCORING_EXTENSIONS = {".txt", ".csv", ".parquet", ".xlsx", ".xls"}
+# bytes of a text file inspected when sniffing its delimiter
+SNIFF_BYTES = 64 * 1024
+
+
+def _delimiter(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        sample = f.read(SNIFF_BYTES)
+    try:
+        return csv.Sniffer().sniff(sample).delimiter
+    except csv.Error:
+        return ","
+
+
+def iter_chunks(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """DataFrames of at most `chunk_rows` rows covering the file, in order."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".txt"):
+        delimiter = "," if ext == ".csv" else _delimiter(path)
+        with pd.read_csv(path, sep=delimiter, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif ext == ".parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif ext in (".xlsx", ".xls"):
+        df = pd.read_excel(path, engine="openpyxl" if ext == ".xlsx" else "xlrd")
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        raise ValueError(f"Invalid file type. Allowed types: {', '.join(sorted(SCORING_EXTENSIONS))}")
+
+
+def _score_chunk(artifact: dict, chunk: pd.DataFrame, keep_columns: list) -> pd.DataFrame:
+    out = artifacts.predict(artifact, chunk)
+    frame = chunk[keep_columns].reset_index(drop=True) if keep_columns else pd.DataFrame(index=range(len(chunk)))
+    frame["prediction"] = out["predictions"]
+    if "probabilities" in out:
+        probabilities = pd.DataFrame(out["probabilities"], columns=[f"proba_{c}" for c in out["classes"]])
+        frame = pd.concat([frame, probabilities], axis=1)
+    return frame
+
+
+def score_file(
+    artifact: dict,
+    in_path: str,
+    out_path: str,
+    keep_columns: Optional[list] = None,
+    workers: int = 2,
+    chunk_rows: int = CHUNK_ROWS,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Score every row of `in_path` and write the predictions (after any
+    `keep_columns` copied from the input) to the CSV `out_path`, which appears
+    only once complete. `on_progress` gets {"rows", "seconds", "rows_per_second"}
+    after every chunk; the same is returned at the end.
+    """
+    keep_columns = list(keep_columns or [])
+    model = artifact["model"]
+    if "n_jobs" in model.get_params(deep=False):
+        # the chunks are the parallelism; nested joblib workers would oversubscribe
+        model.set_params(n_jobs=1)
+
+    started = time.monotonic()
+    rows = 0
+
+    def stats() -> dict:
+        seconds = time.monotonic() - started
+        return {"rows": rows, "seconds": round(seconds, 3), "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None}
+
+    tmp_path = out_path + ".tmp"
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    try:
+        with parallel.cores(workers) as n, ThreadPoolExecutor(max_workers=n) as pool, open(tmp_path, "w", newline="") as f:
+            pending: deque = deque()
+            header = True
+
+            def write_oldest():
+                nonlocal header, rows
+                frame = pending.popleft().result()
+                frame.to_csv(f, header=header, index=False)
+                header = False
+                rows += len(frame)
+                if on_progress is not None:
+                    on_progress(stats())
+
+            for chunk in iter_chunks(in_path, chunk_rows):
+                missing = [c for c in keep_columns if c not in chunk.columns]
+                if missing:
+                    raise ValueError(f"Missing columns: {', '.join(map(str, missing))}")
+                pending.append(pool.submit(_score_chunk, artifact, chunk, keep_columns))
+                # bounded read-ahead keeps memory flat
+                if len(pending) > n:
+                    write_oldest()
+            while pending:
+                write_oldest()
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return stats()
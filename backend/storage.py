@@ -0,0 +1,317 @@
+# storage.py
+"""
+Columnar storage for processed datasets.
+
+Processed uploads live in `uploads/<user>/<file>_processed.parquet`. Parquet keeps
+the dtypes inferred at upload time and lets callers read only the columns they
+need. Datasets written by older versions as `<file>_processed.csv` are converted
+to Parquet the first time they are accessed.
+"""
+import bisect
+import hashlib
+import os
+import uuid
+from typing import Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+UPLOAD_ROOT = "uploads"
+CONFIG_ROOT = "configs"
+ARTIFACT_ROOT = os.environ.get("MODEL_ARTIFACT_DIR", "artifacts")
+PROCESSED_SUFFIX = "_processed.parquet"
+LEGACY_SUFFIX = "_processed.csv"
+
+# uploads are parsed and written this many rows at a time
+CHUNK_ROWS = int(os.environ.get("INGEST_CHUNK_ROWS", "50000"))
+
+
+class DatasetTooLarge(ValueError):
+    pass
+
+
+def user_folder(username) -> str:
+    return os.path.join(UPLOAD_ROOT, str(username))
+
+
+def processed_path(username, filename) -> str:
+    return os.path.join(user_folder(username), str(filename) + PROCESSED_SUFFIX)
+
+
+def legacy_path(username, filename) -> str:
+    return os.path.join(user_folder(username), str(filename) + LEGACY_SUFFIX)
+
+
+def csv_export_path(username, filename) -> str:
+    return os.path.join(user_folder(username), str(filename) + "_export.csv")
+
+
+def config_folder(username) -> str:
+    return os.path.join(CONFIG_ROOT, str(username))
+
+
+def config_path(username, filename) -> str:
+    return os.path.join(config_folder(username), str(filename) + "_config.json")
+
+
+def profile_path(username, filename) -> str:
+    return os.path.join(config_folder(username), str(filename) + "_profile.json")
+
+
+def artifact_path(username, name) -> str:
+    """Directory of a saved model (see ml.artifacts)."""
+    return os.path.join(ARTIFACT_ROOT, str(username), str(name))
+
+
+def scoring_folder(username) -> str:
+    """Inputs and outputs of batch scoring jobs (see scoring.py)."""
+    return os.path.join(user_folder(username), "scoring")
+
+
+def scoring_output_path(username, job_id) -> str:
+    return os.path.join(scoring_folder(username), f"{job_id}_predictions.csv")
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Convert a DataFrame to an Arrow table, falling back to strings for mixed object columns."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # object columns holding e.g. both ints and strings have no arrow type;
+        # store them as strings but keep missing values missing
+        df = df.copy()
+        for col in df.select_dtypes(include=["object"]).columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_dataset(df: pd.DataFrame, path: str) -> None:
+    # write next to the destination and swap it in so readers never see a partial file;
+    # the temp name is unique so concurrent writers never share one
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        pq.write_table(to_arrow(df), tmp_path, row_group_size=CHUNK_ROWS)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def resolve_dataset(username, filename) -> Optional[str]:
+    """
+    Return the Parquet path for a user's dataset, or None if it does not exist.
+
+    Legacy `_processed.csv` files are converted on first access and removed.
+    Concurrent first accesses (requests, training workers) may all convert;
+    each writes the same Parquet, and whoever finds the CSV already gone uses
+    the Parquet another one wrote.
+    """
+    path = processed_path(username, filename)
+    if os.path.exists(path):
+        return path
+    csv_path = legacy_path(username, filename)
+    try:
+        df = pd.read_csv(csv_path)
+    except FileNotFoundError:
+        # absent, or removed by a concurrent conversion
+        return path if os.path.exists(path) else None
+    write_dataset(df, path)
+    try:
+        os.remove(csv_path)
+    except FileNotFoundError:
+        pass
+    return path
+
+
+def read_dataset(path: str, columns: Optional[list] = None) -> pd.DataFrame:
+    return pd.read_parquet(path, columns=columns)
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 of a file's bytes, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def dataset_columns(path: str) -> list:
+    # the schema lives in the file footer, no row data is read
+    return list(pq.read_schema(path).names)
+
+
+def dataset_row_count(path: str) -> int:
+    return int(pq.ParquetFile(path).metadata.num_rows)
+
+
+def build_row_index(path: str) -> list:
+    """Return [first_row, num_rows] for every row group, in file order."""
+    meta = pq.ParquetFile(path).metadata
+    index, start = [], 0
+    for i in range(meta.num_row_groups):
+        n = meta.row_group(i).num_rows
+        index.append([start, n])
+        start += n
+    return index
+
+
+def read_rows(path: str, offset: int, limit: int, columns: Optional[list] = None, row_index: Optional[list] = None) -> pd.DataFrame:
+    """
+    Read rows [offset, offset + limit) by decoding only the row groups that
+    overlap them. `row_index` is the output of build_row_index; it is rebuilt
+    from the file footer when not supplied.
+    """
+    if row_index is None:
+        row_index = build_row_index(path)
+    starts = [start for start, _ in row_index]
+    first = max(bisect.bisect_right(starts, offset) - 1, 0)
+    groups = []
+    for i in range(first, len(row_index)):
+        start, n = row_index[i]
+        if start >= offset + limit:
+            break
+        groups.append(i)
+    pf = pq.ParquetFile(path)
+    if not groups:
+        return pf.schema_arrow.empty_table().select(columns or pf.schema_arrow.names).to_pandas()
+    table = pf.read_row_groups(groups, columns=columns)
+    return table.slice(offset - row_index[first][0], limit).to_pandas()
+
+
+def ensure_csv_export(path: str, dest: str) -> str:
+    """
+    Return a CSV rendering of the Parquet dataset at `path`, writing it one row
+    group at a time if it is missing or older than the dataset.
+    """
+    if os.path.exists(dest) and os.stat(dest).st_mtime_ns >= os.stat(path).st_mtime_ns:
+        return dest
+    # a private temp file per writer: concurrent first downloads each write
+    # their own and the last rename wins with an identical file
+    tmp_path = f"{dest}.{uuid.uuid4().hex}.tmp"
+    pf = pq.ParquetFile(path)
+    try:
+        with open(tmp_path, "w", newline="") as f:
+            if pf.num_row_groups == 0:
+                pf.schema_arrow.empty_table().to_pandas().to_csv(f, index=False)
+            for i in range(pf.num_row_groups):
+                pf.read_row_group(i).to_pandas().to_csv(f, index=False, header=(i == 0))
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dest
+
+
+def _promote_type(a: pa.DataType, b: pa.DataType) -> pa.DataType:
+    # widen a column type so values from both chunks fit
+    if a.equals(b):
+        return a
+    if pa.types.is_null(a):
+        return b
+    if pa.types.is_null(b):
+        return a
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(f(a) for f in numeric) and any(f(b) for f in numeric):
+        if pa.types.is_integer(a) and pa.types.is_integer(b):
+            return pa.int64()
+        return pa.float64()
+    return pa.string()
+
+
+class _ChunkWriter:
+    """
+    Append Arrow tables to one Parquet file, widening column types when a later
+    chunk does not fit the types inferred from earlier ones (e.g. an int column
+    that gains missing values). Widening rewrites the file one row group at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.schema = None
+        self.writer = None
+
+    def write(self, table: pa.Table) -> None:
+        table = table.replace_schema_metadata(None)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+        elif not table.schema.equals(self.schema):
+            target = pa.schema([
+                pa.field(f.name, _promote_type(f.type, table.schema.field(f.name).type))
+                for f in self.schema
+            ])
+            if not target.equals(self.schema):
+                self._rewrite(target)
+            table = table.select(self.schema.names).cast(self.schema)
+        self.writer.write_table(table, row_group_size=CHUNK_ROWS)
+
+    def _rewrite(self, schema: pa.Schema) -> None:
+        self.writer.close()
+        # copy into the other scratch file, then keep appending there
+        source_path = self.tmp_path
+        self.tmp_path = self.path + (".tmp" if source_path.endswith(".widen") else ".widen")
+        source = pq.ParquetFile(source_path)
+        self.writer = pq.ParquetWriter(self.tmp_path, schema)
+        for i in range(source.num_row_groups):
+            self.writer.write_table(source.read_row_group(i).cast(schema))
+        source.close()
+        os.remove(source_path)
+        self.schema = schema
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def ingest_chunks(chunks: Iterable[pd.DataFrame], path: str, max_rows: Optional[int] = None) -> dict:
+    """
+    Write DataFrame chunks to a Parquet dataset without holding more than one
+    chunk in memory. Schema and missing-value counts are accumulated as chunks
+    arrive.
+
+    Returns {"row_count", "columns", "dtypes", "missing_values"}. Raises
+    DatasetTooLarge as soon as more than `max_rows` rows have been seen.
+    """
+    writer = _ChunkWriter(path)
+    row_count = 0
+    columns: list = []
+    missing: dict = {}
+    try:
+        for chunk in chunks:
+            row_count += len(chunk)
+            if max_rows is not None and row_count > max_rows:
+                raise DatasetTooLarge(f"more than {max_rows} rows")
+            if not columns:
+                columns = [str(c) for c in chunk.columns]
+            for col, n in chunk.isnull().sum().items():
+                missing[str(col)] = missing.get(str(col), 0) + int(n)
+            writer.write(to_arrow(chunk))
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+    dtypes = {}
+    if writer.schema is not None:
+        empty = writer.schema.empty_table().to_pandas()
+        dtypes = {str(col): str(dtype) for col, dtype in empty.dtypes.items()}
+    return {"row_count": row_count, "columns": columns, "dtypes": dtypes, "missing_values": missing}
+
+
+def ingest_csv(fileobj, path: str, delimiter: str = ",", max_rows: Optional[int] = None) -> dict:
+    """Stream a delimited file into the Parquet store in CHUNK_ROWS-sized pieces."""
+    reader = pd.read_csv(fileobj, delimiter=delimiter, chunksize=CHUNK_ROWS)
+    with reader:
+        return ingest_chunks(reader, path, max_rows=max_rows)
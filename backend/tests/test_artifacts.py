@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from sklearn.tree._tree import Tree
+
+from ml import BaggingManager, BoostingManager, LinRegManager, LogRegManager, RandForestManager, artifacts
+
+
+def _df(n=200):
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({
+        "x1": rng.randn(n),
+        "color": rng.choice(["red", "green", "blue"], n),
+        "day": pd.date_range("2024-01-01", periods=n, freq="D").astype(str),
+    })
+    df.loc[::17, "x1"] = np.nan
+    df["label"] = np.where(df["x1"].fillna(0) + (df["color"] == "red") > 0.5, "yes", "no")
+    df["value"] = 3 * df["x1"].fillna(0) - (df["color"] == "blue")
+    return df
+
+
+def _roundtrip(manager, tmp_path):
+    path = artifacts.save(manager.artifact(), str(tmp_path / "model"))
+    return artifacts.load(path)
+
+
+def test_saved_classifier_scores_raw_rows_like_the_trained_model(tmp_path):
+    df = _df()
+    manager = RandForestManager(df, 20, n_estimators=10, classifier=True)
+    manager.train("label", ["x1", "color", "day"])
+    artifact = _roundtrip(manager, tmp_path)
+
+    out = artifacts.predict(artifact, df[["x1", "color", "day"]])
+    X, y = manager.prepare_xy(["x1", "color", "day"], "label", classifier=True)
+    expected = np.array(["no", "yes"], dtype=object)[manager.model.predict(X)]
+    assert out["predictions"] == list(expected)
+    assert out["classes"] == ["no", "yes"]
+    np.testing.assert_allclose(np.sum(out["probabilities"], axis=1), 1.0)
+
+
+def test_saved_models_replay_holdout_scaling_and_class_codes(tmp_path):
+    df = _df()
+    manager = LogRegManager(df, 20)
+    manager.train("label", ["x1", "color"])
+    artifact = _roundtrip(manager, tmp_path)
+    rows = pd.DataFrame({"x1": [3.0, -3.0, None], "color": ["red", "green", "purple"]})
+    assert artifacts.predict(artifact, rows)["predictions"][:2] == ["yes", "no"]
+
+
+def test_saved_regressor_and_missing_columns(tmp_path):
+    df = _df()
+    manager = LinRegManager(df, 20)
+    manager.train("value", ["x1", "color"])
+    artifact = _roundtrip(manager, tmp_path)
+    out = artifacts.predict(artifact, df[["x1", "color"]].drop_duplicates())
+    X, _ = manager.prepare_xy(["x1", "color"], "value", classifier=False)
+    np.testing.assert_allclose(out["predictions"], manager.model.predict(X.to_numpy()))
+
+    try:
+        artifacts.predict(artifact, pd.DataFrame({"x1": [1.0]}))
+    except ValueError as e:
+        assert "color" in str(e)
+    else:
+        raise AssertionError("missing columns must be rejected")
+
+
+def test_ensemble_trees_are_stored_beside_the_pickle(tmp_path):
+    df = _df()
+    manager = RandForestManager(df, 20, n_estimators=10, classifier=True)
+    manager.train("label", ["x1", "color", "day"])
+    artifact = _roundtrip(manager, tmp_path)
+
+    # the trained model keeps its own trees
+    assert all(isinstance(e.tree_, Tree) for e in manager.model.estimators_)
+    assert all(isinstance(e.tree_, artifacts.StoredTree) for e in artifact["model"].estimators_)
+    assert isinstance(artifact["model"].estimators_[0].tree_.arrays[0], np.memmap)
+
+    X, _ = manager.prepare_xy(["x1", "color", "day"], "label", classifier=True)
+    np.testing.assert_array_equal(artifact["model"].predict_proba(X.to_numpy()), manager.model.predict_proba(X.to_numpy()))
+    np.testing.assert_array_equal(artifact["model"].feature_importances_, manager.model.feature_importances_)
+
+
+def test_boosted_and_bagged_trees_round_trip(tmp_path):
+    df = _df()
+    runs = [(BoostingManager(df, 20, classifier=True), "label", True), (BaggingManager(df, 20, n_estimators=5), "value", False)]
+    for manager, target, classifier in runs:
+        manager.train(target, ["x1", "color"])
+        artifact = artifacts.load(artifacts.save(manager.artifact(), str(tmp_path / type(manager).__name__)))
+        assert all(isinstance(e.tree_, artifacts.StoredTree) for e in artifact["model"].estimators_)
+        X, _ = manager.prepare_xy(["x1", "color"], target, classifier=classifier)
+        np.testing.assert_allclose(artifact["model"].predict(X.to_numpy()), manager.model.predict(X.to_numpy()))
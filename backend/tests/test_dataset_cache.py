@@ -0,0 +1,80 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import jobs
+import storage
+from dataset_cache import DatasetCache
+
+
+def _write(tmp_path, name, n=100, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({"a": rng.randn(n), "b": rng.randn(n), "c": rng.randn(n)})
+    os.makedirs(storage.user_folder("u"), exist_ok=True)
+    storage.write_dataset(df, storage.processed_path("u", name))
+    return df
+
+
+def test_cache_hits_columns_and_invalidates_on_replace(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_ROOT", str(tmp_path))
+    cache = DatasetCache(max_bytes=10 * 1024 * 1024)
+    df = _write(tmp_path, "d.csv")
+
+    assert cache.load("u", "d.csv", columns=["a"])["a"].tolist() == df["a"].tolist()
+    assert cache.load("u", "d.csv", columns=["a"]) is not None
+    # "b" is merged into the cached entry, after which a/b are both hits
+    cache.load("u", "d.csv", columns=["a", "b"])
+    cache.load("u", "d.csv", columns=["b", "a"])
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # replacing the file changes its stat, so the old entry is never served
+    path = storage.processed_path("u", "d.csv")
+    new = _write(tmp_path, "d.csv", n=50, seed=1)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10**9))
+    assert len(cache.load("u", "d.csv", columns=["a"])) == 50
+    assert cache.stats()["entries"] == 1
+    assert cache.load("u", "missing.csv") is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_ROOT", str(tmp_path))
+    for name in ["x.csv", "y.csv", "z.csv"]:
+        _write(tmp_path, name)
+    one = DatasetCache._frame_bytes(storage.read_dataset(storage.processed_path("u", "x.csv")))
+    cache = DatasetCache(max_bytes=2 * one)
+
+    cache.load("u", "x.csv")
+    cache.load("u", "y.csv")
+    cache.load("u", "x.csv")
+    cache.load("u", "z.csv")
+
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    cache.load("u", "x.csv")
+    assert cache.hits == 2
+
+
+def _load_d(spec):
+    return len(jobs.dataset_cache.load("u", "d.csv"))
+
+
+def test_cache_stats_gather_worker_reports(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_ROOT", str(tmp_path))
+    monkeypatch.setattr(jobs, "dataset_cache", DatasetCache(max_bytes=10 * 1024 * 1024))
+    _write(tmp_path, "d.csv")
+    stats_dir = tmp_path / "workers"
+    stats_dir.mkdir()
+    monkeypatch.setattr(jobs, "_pool_stats_dir", str(stats_dir))
+    # two tasks in this "worker", and the report of another one
+    monkeypatch.setattr(jobs, "_worker_stats_dir", str(stats_dir))
+    assert jobs._pool_task(_load_d, {}) == jobs._pool_task(_load_d, {}) == 100
+    other = {"dataset_cache": {"hits": 5, "misses": 1, "max_bytes": 10}, "prep_cache": {}, "linear_stats": {}}
+    (stats_dir / "1.json").write_text(json.dumps(other))
+
+    stats = jobs.cache_stats()
+    assert stats["workers"][str(os.getpid())]["dataset_cache"]["hits"] == 1
+    assert stats["total"]["dataset_cache"]["hits"] == 6
+    assert stats["total"]["dataset_cache"]["max_bytes"] == 10 * 1024 * 1024 + 10
+    assert set(stats["total"]) == {"dataset_cache", "prep_cache", "linear_stats"}
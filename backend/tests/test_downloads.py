@@ -0,0 +1,106 @@
+import asyncio
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+import zstandard
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import downloads
+import storage
+
+DATA = bytes(range(256)) * 40
+
+
+def _request(**headers) -> Request:
+    raw = [(k.replace("_", "-").lower().encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def _body(response) -> bytes:
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def path(tmp_path):
+    p = tmp_path / "data.bin"
+    p.write_bytes(DATA)
+    return str(p)
+
+
+def _respond(path, **headers):
+    return downloads.file_response(_request(**headers), path, "application/octet-stream", "data.bin")
+
+
+def test_whole_file_is_sent_with_its_length(path):
+    response = _respond(path)
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(DATA))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert _body(response) == DATA
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=10000-", 10000, len(DATA) - 1),
+    ("bytes=-5", len(DATA) - 5, len(DATA) - 1),
+    ("bytes=100-999999", 100, len(DATA) - 1),
+])
+def test_range_requests_get_206_with_the_identity_bytes(path, header, start, end):
+    # ranges are byte offsets of the file, so they are never compressed
+    response = _respond(path, range=header, accept_encoding="gzip")
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(DATA)}"
+    assert "content-encoding" not in response.headers
+    assert _body(response) == DATA[start:end + 1]
+
+
+def test_if_range_resumes_only_the_same_version(path):
+    etag = _respond(path).headers["etag"]
+    assert _respond(path, range="bytes=0-9", if_range=etag).status_code == 206
+    stale = _respond(path, range="bytes=0-9", if_range='"old"')
+    assert stale.status_code == 200
+    assert _body(stale) == DATA
+
+
+@pytest.mark.parametrize("header", ["bytes=20000-", "bytes=50-10"])
+def test_unsatisfiable_ranges_are_416(path, header):
+    with pytest.raises(HTTPException) as err:
+        _respond(path, range=header)
+    assert err.value.status_code == 416
+    assert err.value.headers["Content-Range"] == f"bytes */{len(DATA)}"
+
+
+def test_bodies_are_compressed_as_the_client_accepts(path):
+    response = _respond(path, accept_encoding="gzip, deflate")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(_body(response)) == DATA
+
+    response = _respond(path, accept_encoding="gzip, zstd")
+    assert response.headers["content-encoding"] == "zstd"
+    assert response.headers["etag"].endswith('-zstd"')
+    body = _body(response)
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(body) == DATA
+
+    response = _respond(path, accept_encoding="zstd;q=0, br")
+    assert "content-encoding" not in response.headers
+    assert _body(response) == DATA
+
+
+def test_concurrent_first_exports_do_not_collide(tmp_path):
+    source = str(tmp_path / "d.parquet")
+    df = pd.DataFrame({"a": range(5000), "b": ["x"] * 5000})
+    storage.write_dataset(df, source)
+    dest = str(tmp_path / "d.csv")
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: storage.ensure_csv_export(source, dest), range(8)))
+
+    assert results == [dest] * 8
+    assert pd.read_csv(dest).equals(df)
+    assert sorted(os.listdir(tmp_path)) == ["d.csv", "d.parquet"]
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml import SVMManager, explain
+
+pytestmark = pytest.mark.skipif(explain.shap is None, reason="shap is not installed")
+
+
+def _df(n=120):
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["y"] = (df["x1"] > 0).astype(int)
+    return df
+
+
+def test_fit_only_skips_evaluation_and_explains_a_sample():
+    manager = SVMManager(_df(), 25, classifier=True)
+    manager.fit_only = True
+    result = manager.train("y", ["x1", "x2"])
+    assert manager.cv_results is None
+    assert "shap_summary" not in result and "learning_curve" not in result
+
+    out = explain.explain(
+        manager.model, manager.X_train, manager.X_test, manager.feature_names,
+        background="random", background_size=10, max_rows=12, batch_size=5,
+    )
+    assert (out["rows_requested"], out["rows_explained"], out["background_size"]) == (12, 12, 10)
+    assert out["complete"]
+    shap_by_name = {s["name"]: s["mean_abs_shap"] for s in out["shap_summary"]}
+    assert shap_by_name["x1"] > shap_by_name["x2"]
+
+
+def test_time_budget_stops_after_the_first_wave():
+    manager = SVMManager(_df(), 50, classifier=True)
+    manager.fit_only = True
+    manager.train("y", ["x1", "x2"])
+    out = explain.explain(
+        manager.model, manager.X_train, manager.X_test,
+        background_size=5, max_rows=60, batch_size=1, time_budget=1e-9,
+    )
+    assert 0 < out["rows_explained"] < 60
+    assert not out["complete"]
+
+
+def test_options_validation():
+    assert explain.options(None) == explain.DEFAULTS
+    with pytest.raises(ValueError):
+        explain.options({"background": "all"})
+    with pytest.raises(ValueError):
+        explain.options({"max_rows": 0})
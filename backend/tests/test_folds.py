@@ -0,0 +1,195 @@
+import json
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import AdaBoostClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from ml import (
+    BaggingManager,
+    BoostingManager,
+    DecisionTreeManager,
+    LinRegManager,
+    LogRegManager,
+    RandForestManager,
+    folds,
+)
+
+
+def test_evaluation_reuses_cross_validation_fits(monkeypatch):
+    rng = np.random.RandomState(0)
+    n = 200
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["y"] = (df["x1"] + 0.5 * rng.randn(n) > 0).astype(int)
+
+    fits = []
+    original_fit = DecisionTreeClassifier.fit
+
+    def counting_fit(self, *args, **kwargs):
+        fits.append(1)
+        return original_fit(self, *args, **kwargs)
+
+    monkeypatch.setattr(DecisionTreeClassifier, "fit", counting_fit)
+    manager = DecisionTreeManager(df, 20, classifier=True, cv_folds=5)
+    result = manager.train("y", ["x1", "x2"])
+
+    # 5 folds + holdout + 4 smaller learning-curve sizes (was 5 + 1 + 15)
+    assert len(fits) == 10
+    lc = result["learning_curve"]
+    assert len(lc["train_sizes"]) == 5
+    assert lc["test_scores_mean"][-1] == result["cv_mean"]["accuracy_mean"]
+    assert "roc_curve" in result and "pr_curve" in result
+    # holdout metrics, confusion matrix and saved predictions share one predict call
+    assert manager.predictions.calls == 1
+
+
+def test_ensemble_complexity_curve_needs_no_extra_fits(monkeypatch):
+    rng = np.random.RandomState(1)
+    n = 200
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["y"] = (df["x1"] - df["x2"] + 0.5 * rng.randn(n) > 0).astype(int)
+
+    fits = []
+    original_fit = AdaBoostClassifier.fit
+
+    def counting_fit(self, *args, **kwargs):
+        fits.append(1)
+        return original_fit(self, *args, **kwargs)
+
+    monkeypatch.setattr(AdaBoostClassifier, "fit", counting_fit)
+    result = BoostingManager(df, 20, n_estimators=20, classifier=True, cv_folds=5).train("y", ["x1", "x2"])
+    assert len(fits) == 10
+
+    cc = result["complexity_curve"]
+    assert cc["param"] == "n_estimators"
+    assert cc["values"][0] == 1 and cc["values"][-1] == 20
+    assert len(cc["test_scores_mean"]) == len(cc["values"]) == 10
+    # the last stage is the full fold estimator
+    assert np.isclose(cc["test_scores_mean"][-1], result["cv_mean"]["accuracy_mean"])
+
+    forest = RandForestManager(df, 20, n_estimators=7, classifier=True).train("y", ["x1", "x2"])
+    assert forest["complexity_curve"]["values"] == list(range(1, 8))
+    assert np.isclose(forest["complexity_curve"]["test_scores_mean"][-1], forest["cv_mean"]["accuracy_mean"])
+    assert "complexity_curve" not in DecisionTreeManager(df, 20, classifier=True).train("y", ["x1", "x2"])
+
+
+def test_pruning_path_grows_one_tree_per_fold(monkeypatch):
+    rng = np.random.RandomState(0)
+    n = 300
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["y"] = (df["x1"] + 0.8 * rng.randn(n) > 0).astype(int)
+
+    fits = []
+    original_fit = DecisionTreeClassifier.fit
+
+    def counting_fit(self, *args, **kwargs):
+        fits.append(self.ccp_alpha)
+        return original_fit(self, *args, **kwargs)
+
+    monkeypatch.setattr(DecisionTreeClassifier, "fit", counting_fit)
+    manager = DecisionTreeManager(df, 20, classifier=True, cv_folds=5, pruning_path=True)
+    result = manager.train("y", ["x1", "x2"])
+
+    path = result["pruning_path"]
+    # one full tree for the candidate alphas and one per fold, then the usual CV at the best alpha
+    assert fits[:6] == [0.0] * 6
+    assert len(fits) == 6 + 10
+    assert path["values"][0] == 0.0 and len(path["values"]) <= 50
+    assert path["n_leaves"] == sorted(path["n_leaves"], reverse=True) and path["n_leaves"][-1] == 1
+    assert manager.ccp_alpha == path["best_ccp_alpha"] > 0
+    best = path["values"].index(path["best_ccp_alpha"])
+    assert path["test_scores_mean"][best] > path["test_scores_mean"][0]
+    assert abs(result["cv_mean"]["accuracy_mean"] - path["test_scores_mean"][best]) < 1e-9
+
+
+def test_out_of_bag_replaces_cross_validation(monkeypatch):
+    rng = np.random.RandomState(0)
+    n = 300
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n), "x3": rng.randn(n)})
+    df["y"] = (df["x1"] + 0.5 * rng.randn(n) > 0).astype(int)
+
+    fits = []
+    original_fit = DecisionTreeClassifier.fit
+
+    def counting_fit(self, *args, **kwargs):
+        fits.append(1)
+        return original_fit(self, *args, **kwargs)
+
+    monkeypatch.setattr(DecisionTreeClassifier, "fit", counting_fit)
+    manager = BaggingManager(df, 20, n_estimators=20, classifier=True, max_features=2, oob=True)
+    result = manager.train("y", ["x1", "x2", "x3"])
+
+    # one ensemble, no fold refits
+    assert len(fits) == 20
+    assert manager.cv_results is None and result["cv_mean"] == {}
+    oob = result["oob"]
+    assert oob["rows"] == 240
+    assert 0.6 < oob["accuracy"] == oob["score"]
+    assert result["roc_auc"] > 0.6
+    # every out-of-bag prediction with its position in the training rows
+    assert len(oob["row_positions"]) == len(oob["predictions"]) == 240
+    model = manager.model
+    expected = model.classes_[np.argmax(model.oob_decision_function_, axis=1)]
+    assert oob["predictions"] == expected[oob["row_positions"]].tolist()
+    json.dumps(oob)
+
+    forest = RandForestManager(df.assign(y=df["x1"] * 2), 20, n_estimators=30, oob=True)
+    assert forest.train("y", ["x1", "x2", "x3"])["oob"]["r2"] > 0.8
+
+
+def test_out_of_bag_leaves_out_rows_every_member_drew():
+    rng = np.random.RandomState(0)
+    n = 250
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["y"] = (df["x1"] > 0).astype(int)
+
+    forest = RandForestManager(df, 20, n_estimators=3, classifier=True, oob=True)
+    forest.train("y", ["x1", "x2"])
+    model = forest.model
+    expected = int(np.sum(model.oob_decision_function_.sum(axis=1) > 0))
+    assert 0 < expected < 200
+    assert forest.oob_results["rows"] == expected
+
+    regressor = RandForestManager(df.assign(y=df["x1"] * 2), 20, n_estimators=3, oob=True)
+    regressor.train("y", ["x1", "x2"])
+    drawn = np.zeros((3, 200), dtype=bool)
+    for k, rows in enumerate(regressor.model.estimators_samples_):
+        drawn[k, rows] = True
+    assert regressor.oob_results["rows"] == int(np.sum(~drawn.all(axis=0))) < 200
+
+
+def _test_rows(manager):
+    return [sorted(f["test"].tolist()) for f in manager.cv_results["folds"]]
+
+
+def test_shared_fold_assignment_replaces_each_managers_splitter():
+    rng = np.random.RandomState(3)
+    n = 150
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["label"] = (df["x1"] + 0.3 * rng.randn(n) > 0).astype(int)
+    df["value"] = 2 * df["x1"] - df["x2"] + 0.1 * rng.randn(n)
+
+    labels = LogRegManager(df, 20).prepare_xy(["x1", "x2"], "label", classifier=True)[1]
+    fold_ids = folds.assign(labels, 4, classifier=True)
+    assert sorted(np.bincount(fold_ids)) == [37, 37, 38, 38]
+    # stratified: every fold has both classes in about the same proportion
+    assert all(0.4 < labels[fold_ids == k].mean() < 0.6 for k in range(4))
+
+    classifiers = [
+        LogRegManager(df, 20, cv_folds=4, Cs=3),
+        DecisionTreeManager(df, 20, classifier=True, cv_folds=4, pruning_path=True),
+        RandForestManager(df, 20, classifier=True, n_estimators=5, cv_folds=4),
+    ]
+    for manager in classifiers:
+        manager.fold_ids = fold_ids
+        manager.train("label", ["x1", "x2"])
+    expected = [sorted(np.flatnonzero(fold_ids == k).tolist()) for k in range(4)]
+    assert all(_test_rows(m) == expected for m in classifiers)
+
+    values = LinRegManager(df, 20).prepare_xy(["x1", "x2"], "value", classifier=False)[1]
+    fold_ids = folds.assign(values, 4, classifier=False)
+    regressors = [LinRegManager(df, 20, cv_folds=4), RandForestManager(df, 20, n_estimators=5, cv_folds=4)]
+    for manager in regressors:
+        manager.fold_ids = fold_ids
+        manager.train("value", ["x1", "x2"])
+    assert _test_rows(regressors[0]) == _test_rows(regressors[1])
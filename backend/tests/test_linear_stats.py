@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import KFold, cross_validate, train_test_split
+
+from ml import LinRegManager, linear_stats
+
+
+def _df(n=300):
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n), "x3": rng.randn(n)})
+    df["y"] = 2 * df["x1"] - df["x2"] + 0.5 * rng.randn(n)
+    return df
+
+
+def test_matches_fitted_linear_regression():
+    df = _df()
+    manager = LinRegManager(df, 20, cv_folds=5)
+    result = manager.train("y", ["x1", "x2", "x3"])
+
+    X, y = manager.prepare_xy(["x1", "x2", "x3"], "y", classifier=False)
+    X, y = X.to_numpy(), y.to_numpy()
+    cv = cross_validate(
+        LinearRegression(), X, y, cv=KFold(5, shuffle=True, random_state=42),
+        scoring=("r2", "neg_mean_squared_error", "neg_mean_absolute_error"),
+    )
+    assert result["cv_mean"]["r2_mean"] == pytest.approx(cv["test_r2"].mean())
+    assert result["cv_mean"]["mse_mean"] == pytest.approx(-cv["test_neg_mean_squared_error"].mean())
+    assert result["cv_mean"]["mae_mean"] == pytest.approx(-cv["test_neg_mean_absolute_error"].mean())
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    reference = LinearRegression().fit(X_train, y_train)
+    np.testing.assert_allclose(manager.model.coef_, reference.coef_)
+    assert result["r2"] == pytest.approx(reference.score(X_test, y_test))
+    assert "learning_curve" in result
+
+
+def test_statistics_are_cached_per_dataset_and_serve_subsets():
+    linear_stats.stats_cache.clear()
+    manager = LinRegManager(_df(), 20)
+    manager.dataset_key = "linear-stats-test"
+    manager.train("y", ["x1", "x2", "x3"])
+    misses = linear_stats.stats_cache.misses
+
+    subsets = manager.fit_subsets("y", ["x1", "x2", "x3"], [["x1"], ["x1", "x2"], ["x3"]])
+    assert linear_stats.stats_cache.misses == misses
+    assert [s["features"] for s in subsets] == [["x1"], ["x1", "x2"], ["x3"]]
+    assert subsets[1]["cv_mean"]["r2_mean"] > subsets[0]["cv_mean"]["r2_mean"] > subsets[2]["cv_mean"]["r2_mean"]
+    with pytest.raises(ValueError):
+        manager.fit_subsets("y", ["x1", "x2", "x3"], [["x4"]])
+
+
+def test_sweeps_are_scored_best_first(monkeypatch):
+    import jobs
+    from ml.linear_regression import sweep_subsets
+
+    assert sweep_subsets(["a", "b", "c"], "drop_one") == [["b", "c"], ["a", "c"], ["a", "b"]]
+    assert len(sweep_subsets(["a", "b", "c"], "all")) == 7
+    with pytest.raises(ValueError):
+        sweep_subsets([f"x{i}" for i in range(11)], "all")
+    with pytest.raises(ValueError):
+        sweep_subsets(["a"], "forward")
+
+    monkeypatch.setattr(jobs, "_load_frame", lambda spec: _df())
+    monkeypatch.setattr(jobs, "load_column_types", lambda username, filename: {})
+    features = ["x1", "x2", "x3"]
+    spec = {"username": "u", "filename": "d.csv", "target": "y", "features": features, "test_split": 20.0,
+            "model": "ignored", "params": {}, "subsets": sweep_subsets(features, "all")}
+    scored = jobs.fit_subsets(spec)
+    r2 = [s["cv_mean"]["r2_mean"] for s in scored]
+    assert r2 == sorted(r2, reverse=True)
+    assert scored[0]["features"] in (["x1", "x2"], ["x1", "x2", "x3"])
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
+
+from ml import LogRegManager
+
+
+def _df(n=300):
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["y"] = np.digitize(df["x1"] + 0.5 * rng.randn(n), [-0.5, 0.5])
+    return df
+
+
+def test_multiclass_is_native_unless_the_solver_is_binary_only():
+    manager = LogRegManager(_df(), 20)
+    result = manager.train("y", ["x1", "x2"])
+    assert isinstance(manager.model, LogisticRegression)
+    assert manager.model.coef_.shape == (3, 2)
+    assert result["accuracy"] > 0.5
+    assert isinstance(LogRegManager(_df(), 20, solver="liblinear").estimator(), OneVsRestClassifier)
+    assert isinstance(LogRegManager(_df(), 20, multi_class="ovr").estimator(), OneVsRestClassifier)
+
+
+def test_regularization_path_scores_every_C_and_keeps_the_best(monkeypatch):
+    fits = []
+    original_fit = LogisticRegression.fit
+
+    def counting_fit(self, *args, **kwargs):
+        fits.append(self.C)
+        return original_fit(self, *args, **kwargs)
+
+    monkeypatch.setattr(LogisticRegression, "fit", counting_fit)
+    manager = LogRegManager(_df(), 20, Cs=[10.0, 1e-4, 1.0], cv_folds=3)
+    result = manager.train("y", ["x1", "x2"])
+
+    path = result["regularization_path"]
+    assert path["C"] == [1e-4, 1.0, 10.0]
+    assert len(path["accuracy_mean"]) == len(path["accuracy_std"]) == 3
+    assert path["best_C"] == manager.C == path["C"][int(np.argmax(path["accuracy_mean"]))]
+    assert path["accuracy_mean"][0] < path["accuracy_mean"][2]
+    assert result["cv_mean"]["accuracy_mean"] == max(path["accuracy_mean"])
+    # 3 folds x 3 Cs, the holdout fit and 4 learning-curve points; no separate CV at the best C
+    assert len(fits) == 9 + 1 + 4
+
+
+def test_path_and_holdout_share_one_scaling_and_model_form():
+    df = _df().assign(x2=lambda d: d["x2"] * 1000)
+    manager = LogRegManager(df, 20, Cs=3, cv_folds=3, multi_class="ovr")
+    manager.train("y", ["x1", "x2"])
+
+    X, _ = manager.prepare_xy(["x1", "x2"], "y", classifier=True)
+    np.testing.assert_allclose(manager.cv_results["X"], manager.holdout_scaler.transform(X))
+    fold_model = manager.cv_results["folds"][0]["estimator"]
+    assert isinstance(fold_model, OneVsRestClassifier) and isinstance(manager.model, OneVsRestClassifier)
+    assert fold_model.estimator.C == manager.cv_results["estimator"].estimator.C == manager.C
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import jobs
+import memo
+from database import Base
+from models import DefaultModel, User
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _spec(**overrides):
+    spec = {
+        "dataset_key": "abc123",
+        "model": "random_forest",
+        "features": ["x1", "x2"],
+        "target": "y",
+        "test_split": 20.0,
+        "params": {"n_estimators": 50, "classifier": True},
+        "truth_spec": None,
+    }
+    spec.update(overrides)
+    return spec
+
+
+def test_fingerprint_fills_defaults_and_normalizes_numbers():
+    explicit = _spec(params={"n_estimators": 50.0, "classifier": True, "random_state": 42})
+    assert memo.fingerprint(_spec()) == memo.fingerprint(explicit)
+    assert memo.fingerprint(_spec(test_split=20)) == memo.fingerprint(_spec())
+
+
+@pytest.mark.parametrize("change", [
+    {"dataset_key": "other"},
+    {"params": {"n_estimators": 50, "classifier": True, "random_state": 7}},
+    {"features": ["x2", "x1"]},
+    {"truth_spec": {"positive": ["yes"]}},
+])
+def test_fingerprint_changes_with_anything_the_result_depends_on(change):
+    assert memo.fingerprint(_spec(**change)) != memo.fingerprint(_spec())
+
+
+def test_fingerprint_covers_library_versions(monkeypatch):
+    before = memo.fingerprint(_spec())
+    monkeypatch.setattr(memo, "library_versions", lambda: {"scikit-learn": "0.0"})
+    assert memo.fingerprint(_spec()) != before
+
+
+def test_without_a_dataset_hash_nothing_is_remembered(db):
+    user = User(username="u")
+    db.add(user)
+    db.commit()
+    memo.remember(db, user, _spec(dataset_key=None), 1)
+    assert memo.lookup(db, user, _spec(dataset_key=None)) is None
+
+
+def test_lookup_returns_the_latest_model_for_the_same_user(db):
+    alice, bob = User(username="alice"), User(username="bob")
+    db.add_all([alice, bob])
+    db.commit()
+    first = DefaultModel(user_id=alice.id, model_type="RandForestManager", parameters={}, metrics={"accuracy": 0.8})
+    second = DefaultModel(user_id=alice.id, model_type="RandForestManager", parameters={}, metrics={"accuracy": 0.9})
+    db.add_all([first, second])
+    db.commit()
+
+    assert memo.lookup(db, alice, _spec()) is None
+    memo.remember(db, alice, _spec(), first.id)
+    memo.remember(db, alice, _spec(), second.id)
+    assert memo.lookup(db, alice, _spec()).id == second.id
+    assert memo.lookup(db, bob, _spec()) is None
+
+    payload = jobs.stored_result(second)
+    assert payload["cached"] is True and payload["model_id"] == second.id
+    assert payload["accuracy"] == 0.9 and payload["is_classifier"] is True
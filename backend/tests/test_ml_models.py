@@ -1,6 +1,13 @@
+import inspect
+
 import numpy as np
 import pandas as pd
+import pytest
+from sklearn.base import is_classifier
+
+import ml
 from ml import (
+    ModelManager,
     LinRegManager,
     LogRegManager,
     DecisionTreeManager,
@@ -94,4 +101,33 @@ def test_classification_managers_run():
         # test-set classifier metrics (top-level)
         assert "accuracy" in result, f"{mgr_cls.__name__} missing accuracy"
         assert _is_number(result["accuracy"])
-        assert 0.0 <= float(result["accuracy"]) <= 1.0
\ No newline at end of file
+        assert 0.0 <= float(result["accuracy"]) <= 1.0
+
+def test_copy_on_write_is_scoped_to_preparation():
+    assert not pd.get_option("mode.copy_on_write")
+    df = make_regression_df()
+    df["c"] = ["a", "b"] * 100
+    before = df.copy()
+    X, y = RandForestManager(df, 20).prepare_xy(["x1", "c"], "y", classifier=False)
+    pd.testing.assert_frame_equal(df, before)
+    assert not pd.get_option("mode.copy_on_write")
+
+
+def test_managers_must_implement_estimator():
+    class Incomplete(ModelManager):
+        def train(self, target, features):
+            return {}
+
+    with pytest.raises(TypeError, match="estimator"):
+        Incomplete(pd.DataFrame(), 20)
+
+
+@pytest.mark.parametrize("name", sorted(ml.models))
+@pytest.mark.parametrize("params", [{}, {"classifier": True}])
+def test_params_are_checked_without_building_a_manager(name, params):
+    cls = ml.models[name]
+    accepted = {k: v for k, v in params.items() if k in inspect.signature(cls).parameters}
+    cls.check_params(accepted)
+    assert cls.classifies(accepted) == is_classifier(cls(pd.DataFrame(), 20, **accepted).estimator())
+    with pytest.raises(TypeError):
+        cls.check_params({"no_such_param": 1})
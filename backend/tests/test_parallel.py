@@ -0,0 +1,30 @@
+import threading
+
+from ml import parallel
+from ml.parallel import CoreBudget
+
+
+def test_budget_grants_what_is_free_and_blocks_when_empty():
+    budget = CoreBudget(4)
+    assert budget.acquire(3) == 3
+    assert budget.acquire(3) == 1
+    assert budget.available() == 0
+
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(budget.acquire(2)))
+    waiter.start()
+    waiter.join(timeout=0.2)
+    assert waiter.is_alive() and not granted
+
+    budget.release(3)
+    waiter.join(timeout=5)
+    assert granted == [2]
+
+
+def test_nested_sections_reuse_the_outer_reservation(monkeypatch):
+    monkeypatch.setattr(parallel, "budget", CoreBudget(2))
+    with parallel.cores(8) as outer:
+        assert outer == 2
+        with parallel.cores(8) as inner:
+            assert inner == 1
+    assert parallel.budget.available() == 2
@@ -0,0 +1,70 @@
+import importlib
+
+import numpy as np
+import pandas as pd
+
+from ml import RandForestManager, LinRegManager
+from ml.prep_cache import PreprocessingCache
+
+# the package re-exports the ModelManager class under the module's name
+model_manager_module = importlib.import_module("ml.ModelManager")
+
+
+def _df(n=120):
+    rng = np.random.RandomState(0)
+    return pd.DataFrame({"x1": rng.randn(n), "x2": rng.choice(["a", "b"], n), "y": rng.randn(n)})
+
+
+def test_prepare_xy_reuses_cached_matrices(tmp_path, monkeypatch):
+    cache = PreprocessingCache(max_bytes=10**8, spill_dir=str(tmp_path), max_disk_bytes=10**8)
+    monkeypatch.setattr(model_manager_module, "prep_cache", cache)
+    df = _df()
+
+    first = LinRegManager(df, 20)
+    first.dataset_key = "abc"
+    X1, y1 = first.prepare_xy(["x1", "x2"], "y", classifier=False)
+    second = RandForestManager(df, 20)
+    second.dataset_key = "abc"
+    X2, y2 = second.prepare_xy(["x1", "x2"], "y", classifier=False)
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    pd.testing.assert_frame_equal(X1, X2)
+    np.testing.assert_array_equal(y1.to_numpy(), y2.to_numpy())
+
+    # a different truth_spec is a different selection
+    second.truth_spec = {"operator": ">", "value": "0"}
+    second.prepare_xy(["x1", "x2"], "y", classifier=True)
+    assert cache.misses == 2
+
+
+def test_evicted_entries_spill_to_disk(tmp_path):
+    X = np.arange(20, dtype="float64").reshape(10, 2)
+    y = np.arange(10)
+    cache = PreprocessingCache(max_bytes=X.nbytes + y.nbytes, spill_dir=str(tmp_path), max_disk_bytes=10**8)
+    cache.put("k1", X, ["a", "b"], y)
+    cache.put("k2", X + 1, ["a", "b"], y)
+
+    X1, cols, y1 = cache.get("k1")
+    assert cache.disk_hits == 1 and cols == ["a", "b"]
+    assert isinstance(X1, np.memmap)
+    np.testing.assert_array_equal(X1, X)
+    np.testing.assert_array_equal(y1, y)
+
+
+def test_prepared_matrices_are_shared_through_the_spill_directory(tmp_path, monkeypatch):
+    cache = PreprocessingCache(max_bytes=10**8, spill_dir=str(tmp_path), max_disk_bytes=10**8)
+    monkeypatch.setattr(model_manager_module, "prep_cache", cache)
+    manager = LinRegManager(_df(), 20)
+    manager.dataset_key = "abc"
+    X, y = manager.prepare_xy(["x1", "x2"], "y", classifier=False)
+
+    # the entry keeps the mapped file rather than a private copy
+    assert cache.stats()["bytes"] == 0
+    # another training process finds it on disk
+    other = PreprocessingCache(max_bytes=10**8, spill_dir=str(tmp_path), max_disk_bytes=10**8)
+    key = next(iter(cache._entries))
+    X2, columns, y2 = other.get(key)
+    assert other.disk_hits == 1 and isinstance(X2, np.memmap)
+    np.testing.assert_array_equal(X2, X.to_numpy())
+    assert columns == list(X.columns)
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")] == []
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import jobs
+import profiling
+import storage
+from ml import LinRegManager
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_ROOT", str(tmp_path / "uploads"))
+    monkeypatch.setattr(storage, "CONFIG_ROOT", str(tmp_path / "configs"))
+    monkeypatch.setattr(storage, "CHUNK_ROWS", 40)
+    df = pd.DataFrame({
+        "x": np.arange(100, dtype="float64"),
+        "color": ["red"] * 60 + ["blue"] * 30 + [None] * 10,
+    })
+    df.loc[[3, 7], "x"] = np.nan
+    os.makedirs(storage.user_folder("u"))
+    storage.write_dataset(df, storage.processed_path("u", "d.csv"))
+    return df
+
+
+def _counting_builds(monkeypatch) -> list:
+    builds = []
+    original = profiling.build_profile
+
+    def counting(path, *args, **kwargs):
+        builds.append(path)
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(profiling, "build_profile", counting)
+    return builds
+
+
+def test_profile_describes_the_dataset(dataset):
+    profile = profiling.load_profile("u", "d.csv")
+    path = storage.processed_path("u", "d.csv")
+
+    assert profile["row_count"] == 100
+    assert profile["columns"] == ["x", "color"]
+    assert profile["missing_values"] == {"x": 2, "color": 10}
+    x = profile["column_stats"]["x"]
+    assert (x["min"], x["max"], x["distinct_count"]) == (0.0, 99.0, 98)
+    assert sum(x["histogram"]["counts"]) == 98
+    assert profile["column_stats"]["color"]["top_values"] == [
+        {"value": "red", "count": 60}, {"value": "blue", "count": 30},
+    ]
+    assert profile["row_index"] == [[0, 40], [40, 40], [80, 20]]
+    assert profile["content_hash"] == storage.file_digest(path)
+    assert profile["version"] == profiling.PROFILE_VERSION
+    assert profiling.load_profile("u", "missing.csv") is None
+
+
+def test_stored_profile_is_reused_until_stale(dataset, monkeypatch):
+    builds = _counting_builds(monkeypatch)
+    first = profiling.load_profile("u", "d.csv")
+    assert profiling.load_profile("u", "d.csv") == first
+    assert len(builds) == 1
+
+    monkeypatch.setattr(profiling, "PROFILE_VERSION", profiling.PROFILE_VERSION + 1)
+    assert profiling.load_profile("u", "d.csv")["version"] == profiling.PROFILE_VERSION
+    assert len(builds) == 2
+
+    path = storage.processed_path("u", "d.csv")
+    storage.write_dataset(dataset.head(50), path)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    rebuilt = profiling.load_profile("u", "d.csv")
+    assert len(builds) == 3
+    assert rebuilt["row_count"] == 50
+    assert rebuilt["content_hash"] != first["content_hash"]
+
+
+def test_column_types_are_decided_on_deduplicated_rows_like_sanitize(dataset):
+    # 4 distinct dates and 6 copies of one row: a datetime column once duplicates go
+    df = pd.DataFrame({"d": [f"2024-01-0{i}" for i in range(1, 5)] + ["unknown"] * 6, "n": [1] * 10})
+    storage.write_dataset(df, storage.processed_path("u", "dates.csv"))
+
+    profile = profiling.load_profile("u", "dates.csv")
+    manager = LinRegManager(df, 20)
+    manager.sanitize(df)
+    assert profile["column_types"]["d"] == manager.sanitize_state["column_types"]["d"]
+    assert profile["column_types"]["d"]["kind"] == "datetime"
+    np.testing.assert_array_equal(
+        profiling.duplicate_rows(pq.ParquetFile(storage.processed_path("u", "dates.csv"))), df.duplicated()
+    )
+
+
+def test_legacy_datasets_get_column_types(dataset):
+    pd.DataFrame({"color": ["red", "blue"] * 5, "y": range(10)}).to_csv(storage.legacy_path("u", "old.csv"), index=False)
+    assert not os.path.exists(storage.config_path("u", "old.csv"))
+
+    assert jobs.load_column_types("u", "old.csv") == {"color": {"kind": "category", "categories": ["blue", "red"]}}
+    assert jobs.load_column_types("u", "missing.csv") == {}
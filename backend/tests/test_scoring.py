@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scoring
+from ml import DecisionTreeManager, artifacts
+
+
+def _trained(tmp_path):
+    rng = np.random.RandomState(0)
+    n = 300
+    df = pd.DataFrame({"id": np.arange(n), "x1": rng.randn(n), "color": rng.choice(["red", "blue"], n)})
+    df["label"] = np.where(df["x1"] > 0, "hi", "lo")
+    manager = DecisionTreeManager(df, 20, classifier=True, max_depth=3)
+    manager.train("label", ["x1", "color"])
+    return df, artifacts.load(artifacts.save(manager.artifact(), str(tmp_path / "model")))
+
+
+def test_scores_a_file_chunk_by_chunk_in_order(tmp_path):
+    df, artifact = _trained(tmp_path)
+    in_path = str(tmp_path / "rows.csv")
+    df.drop(columns="label").to_csv(in_path, index=False)
+    out_path = str(tmp_path / "out" / "predictions.csv")
+
+    progress = []
+    stats = scoring.score_file(
+        artifact, in_path, out_path, keep_columns=["id"], workers=3, chunk_rows=40, on_progress=progress.append
+    )
+
+    out = pd.read_csv(out_path)
+    expected = artifacts.predict(artifact, df[["x1", "color"]])
+    assert stats["rows"] == len(out) == 300 and len(progress) == 8
+    assert [p["rows"] for p in progress] == sorted(p["rows"] for p in progress)
+    assert out["id"].tolist() == list(range(300))
+    assert out["prediction"].tolist() == expected["predictions"]
+    assert list(out.columns) == ["id", "prediction", "proba_hi", "proba_lo"]
+
+
+def test_parquet_input_and_failures_leave_no_output(tmp_path):
+    df, artifact = _trained(tmp_path)
+    in_path = str(tmp_path / "rows.parquet")
+    df.to_parquet(in_path, index=False)
+    stats = scoring.score_file(artifact, in_path, str(tmp_path / "a.csv"), chunk_rows=128)
+    assert stats["rows"] == 300
+
+    df[["id", "x1"]].to_parquet(in_path, index=False)
+    with pytest.raises(ValueError):
+        scoring.score_file(artifact, in_path, str(tmp_path / "b.csv"), chunk_rows=128)
+    assert not (tmp_path / "b.csv").exists() and not (tmp_path / "b.csv.tmp").exists()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml import DecisionTreeManager, LinRegManager, search
+
+
+def _df(n=400):
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["y"] = (df["x1"] + 0.3 * rng.randn(n) > 0).astype(int)
+    return df
+
+
+def test_grid_search_ranks_every_combination():
+    s = search.Search(DecisionTreeManager, _df(), "y", ["x1", "x2"], 25, params={"classifier": True})
+    leaderboard = search.run(s, {"max_depth": [1, 3], "min_samples_split": [2, 10]}, method="grid")
+    assert len(leaderboard) == 4
+    assert [t["rank"] for t in leaderboard] == [1, 2, 3, 4]
+    assert all(t["resource"] == len(s.y_train) for t in leaderboard)
+    scores = [t["score"] for t in leaderboard]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_halving_refits_only_the_best_on_more_rows():
+    s = search.Search(DecisionTreeManager, _df(), "y", ["x1", "x2"], 25, params={"classifier": True})
+    progress = []
+    space = {"max_depth": {"low": 1, "high": 12, "type": "int"}, "min_samples_split": [2, 5, 20]}
+    leaderboard = search.run(s, space, method="halving", n_trials=9, eta=3, min_resource=30, on_progress=progress.append)
+
+    per_rung = {}
+    for t in s.trials:
+        per_rung.setdefault(t["rung"], set()).add(t["resource"])
+    assert len([t for t in s.trials if t["rung"] == 0]) == 9
+    assert len([t for t in s.trials if t["rung"] == 1]) == 3
+    assert per_rung[0] == {30} and max(per_rung) == len(progress) - 1
+    assert leaderboard[0]["resource"] == len(s.y_train)
+
+
+def test_budget_caps_the_number_of_fits():
+    s = search.Search(LinRegManager, _df(), "y", ["x1", "x2"], 25)
+    search.run(s, {"fit_intercept": [True, False]}, method="hyperband", max_trials=3, min_resource=20)
+    assert len(s.trials) <= 3
+    assert s.scoring == "r2"
+
+
+def test_options_validation():
+    assert search.options({"space": {"C": [1, 2]}})["method"] == "random"
+    with pytest.raises(ValueError):
+        search.options({"space": {"C": {"low": 0.1, "high": 1}}, "method": "grid"})
+    with pytest.raises(ValueError):
+        search.options({"space": {}})
+    with pytest.raises(ValueError):
+        search.options({"space": {"C": [1]}, "method": "bayes"})
@@ -0,0 +1,83 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import storage
+
+
+def test_ingest_widens_types_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "CHUNK_ROWS", 100)
+    n = 1000
+    df = pd.DataFrame({"a": np.arange(n).astype(object), "b": ["x"] * n})
+    # an int column that only gains a missing value late, and a column that is empty until row 600
+    df.loc[950, "a"] = None
+    df["c"] = [None] * 600 + ["late"] * 400
+    path = str(tmp_path / "d.parquet")
+
+    summary = storage.ingest_csv(io.StringIO(df.to_csv(index=False)), path)
+
+    assert summary["row_count"] == n
+    assert summary["missing_values"] == {"a": 1, "b": 0, "c": 600}
+    assert summary["dtypes"] == {"a": "float64", "b": "object", "c": "object"}
+    out = storage.read_dataset(path)
+    assert len(out) == n
+    assert out["a"].iloc[:950].tolist() == list(range(950))
+    assert pq.ParquetFile(path).num_row_groups == n // 100
+
+
+def test_ingest_stops_at_max_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "CHUNK_ROWS", 10)
+    path = str(tmp_path / "d.parquet")
+    with pytest.raises(storage.DatasetTooLarge):
+        storage.ingest_csv(io.StringIO("x\n" + "1\n" * 100), path, max_rows=50)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("offset, limit", [(0, 10), (35, 10), (40, 40), (75, 30), (95, 50), (0, 1000)])
+def test_read_rows_pages_across_row_groups(tmp_path, monkeypatch, offset, limit):
+    monkeypatch.setattr(storage, "CHUNK_ROWS", 20)
+    df = pd.DataFrame({"a": np.arange(100), "b": [f"r{i}" for i in range(100)]})
+    path = str(tmp_path / "d.parquet")
+    storage.write_dataset(df, path)
+    row_index = storage.build_row_index(path)
+    assert row_index == [[i * 20, 20] for i in range(5)]
+
+    page = storage.read_rows(path, offset, limit, row_index=row_index)
+    expected = df.iloc[offset:offset + limit].reset_index(drop=True)
+    pd.testing.assert_frame_equal(page, expected)
+    pd.testing.assert_frame_equal(storage.read_rows(path, offset, limit, columns=["b"]), expected[["b"]])
+
+
+def test_read_rows_past_the_end_is_empty(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "CHUNK_ROWS", 20)
+    path = str(tmp_path / "d.parquet")
+    storage.write_dataset(pd.DataFrame({"a": np.arange(50)}), path)
+
+    page = storage.read_rows(path, 500, 10)
+    assert len(page) == 0 and list(page.columns) == ["a"]
+
+
+def test_concurrent_legacy_migrations_agree(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_ROOT", str(tmp_path))
+    df = pd.DataFrame({"a": np.arange(5000), "b": ["x", "y"] * 2500})
+    os.makedirs(storage.user_folder("alice"), exist_ok=True)
+    df.to_csv(storage.legacy_path("alice", "data"), index=False)
+
+    barrier = threading.Barrier(4)
+
+    def resolve():
+        barrier.wait()
+        return storage.resolve_dataset("alice", "data")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        paths = list(pool.map(lambda _: resolve(), range(4)))
+
+    assert paths == [storage.processed_path("alice", "data")] * 4
+    pd.testing.assert_frame_equal(storage.read_dataset(paths[0]), df)
+    assert sorted(os.listdir(storage.user_folder("alice"))) == [os.path.basename(paths[0])]
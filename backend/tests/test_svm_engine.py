@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.pipeline import Pipeline
+from sklearn.svm import SVC, LinearSVR
+
+from ml import SVMManager
+
+
+def _df(n=300):
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({"x1": rng.randn(n), "x2": rng.randn(n)})
+    df["y"] = (df["x1"] ** 2 + df["x2"] ** 2 > 1.4).astype(int)
+    df["r"] = np.sin(df["x1"]) + 0.1 * rng.randn(n)
+    return df
+
+
+def test_small_inputs_keep_the_exact_solver():
+    result = SVMManager(_df(), 20, classifier=True).train("y", ["x1", "x2"])
+    assert result["engine"]["name"] == "exact"
+    assert result["accuracy"] > 0.8
+
+
+def test_large_inputs_switch_to_approximate_kernel():
+    manager = SVMManager(_df(), 20, classifier=True, exact_max_rows=100, n_components=50)
+    result = manager.train("y", ["x1", "x2"])
+    assert result["engine"] == {"name": "kernel_approx", "rows": 240, "exact_max_rows": 100, "n_components": 50, "calibrated": True}
+    assert isinstance(manager.model, CalibratedClassifierCV)
+    # a single calibration split, not SVC's internal 5-fold Platt scaling
+    assert len(manager.model.calibrated_classifiers_) == 1
+    # the non-linear boundary is still learned
+    assert result["accuracy"] > 0.8
+    assert "roc_auc" in result
+
+    # cross-validation never needs probabilities
+    assert isinstance(manager.cv_results["estimator"], Pipeline)
+    assert isinstance(SVMManager(_df(), 20, classifier=True).estimator(calibrate=False), SVC)
+
+
+def test_linear_kernel_and_regression_engines():
+    manager = SVMManager(_df(), 20, kernel="linear", exact_max_rows=100)
+    result = manager.train("r", ["x1", "x2"])
+    assert result["engine"]["name"] == "linear"
+    assert isinstance(manager.model, LinearSVR)
+    assert SVMManager(_df(), 20, engine="exact", exact_max_rows=10).train("r", ["x1"])["engine"]["name"] == "exact"
@@ -25,3 +25,59 @@ def test_prepare_xy_regression():
     X, y = mgr.prepare_xy(['a', 'b'], 'target', classifier=False)
     assert X.shape[0] == y.shape[0]
     assert y.dtype.name.startswith('float')
+
+
+def test_prepare_xy_replays_stored_column_types():
+    from backend.ml import LinRegManager, infer_column_type
+    df = pd.DataFrame({
+        'when': ['2021-01-0%d' % (i % 9 + 1) for i in range(20)],
+        'num': [str(i) if i % 5 else 'n/a' for i in range(20)],
+        'cat': ['red', 'green', 'blue', 'red'] * 5,
+        'target': [float(i) for i in range(20)],
+    })
+    column_types = {c: infer_column_type(df[c], len(df))[0] for c in ['when', 'num', 'cat']}
+    assert [column_types[c]['kind'] for c in ['when', 'num', 'cat']] == ['datetime', 'numeric', 'category']
+    assert column_types['cat']['categories'] == ['blue', 'green', 'red']
+
+    inferred = LinRegManager(df, 25)
+    stored = LinRegManager(df, 25)
+    stored.column_types = column_types
+    X_inferred, _ = inferred.prepare_xy(['when', 'num', 'cat'], 'target', classifier=False)
+    X_stored, _ = stored.prepare_xy(['when', 'num', 'cat'], 'target', classifier=False)
+    pd.testing.assert_frame_equal(X_inferred, X_stored)
+
+
+def test_prepare_xy_peak_memory_stays_near_data_size():
+    import tracemalloc
+
+    import numpy as np
+    from backend.ml import LinRegManager
+
+    rng = np.random.RandomState(0)
+    n, p = 100_000, 8
+    df = pd.DataFrame({f"x{i}": rng.randn(n) for i in range(p)})
+    df["y"] = rng.randn(n)
+    data_bytes = df.memory_usage(index=False).sum()
+
+    tracemalloc.start()
+    try:
+        mgr = LinRegManager(df, 20)
+        X, y = mgr.prepare_xy([f"x{i}" for i in range(p)], "y", classifier=False)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # the scaled feature matrix is the only full-size copy that should be made
+    assert peak / data_bytes < 3.0
+    assert X.to_numpy().flags["C_CONTIGUOUS"]
+    assert len(X) == len(y) == n
+
+
+def test_prepare_xy_keeps_targets_aligned_after_dropping_duplicates():
+    df = pd.DataFrame({
+        'a': [1.0, 1.0, 2.0, 3.0],
+        'target': [10.0, 10.0, 20.0, 30.0],
+    })
+    from backend.ml import LinRegManager
+    X, y = LinRegManager(df, 25).prepare_xy(['a'], 'target', classifier=False)
+    assert y.tolist() == [10.0, 20.0, 30.0]